@@ -13,4 +13,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agriscan.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since it loads models
+from core.sse import EventStreamApp  # noqa: E402
+
+EVENT_STREAM_PATH = "/api/events/"
+
+event_stream_application = EventStreamApp()
+
+
+async def application(scope, receive, send):
+    """Route the server-sent events feed around Django's request handling."""
+    if scope["type"] == "http" and scope["path"] == EVENT_STREAM_PATH:
+        await event_stream_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -61,6 +61,30 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request profiling (see core.profiling). Off by default; when enabled a
+# PROFILING_SAMPLE_RATE share of requests report SQL, serializer and render
+# timings in response headers and in GET /api/profiles/.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.1))
+PROFILING_SLOW_QUERIES = int(os.getenv("PROFILING_SLOW_QUERIES", 5))
+PROFILING_BUFFER_SIZE = int(os.getenv("PROFILING_BUFFER_SIZE", 200))
+
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(0, 'core.profiling.ProfilingMiddleware')
+
+# Response compression (see core.compression). JSON, text, CSV and NDJSON
+# bodies of at least COMPRESSION_MIN_SIZE bytes are sent gzip or brotli
+# compressed to clients that accept it; brotli needs the brotli package.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+
+if COMPRESSION_ENABLED:
+    # Before any middleware that reads or rewrites the response body
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                      'core.compression.CompressionMiddleware')
+
 ROOT_URLCONF = "agriscan.urls"
 
 TEMPLATES = [
@@ -85,17 +109,107 @@ WSGI_APPLICATION = "agriscan.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# With DB_POOL=true connections are taken from an in-process pool and
+# returned to it at the end of each request (see core.db.pool). Otherwise
+# each thread keeps its connection open for DB_CONN_MAX_AGE seconds.
+DATABASE_POOL_ENABLED = os.getenv("DB_POOL", "false").lower() == "true"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "core.db.backends.pooled_postgresql" if DATABASE_POOL_ENABLED
+            else "django.db.backends.postgresql"
+        ),
         "NAME": os.getenv("DB_NAME"),
         "USER": os.getenv("DB_USER"),
         "PASSWORD": os.getenv("DB_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        "CONN_MAX_AGE": 0 if DATABASE_POOL_ENABLED else int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": not DATABASE_POOL_ENABLED,
     }
 }
 
+# Pool size per process, seconds to wait for a free connection, seconds
+# idle before a connection is checked on checkout, and seconds before a
+# connection is replaced.
+DATABASE_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DATABASE_POOL_CHECK_INTERVAL = float(os.getenv("DB_POOL_CHECK_INTERVAL", 30))
+DATABASE_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 3600))
+
+
+# Cache
+# Version stamps and cached bodies must be shared between worker processes,
+# so production deployments should point REDIS_URL at a Redis instance.
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a serialized catalog list is kept; entries are also invalidated
+# as soon as the catalog changes.
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", 24 * 60 * 60))
+
+# Seconds a serialized alert list is kept; alert writes invalidate it sooner.
+ALERT_CACHE_TIMEOUT = int(os.getenv("ALERT_CACHE_TIMEOUT", 5 * 60))
+
+# Maximum number of reports accepted by POST /api/reports/bulk/
+REPORT_BULK_MAX_ITEMS = int(os.getenv("REPORT_BULK_MAX_ITEMS", 500))
+
+# Bulk status updates (PUT /api/reports/status/): most reports changed per
+# request and reports written per UPDATE statement and transaction.
+REPORT_BULK_STATUS_MAX_ITEMS = int(os.getenv("REPORT_BULK_STATUS_MAX_ITEMS", 5000))
+REPORT_BULK_STATUS_CHUNK_SIZE = int(os.getenv("REPORT_BULK_STATUS_CHUNK_SIZE", 500))
+
+# Reviewed reports older than this many days are moved to the archive
+# table by the archive_reports command.
+REPORT_ARCHIVE_AFTER_DAYS = int(os.getenv("REPORT_ARCHIVE_AFTER_DAYS", 365))
+
+# Review queue: seconds an inspector holds claimed reports before they
+# return to the queue, and the most reports claimed per request.
+REVIEW_LEASE_SECONDS = int(os.getenv("REVIEW_LEASE_SECONDS", 15 * 60))
+REVIEW_CLAIM_MAX = int(os.getenv("REVIEW_CLAIM_MAX", 50))
+
+# Delta sync: rows per resource per request, how long changes are held
+# back so late commits are not skipped, and how long tombstones are kept.
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", 500))
+SYNC_SETTLE_SECONDS = int(os.getenv("SYNC_SETTLE_SECONDS", 2))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", 90))
+
+# Server-sent events feed (served by agriscan/asgi.py). Events are relayed
+# through Redis pub/sub when REDIS_URL is set, otherwise within the process.
+EVENT_STREAM_HEARTBEAT = int(os.getenv("EVENT_STREAM_HEARTBEAT", 15))
+EVENT_STREAM_QUEUE_SIZE = int(os.getenv("EVENT_STREAM_QUEUE_SIZE", 100))
+# Seconds to wait on Redis when publishing before the event is dropped
+EVENT_PUBLISH_TIMEOUT = float(os.getenv("EVENT_PUBLISH_TIMEOUT", 1))
+
+# Outbreak detection: an alert is raised when a region reports a disease or
+# pest at least OUTBREAK_MIN_REPORTS times within the window and more than
+# OUTBREAK_THRESHOLD_FACTOR times its baseline rate. Each process reloads a
+# region's counts from the database every OUTBREAK_SYNC_SECONDS.
+OUTBREAK_DETECTION_ENABLED = os.getenv("OUTBREAK_DETECTION_ENABLED", "true").lower() == "true"
+OUTBREAK_WINDOW_HOURS = int(os.getenv("OUTBREAK_WINDOW_HOURS", 24))
+OUTBREAK_BASELINE_DAYS = int(os.getenv("OUTBREAK_BASELINE_DAYS", 7))
+OUTBREAK_MIN_REPORTS = int(os.getenv("OUTBREAK_MIN_REPORTS", 5))
+OUTBREAK_THRESHOLD_FACTOR = float(os.getenv("OUTBREAK_THRESHOLD_FACTOR", 3.0))
+OUTBREAK_ALERT_HOURS = int(os.getenv("OUTBREAK_ALERT_HOURS", 72))
+OUTBREAK_SYNC_SECONDS = int(os.getenv("OUTBREAK_SYNC_SECONDS", 60))
+# Author of generated alerts; defaults to the first superuser
+OUTBREAK_ALERT_USER_ID = os.getenv("OUTBREAK_ALERT_USER_ID")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -143,7 +257,7 @@ AUTH_USER_MODEL = 'core.User'
 # DRF Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -152,6 +266,16 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10
 }
 
+# Authenticated users are cached per process; changes made by another
+# process are picked up after at most AUTH_USER_CACHE_TTL seconds.
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", 60))
+
+# User.last_active is recorded in memory per request and written in bulk
+# every ACTIVITY_FLUSH_INTERVAL seconds.
+ACTIVITY_TRACKING_ENABLED = os.getenv("ACTIVITY_TRACKING_ENABLED", "true").lower() == "true"
+ACTIVITY_FLUSH_INTERVAL = int(os.getenv("ACTIVITY_FLUSH_INTERVAL", 60))
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=365),  # 1 year
@@ -183,6 +307,13 @@ SIMPLE_JWT = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Image uploads (POST /api/uploads/images/): largest accepted image, the
+# bounding box of generated thumbnails in pixels and the threads resizing
+# uploaded images off the request path.
+UPLOAD_IMAGE_MAX_BYTES = int(os.getenv("UPLOAD_IMAGE_MAX_BYTES", 10 * 1024 * 1024))
+UPLOAD_THUMBNAIL_SIZE = int(os.getenv("UPLOAD_THUMBNAIL_SIZE", 320))
+UPLOAD_IMAGE_WORKERS = int(os.getenv("UPLOAD_IMAGE_WORKERS", os.cpu_count() or 2))
+
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True  # Allow all origins
 CORS_ALLOW_CREDENTIALS = True  # Allow credentials
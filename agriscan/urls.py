@@ -15,12 +15,17 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
+from django.views.static import serve
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from core.compression import no_compression
+
 schema_view = get_schema_view(
     openapi.Info(
         title="AgriScan API",
@@ -43,3 +48,6 @@ urlpatterns = [
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
+
+# Uploaded images, already compressed; in production MEDIA_ROOT is served by the web server
+urlpatterns += static(settings.MEDIA_URL, view=no_compression(serve), document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,108 @@
+import heapq
+import threading
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .alert_cache import GLOBAL_SCOPE
+from .cache import get_version
+from .models import Alert
+from .serializers import AlertSerializer
+
+
+class ActiveAlertIndex:
+    """
+    In-memory index of unexpired alerts keyed by region.
+
+    Alerts are bucketed by state and by (state, city), so looking up a
+    region is a dictionary access. A heap ordered by expires_at lets expired
+    alerts be evicted lazily as time passes.
+
+    The index is built from the database on first use. Writes in this
+    process are applied directly from Alert signals; writes made by other
+    processes are detected through the shared alert version stamp and
+    trigger a rebuild on the next lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._alerts = {}
+        self._by_state = defaultdict(dict)
+        self._by_city = defaultdict(dict)
+        self._expiry = []
+
+    def _clear(self):
+        self._alerts = {}
+        self._by_state = defaultdict(dict)
+        self._by_city = defaultdict(dict)
+        self._expiry = []
+
+    def _add(self, alert):
+        entry = {
+            'state': alert.target_state,
+            'city': alert.target_city,
+            'severity': alert.severity,
+            'created_at': alert.created_at,
+            'expires_at': alert.expires_at,
+            'data': AlertSerializer(alert).data,
+        }
+        self._alerts[alert.id] = entry
+        self._by_state[entry['state']][alert.id] = entry
+        self._by_city[(entry['state'], entry['city'])][alert.id] = entry
+        heapq.heappush(self._expiry, (entry['expires_at'], alert.id))
+
+    def _remove(self, alert_id):
+        entry = self._alerts.pop(alert_id, None)
+        if entry is None:
+            return
+        self._by_state[entry['state']].pop(alert_id, None)
+        self._by_city[(entry['state'], entry['city'])].pop(alert_id, None)
+
+    def _evict_expired(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, alert_id = heapq.heappop(self._expiry)
+            entry = self._alerts.get(alert_id)
+            # Skip stale heap entries left behind by updates
+            if entry is not None and entry['expires_at'] == expires_at:
+                self._remove(alert_id)
+
+    def _rebuild(self, version):
+        self._clear()
+        for alert in Alert.objects.filter(expires_at__gt=timezone.now()):
+            self._add(alert)
+        self._version = version
+
+    def apply(self, alert_id, alert, version_before, version_after):
+        """Apply a committed alert write made by this process; alert is None for deletes."""
+        with self._lock:
+            if self._version is None or self._version != version_before:
+                # Not built yet, or already behind another process; the
+                # next lookup rebuilds from the database.
+                return
+            self._remove(alert_id)
+            if alert is not None and alert.expires_at > timezone.now():
+                self._add(alert)
+            self._version = version_after
+
+    def active(self, state, city=None, severity=None):
+        """Serialized alerts active right now in a region, newest first."""
+        now = timezone.now()
+        version = get_version(GLOBAL_SCOPE)
+        with self._lock:
+            if version != self._version:
+                self._rebuild(version)
+            self._evict_expired(now)
+            if city:
+                entries = self._by_city.get((state, city), {}).values()
+            else:
+                entries = self._by_state.get(state, {}).values()
+            entries = [
+                entry for entry in entries
+                if entry['created_at'] <= now and (not severity or entry['severity'] == severity)
+            ]
+        entries.sort(key=lambda entry: entry['created_at'], reverse=True)
+        return [entry['data'] for entry in entries]
+
+
+index = ActiveAlertIndex()
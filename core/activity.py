@@ -0,0 +1,105 @@
+"""
+Coalesced tracking of User.last_active.
+
+Authenticated requests record the time they were seen in memory; a
+background thread writes the latest time per user every
+ACTIVITY_FLUSH_INTERVAL seconds with one UPDATE per batch of users, so
+the request path never writes to the database.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Users updated per UPDATE statement
+FLUSH_BATCH_SIZE = 500
+
+
+class ActivityTracker:
+    def __init__(self):
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopped = threading.Event()
+        self.flushes = 0
+        self.flushed_users = 0
+
+    def record(self, user_id):
+        """Note that user_id was active just now. Never touches the database."""
+        if not settings.ACTIVITY_TRACKING_ENABLED:
+            return
+        now = timezone.now()
+        with self._lock:
+            self._seen[user_id] = now
+        self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        # Threads do not survive a fork, so pre-forking servers start one per worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(settings.ACTIVITY_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush user activity')
+            finally:
+                connection.close()
+
+    def flush(self):
+        """Write the pending last-seen times; returns the number of users updated."""
+        from .models import User
+
+        with self._lock:
+            seen, self._seen = self._seen, {}
+        if not seen:
+            return 0
+
+        items = list(seen.items())
+        for start in range(0, len(items), FLUSH_BATCH_SIZE):
+            batch = items[start:start + FLUSH_BATCH_SIZE]
+            latest = Case(
+                *[When(pk=user_id, then=Value(seen_at)) for user_id, seen_at in batch],
+                output_field=DateTimeField()
+            )
+            # Greatest keeps a newer value written by a save in the meantime
+            User.objects.filter(pk__in=[user_id for user_id, _ in batch]).update(
+                last_active=Greatest(F('last_active'), latest)
+            )
+        self.flushes += 1
+        self.flushed_users += len(items)
+        return len(items)
+
+    def stats(self):
+        return {
+            'pending': len(self._seen),
+            'flushes': self.flushes,
+            'flushedUsers': self.flushed_users,
+        }
+
+
+tracker = ActivityTracker()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        tracker.flush()
+    except Exception:
+        logger.exception('Failed to flush user activity on exit')
@@ -0,0 +1,47 @@
+import hashlib
+
+from django.conf import settings
+
+from .cache import bump_version, get_or_compute, get_version, hit_stats
+
+STATS_NAME = 'alert-cache'
+
+# Version stamp bumped by every alert write
+GLOBAL_SCOPE = 'alerts'
+
+
+def _scope(state):
+    # Queries for one state are invalidated by writes to that state only;
+    # queries spanning states are invalidated by any alert write.
+    return f'{GLOBAL_SCOPE}:{state}' if state else GLOBAL_SCOPE
+
+
+def cache_key(request, view_name):
+    state = request.query_params.get('state')
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    raw = f"{view_name}:{request.accepted_renderer.format}:{params}"
+    digest = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    return f"alert-list:{get_version(_scope(state))}:{digest}"
+
+
+def get_alert_data(request, view_name, compute):
+    """Serialized alert list for this request, from the cache when possible."""
+    return get_or_compute(
+        cache_key(request, view_name), compute,
+        settings.ALERT_CACHE_TIMEOUT, stats=STATS_NAME
+    )
+
+
+def invalidate(*states):
+    bump_version(_scope(None))
+    for state in set(states):
+        if state:
+            bump_version(_scope(state))
+
+
+def stats():
+    return hit_stats(STATS_NAME)
@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from . import activity, alert_cache, authentication, catalog, compression, events, metrics, signals  # noqa: F401
+        from .db import pool
+
+        if settings.PROFILING_ENABLED:
+            from . import profiling
+            profiling.install()
+
+        metrics.register('alertCache', alert_cache.stats)
+        metrics.register('catalogBundle', catalog.stats)
+        metrics.register('compression', compression.stats)
+        metrics.register('userCache', authentication.user_cache.stats)
+        metrics.register('activity', activity.tracker.stats)
+        metrics.register('databasePool', pool.stats)
+        metrics.register('eventStream', lambda: {
+            'subscribers': events.get_broker().subscriber_count()
+        })
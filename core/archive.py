@@ -0,0 +1,66 @@
+"""
+Archival of old reviewed reports.
+
+Reviewed reports older than the retention window are moved from Report to
+ArchivedReport in small batches, each in its own short transaction, so
+the live table and its indexes stay small without long locks. Moving a
+report does not change the rollups or user counters, which keep counting
+it, and does not record a sync tombstone: the report still exists and
+is listed with ``archived=true``.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedReport, Report
+
+# Report columns copied to the archive; archived_at is set on insert
+ARCHIVED_FIELDS = [
+    field.attname for field in ArchivedReport._meta.concrete_fields if field.name != 'archived_at'
+]
+
+
+def archive_cutoff(days):
+    return timezone.now() - timedelta(days=days)
+
+
+def candidates(cutoff):
+    return Report.objects.filter(status='reviewed', timestamp__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size):
+    """Move up to batch_size archivable reports, oldest first; returns how many moved."""
+    with transaction.atomic():
+        # Rows being reviewed or edited right now are left for the next batch
+        ids = list(
+            candidates(cutoff).order_by('timestamp')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        rows = Report.objects.filter(id__in=ids).values(*ARCHIVED_FIELDS)
+        # ignore_conflicts lets a batch interrupted after its insert be retried
+        ArchivedReport.objects.bulk_create(
+            [ArchivedReport(**row) for row in rows], ignore_conflicts=True
+        )
+        delete_reports(ids)
+    return len(ids)
+
+
+def delete_reports(ids):
+    """
+    Delete reports by id in one statement, without the ORM.
+
+    QuerySet.delete() would send post_delete for every report, taking it
+    out of the rollups and counters and recording a tombstone.
+    """
+    pk = Report._meta.pk
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(Report._meta.db_table)} '
+            f'WHERE {connection.ops.quote_name(pk.column)} IN ({placeholders})',
+            [pk.get_db_prep_value(id, connection) for id in ids]
+        )
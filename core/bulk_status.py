@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Report
+from .review_queue import claimed_by_other
+from .signals import reports_bulk_status_changed
+
+# Columns read to decide each report's outcome and adjust rollups and counters
+LOADED_FIELDS = (
+    'id', 'user_id', 'status', 'notes', 'claimed_by_id', 'claimed_until',
+    'timestamp', 'state', 'city', 'disease_detection', 'pest_detection'
+)
+
+
+def bulk_update_status(user, report_ids, new_status, notes=None):
+    """
+    Set the status (and optionally the review notes) of many reports.
+
+    Reports are processed in chunks of REPORT_BULK_STATUS_CHUNK_SIZE, each in
+    its own transaction: the chunk's rows are locked and read once, and the
+    reports that change are written with a single UPDATE ... WHERE id IN
+    that sets only the review columns. Reports already in the requested
+    state are left untouched, and reports held in the review queue by
+    another inspector are skipped.
+
+    Returns one outcome per id, in order: updated, unchanged, claimed or
+    notFound.
+    """
+    outcomes = {}
+    chunk_size = settings.REPORT_BULK_STATUS_CHUNK_SIZE
+    for start in range(0, len(report_ids), chunk_size):
+        outcomes.update(_update_chunk(user, report_ids[start:start + chunk_size], new_status, notes))
+    return [{'reportId': str(report_id), 'status': outcomes[report_id]} for report_id in report_ids]
+
+
+def _update_chunk(user, report_ids, new_status, notes):
+    now = timezone.now()
+    outcomes = dict.fromkeys(report_ids, 'notFound')
+
+    with transaction.atomic():
+        reports = Report.objects.filter(id__in=report_ids).only(*LOADED_FIELDS).select_for_update()
+        changed = []
+        for report in reports:
+            if claimed_by_other(report, user, now):
+                outcomes[report.id] = 'claimed'
+            elif report.status == new_status and (notes is None or report.notes == notes):
+                outcomes[report.id] = 'unchanged'
+            else:
+                outcomes[report.id] = 'updated'
+                changed.append(report)
+
+        if changed:
+            updates = {
+                'status': new_status,
+                'reviewed_by': user,
+                'reviewed_at': now,
+                'claimed_by': None,
+                'claimed_until': None,
+                # update() skips auto_now; delta sync relies on updated_at
+                'updated_at': now,
+            }
+            if notes is not None:
+                updates['notes'] = notes
+            Report.objects.filter(id__in=[report.id for report in changed]).update(**updates)
+            reports_bulk_status_changed(changed, new_status)
+    return outcomes
@@ -0,0 +1,84 @@
+import time
+import uuid
+
+from django.core.cache import cache
+
+# Version stamps never expire; they are replaced whenever the data changes.
+VERSION_KEY = 'version:{}'
+
+
+def get_version(name):
+    """
+    Return the current version stamp for a named dataset.
+
+    A missing stamp (cold cache, eviction) is replaced by a fresh one, which
+    simply invalidates anything cached under the previous stamp.
+    """
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Give a dataset a new version stamp, invalidating everything keyed on it."""
+    cache.set(VERSION_KEY.format(name), uuid.uuid4().hex, None)
+
+
+def increment(key, delta=1):
+    """Increment a shared counter, creating it on first use."""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def get_or_compute(key, compute, timeout, stats=None, lock_timeout=10, poll_interval=0.05):
+    """
+    Return the cached value for key, computing and storing it on a miss.
+
+    Only one caller computes a missing value at a time: the first to take
+    the lock fills the cache while concurrent callers poll for the result
+    instead of all hitting the database at once. If the lock holder does not
+    finish within lock_timeout seconds the caller computes the value itself.
+    """
+    value = cache.get(key)
+    if value is not None:
+        if stats:
+            increment(f'stats:{stats}:hits')
+        return value
+
+    if stats:
+        increment(f'stats:{stats}:misses')
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return compute()
+
+
+def hit_stats(stats):
+    hits = cache.get(f'stats:{stats}:hits', 0)
+    misses = cache.get(f'stats:{stats}:misses', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hitRate': round(hits / total, 4) if total else None,
+    }
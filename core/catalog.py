@@ -0,0 +1,67 @@
+"""
+Precompressed bundle of every catalog, fetched by the app at startup.
+
+The bundle holds all plant, disease and pest types in one gzip-compressed
+JSON body. Its version is a hash of the catalog content, so clients can
+revalidate with If-None-Match and get 304 Not Modified until the content
+actually changes. The compressed body is cached under the catalogs'
+version stamps and rebuilt only after a catalog row is saved or deleted.
+"""
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .cache import get_or_compute, get_version, hit_stats
+from .models import DiseaseType, PestType, PlantType
+from .serializers import DiseaseTypeSerializer, PestTypeSerializer, PlantTypeSerializer
+
+STATS_NAME = 'catalog-bundle'
+
+# Bundle key -> (model, serializer)
+CATALOGS = {
+    'plantTypes': (PlantType, PlantTypeSerializer),
+    'diseaseTypes': (DiseaseType, DiseaseTypeSerializer),
+    'pestTypes': (PestType, PestTypeSerializer),
+}
+
+
+class Bundle:
+    def __init__(self, version, body, compressed):
+        self.version = version
+        self.body = body
+        self.compressed = compressed
+
+    @property
+    def etag(self):
+        return f'"{self.version}"'
+
+
+def _dumps(data):
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False, sort_keys=True, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def build_bundle():
+    catalogs = {
+        key: serializer(model.objects.order_by('pk'), many=True).data
+        for key, (model, serializer) in CATALOGS.items()
+    }
+    version = hashlib.sha256(_dumps(catalogs)).hexdigest()[:32]
+    body = _dumps({'success': True, 'data': {'version': version, **catalogs}})
+    # mtime=0 keeps the compressed bytes identical for identical content
+    return Bundle(version, body, gzip.compress(body, compresslevel=9, mtime=0))
+
+
+def get_bundle():
+    stamps = ':'.join(get_version(model._meta.model_name) for model, _ in CATALOGS.values())
+    return get_or_compute(
+        f'catalog-bundle:{stamps}', build_bundle, settings.CATALOG_CACHE_TIMEOUT, stats=STATS_NAME
+    )
+
+
+def stats():
+    return hit_stats(STATS_NAME)
@@ -0,0 +1,231 @@
+"""
+Negotiated gzip or brotli compression of responses.
+
+CompressionMiddleware compresses JSON, text, CSV and NDJSON responses of
+at least COMPRESSION_MIN_SIZE bytes with the best encoding the client
+accepts (brotli when the optional ``brotli`` package is installed, else
+gzip). Streaming responses such as exports are compressed chunk by chunk.
+Views opt out with the ``no_compression`` decorator.
+
+Bytes in and out and the CPU time spent compressing are counted per
+encoding and reported under ``compression`` in /api/metrics/.
+"""
+import re
+import threading
+import time
+import zlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|x-ndjson|javascript|xml)|[^;]*\+json)', re.IGNORECASE
+)
+ACCEPT_ENCODING_ITEM = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+# Server preference when the client weighs encodings equally
+PREFERRED_ENCODINGS = ('br', 'gzip')
+
+
+def no_compression(view):
+    """Mark every response of a view as not to be compressed."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            response = await view(*args, **kwargs)
+            response.skip_compression = True
+            return response
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = view(*args, **kwargs)
+            response.skip_compression = True
+            return response
+    return wrapper
+
+
+def available_encodings():
+    return [encoding for encoding in PREFERRED_ENCODINGS if encoding != 'br' or brotli is not None]
+
+
+def _weights(accept_encoding):
+    weights = {}
+    for item in accept_encoding.split(','):
+        match = ACCEPT_ENCODING_ITEM.match(item)
+        if not match:
+            continue
+        try:
+            weights[match.group(1).lower()] = float(match.group(2) or 1)
+        except ValueError:
+            continue
+    return weights
+
+
+def accepts(accept_encoding, encoding):
+    """Whether an Accept-Encoding header allows encoding (q=0 refuses it)."""
+    weights = _weights(accept_encoding)
+    return weights.get(encoding, weights.get('*', 0)) > 0
+
+
+def negotiate(accept_encoding):
+    """The encoding to use for an Accept-Encoding header, or None."""
+    weights = _weights(accept_encoding)
+    best = None
+    best_weight = 0
+    for encoding in available_encodings():
+        weight = weights.get(encoding, weights.get('*', 0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class Compressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self._compress = self._compressor.process
+            self._finish = self._compressor.finish
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+            self._finish = self._compressor.flush
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0
+
+    def _timed(self, func, *args):
+        started = time.thread_time()
+        data = func(*args)
+        self.cpu_time += time.thread_time() - started
+        self.bytes_out += len(data)
+        return data
+
+    def compress(self, data):
+        self.bytes_in += len(data)
+        return self._timed(self._compress, data)
+
+    def finish(self):
+        return self._timed(self._finish)
+
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, compressor):
+        with self._lock:
+            totals = self._totals.setdefault(
+                compressor.encoding, {'responses': 0, 'bytesIn': 0, 'bytesOut': 0, 'cpuTime': 0.0}
+            )
+            totals['responses'] += 1
+            totals['bytesIn'] += compressor.bytes_in
+            totals['bytesOut'] += compressor.bytes_out
+            totals['cpuTime'] += compressor.cpu_time
+
+    def __call__(self):
+        with self._lock:
+            totals = {encoding: dict(values) for encoding, values in self._totals.items()}
+        return {
+            encoding: {
+                'responses': values['responses'],
+                'bytesIn': values['bytesIn'],
+                'bytesOut': values['bytesOut'],
+                'ratio': round(values['bytesIn'] / values['bytesOut'], 2) if values['bytesOut'] else None,
+                'cpuMs': round(values['cpuTime'] * 1000, 3),
+                # CPU cost per MB of uncompressed payload, for tuning the level
+                'cpuMsPerMb': round(values['cpuTime'] * 1000 / (values['bytesIn'] / 1e6), 3) if values['bytesIn'] else None,
+            }
+            for encoding, values in totals.items()
+        }
+
+
+stats = CompressionStats()
+
+
+def _compress_iterator(compressor, chunks):
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+    stats.record(compressor)
+
+
+async def _compress_async_iterator(compressor, chunks):
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+    stats.record(compressor)
+
+
+def _weaken_etag(response):
+    # The compressed body is a different representation from the plain one
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+
+def compress_response(request, response):
+    if (
+        getattr(response, 'skip_compression', False)
+        or response.status_code < 200 or response.status_code in (204, 304)
+        or response.has_header('Content-Encoding')
+        or not COMPRESSIBLE_TYPES.match(response.get('Content-Type', ''))
+        or 'no-transform' in response.get('Cache-Control', '')
+    ):
+        return response
+
+    # The response depends on Accept-Encoding whether or not it is compressed
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = negotiate(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    if response.streaming:
+        compressor = Compressor(encoding)
+        if response.is_async:
+            response.streaming_content = _compress_async_iterator(compressor, response.streaming_content)
+        else:
+            response.streaming_content = _compress_iterator(compressor, response.streaming_content)
+        # The compressed length is not known up front
+        del response['Content-Length']
+    else:
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        compressor = Compressor(encoding)
+        body = compressor.compress(response.content) + compressor.finish()
+        if len(body) >= len(response.content):
+            return response
+        stats.record(compressor)
+        response.content = body
+        response['Content-Length'] = str(len(body))
+
+    _weaken_etag(response)
+    response['Content-Encoding'] = encoding
+    return response
+
+
+@sync_and_async_middleware
+def CompressionMiddleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return compress_response(request, await get_response(request))
+    else:
+        def middleware(request):
+            return compress_response(request, get_response(request))
+    return middleware
@@ -0,0 +1,83 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import UserReportStats
+
+
+def apply_delta(user_id, reports=0, reviewed=0):
+    """Add the given deltas to a user's counters, creating the row if needed."""
+    if not reports and not reviewed:
+        return
+    updates = {
+        'report_count': F('report_count') + reports,
+        'reviewed_count': F('reviewed_count') + reviewed,
+    }
+    if UserReportStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    if reports < 0 or reviewed < 0:
+        # No row to decrement, e.g. the user is being deleted; reconciliation
+        # recreates rows that are genuinely missing
+        return
+    try:
+        with transaction.atomic():
+            UserReportStats.objects.create(user_id=user_id, report_count=reports, reviewed_count=reviewed)
+    except IntegrityError:
+        # Another request created the row first
+        UserReportStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def report_saved(report, previous_status, created):
+    reviewed = int(report.status == 'reviewed')
+    if created:
+        apply_delta(report.user_id, 1, reviewed)
+    elif previous_status is not None and previous_status != report.status:
+        apply_delta(report.user_id, 0, reviewed - int(previous_status == 'reviewed'))
+
+
+def report_deleted(report):
+    if 'status' in report.get_deferred_fields():
+        # Cannot tell what the row counted as; left for reconciliation
+        return
+    apply_delta(report.user_id, -1, -int(report.status == 'reviewed'))
+
+
+def reports_created(reports):
+    """Count reports inserted without post_save (bulk_create), one update per user."""
+    totals = Counter()
+    reviewed = Counter()
+    for report in reports:
+        totals[report.user_id] += 1
+        if report.status == 'reviewed':
+            reviewed[report.user_id] += 1
+    for user_id, count in totals.items():
+        apply_delta(user_id, count, reviewed[user_id])
+
+
+def reports_status_changed(reports, new_status):
+    """Move reports updated in bulk from report.status to new_status, one update per user."""
+    reviewed = Counter()
+    for report in reports:
+        reviewed[report.user_id] += int(new_status == 'reviewed') - int(report.status == 'reviewed')
+    for user_id, delta in reviewed.items():
+        apply_delta(user_id, 0, delta)
+
+
+def user_counts(user):
+    stats = UserReportStats.objects.filter(user=user).first()
+    if stats is None:
+        return {'total': 0, 'reviewed': 0, 'pending': 0}
+    return {
+        'total': stats.report_count,
+        'reviewed': stats.reviewed_count,
+        'pending': stats.pending_count,
+    }
+
+
+def aggregate_counts(reports):
+    """Actual (total, reviewed) per user id for a Report queryset, in one query."""
+    rows = reports.order_by().values('user_id').annotate(
+        total=Count('id'), reviewed=Count('id', filter=Q(status='reviewed'))
+    )
+    return {row['user_id']: (row['total'], row['reviewed']) for row in rows}
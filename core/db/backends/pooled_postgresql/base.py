@@ -0,0 +1,29 @@
+"""
+PostgreSQL backend that takes connections from core.db.pool.
+
+Selected with DB_POOL=true (see agriscan/settings.py). Closing a
+connection, which Django does at the end of each request when
+CONN_MAX_AGE is 0, returns it to the pool instead.
+"""
+from django.db.backends.postgresql import base
+
+from core.db.pool import PoolTimeout, get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        try:
+            connection = get_pool(self.alias).checkout(
+                lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+            )
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(str(e))
+        # The parent sets this only when it opens a new connection
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', base.IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            get_pool(self.alias).checkin(self.connection)
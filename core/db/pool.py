@@ -0,0 +1,170 @@
+"""
+In-process database connection pool.
+
+Django opens a connection per thread and, with CONN_MAX_AGE = 0, closes it
+at the end of every request. The pooled backend
+(core.db.backends.pooled_postgresql) instead returns connections here, so
+the next request reuses an already authenticated connection.
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections.
+
+    At most `size` connections exist at once; checkout waits up to
+    `timeout` seconds for one to be returned. Idle connections are checked
+    with a cheap query before reuse once they have been idle for
+    `check_interval` seconds, and replaced after `max_lifetime` seconds.
+    """
+
+    def __init__(self, name, size, timeout, check_interval, max_lifetime):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_lifetime = max_lifetime
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        # (connection, last used), most recently returned last
+        self._idle = deque()
+        self._born = {}
+        self.in_use = 0
+        self.created = 0
+        self.discarded = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def checkout(self, connect):
+        """Return a healthy connection, calling connect() when none is idle."""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f'No connection available in pool {self.name!r} after {self.timeout}s')
+        waited = time.monotonic() - started
+
+        try:
+            while True:
+                with self._lock:
+                    # Reuse the most recently returned connection; it is the least likely to have gone stale
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    connection = connect()
+                    with self._lock:
+                        self._born[connection] = time.monotonic()
+                        self.created += 1
+                    break
+                connection, last_used = item
+                if self._usable(connection, last_used):
+                    break
+                self._discard(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return connection
+
+    def checkin(self, connection):
+        """Return a connection, rolling back anything left open."""
+        try:
+            if connection.closed:
+                raise ConnectionError()
+            if self._in_transaction(connection):
+                connection.rollback()
+            expired = time.monotonic() - self._born.get(connection, 0) > self.max_lifetime
+        except Exception:
+            expired = True
+
+        if expired:
+            self._discard(connection)
+        else:
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    def _in_transaction(self, connection):
+        # 0 is the idle status in both psycopg2 and psycopg 3
+        return connection.info.transaction_status != 0
+
+    def _usable(self, connection, last_used):
+        now = time.monotonic()
+        if connection.closed or now - self._born.get(connection, 0) > self.max_lifetime:
+            return False
+        if now - last_used < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if self._in_transaction(connection):
+                connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        with self._lock:
+            self._born.pop(connection, None)
+            self.discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'inUse': self.in_use,
+            'idle': len(self._idle),
+            'created': self.created,
+            'discarded': self.discarded,
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'avgWaitMs': 1000 * self.wait_total / self.checkouts if self.checkouts else 0.0,
+            'maxWaitMs': 1000 * self.wait_max,
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(
+                alias,
+                size=settings.DATABASE_POOL_SIZE,
+                timeout=settings.DATABASE_POOL_TIMEOUT,
+                check_interval=settings.DATABASE_POOL_CHECK_INTERVAL,
+                max_lifetime=settings.DATABASE_POOL_MAX_LIFETIME,
+            )
+        return _pools[alias]
+
+
+def stats():
+    return {alias: pool.stats() for alias, pool in _pools.items()}
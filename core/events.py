@@ -0,0 +1,205 @@
+"""
+In-process publish/subscribe for the server-sent events feed.
+
+Events are published from synchronous code (model signals running in
+worker threads) and delivered to asyncio subscribers through their event
+loop. LocalBroker only reaches subscribers in the current process; with
+REDIS_URL set, RedisBroker relays events through Redis pub/sub so every
+process's subscribers receive them.
+"""
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+REDIS_CHANNEL = 'agriscan:events'
+# Seconds between attempts to resubscribe after losing Redis, doubling up to the maximum
+REDIS_RETRY_DELAY = 0.5
+REDIS_MAX_RETRY_DELAY = 30
+
+
+class Subscription:
+    def __init__(self, loop, state, city, topics, queue_size):
+        self.loop = loop
+        self.state = state
+        self.city = city
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def matches(self, event):
+        if event['topic'] not in self.topics:
+            return False
+        # Events without a city (statewide alerts) reach every city in the state
+        return not self.city or event['city'] in (self.city, None)
+
+    def deliver(self, event):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class LocalBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, state, city=None, topics=('alert', 'report')):
+        subscription = Subscription(
+            asyncio.get_running_loop(), state, city, set(topics),
+            settings.EVENT_STREAM_QUEUE_SIZE
+        )
+        with self._lock:
+            self._subscriptions[state].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.state)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.state]
+
+    def has_subscribers(self, state):
+        return bool(self._subscriptions.get(state))
+
+    def publish(self, topic, state, city, data):
+        self.dispatch({
+            'id': uuid.uuid4().hex,
+            'topic': topic,
+            'state': state,
+            'city': city,
+            'data': data,
+        })
+
+    def dispatch(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event['state'], ()))
+        for subscription in subscriptions:
+            if subscription.matches(event):
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+                except RuntimeError:
+                    # The subscriber's loop has shut down
+                    self.unsubscribe(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+class RedisBroker(LocalBroker):
+    """Relays events through Redis so subscribers in every process see them."""
+
+    def __init__(self, url):
+        super().__init__()
+        import redis
+
+        self._url = url
+        # Publishing runs on the request path; a slow Redis must not stall it
+        self._client = redis.Redis.from_url(
+            url,
+            socket_timeout=settings.EVENT_PUBLISH_TIMEOUT,
+            socket_connect_timeout=settings.EVENT_PUBLISH_TIMEOUT,
+        )
+        self._errors = redis.RedisError
+        self._listener = None
+
+    def has_subscribers(self, state):
+        # Subscribers may live in any process
+        return True
+
+    def publish(self, topic, state, city, data):
+        event = {
+            'id': uuid.uuid4().hex,
+            'topic': topic,
+            'state': state,
+            'city': city,
+            'data': data,
+        }
+        try:
+            self._client.publish(REDIS_CHANNEL, json.dumps(event, cls=DjangoJSONEncoder))
+        except self._errors:
+            # The write has already committed; losing a live event is preferable
+            # to failing the request that caused it
+            logger.warning('Could not publish %s event to Redis', topic, exc_info=True)
+
+    def subscribe(self, *args, **kwargs):
+        subscription = super().subscribe(*args, **kwargs)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    async def _listen(self):
+        # Runs until the last subscriber leaves; subscribe() starts it again
+        self._retry_delay = REDIS_RETRY_DELAY
+        while self.subscriber_count():
+            try:
+                await self._relay()
+            except self._errors:
+                logger.warning(
+                    'Lost the Redis event subscription; retrying in %.1fs', self._retry_delay, exc_info=True
+                )
+            except Exception:
+                logger.exception('Redis event listener failed; retrying in %.1fs', self._retry_delay)
+            await asyncio.sleep(self._retry_delay)
+            self._retry_delay = min(self._retry_delay * 2, REDIS_MAX_RETRY_DELAY)
+
+    async def _relay(self):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self._url)
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(REDIS_CHANNEL)
+                self._retry_delay = REDIS_RETRY_DELAY
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    try:
+                        self.dispatch(json.loads(message['data']))
+                    except (ValueError, KeyError):
+                        logger.warning('Discarding malformed event from Redis')
+        finally:
+            await client.aclose()
+
+
+def _create_broker():
+    if getattr(settings, 'REDIS_URL', None):
+        return RedisBroker(settings.REDIS_URL)
+    return LocalBroker()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = _create_broker()
+    return _broker
+
+
+def publish(topic, state, city, build_data):
+    """
+    Publish an event to subscribers of a region.
+
+    build_data is only called when someone may be listening, so writes pay
+    no serialization cost while the feed is idle.
+    """
+    broker = get_broker()
+    if broker.has_subscribers(state):
+        broker.publish(topic, state, city, build_data())
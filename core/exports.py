@@ -0,0 +1,62 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Number of rows fetched per round trip while streaming an export. On
+# PostgreSQL ``iterator()`` uses a server-side cursor, so only one chunk is
+# held in memory at a time regardless of the size of the export.
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = [
+    'id', 'user_id', 'plant_type_id', 'image_url', 'timestamp',
+    'gps_lat', 'gps_lng', 'city', 'state',
+    'plant_detection', 'disease_detection', 'pest_detection', 'drought_detection',
+    'status', 'notes', 'reviewed_by_id', 'reviewed_at'
+]
+
+JSON_FIELDS = {'plant_detection', 'disease_detection', 'pest_detection', 'drought_detection'}
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class Echo:
+    """File-like object that hands back whatever is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def _iter_rows(queryset, chunk_size):
+    return queryset.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def _csv_value(field, value):
+    if value is None:
+        return ''
+    if field in JSON_FIELDS:
+        return json.dumps(value, ensure_ascii=False, cls=DjangoJSONEncoder)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in _iter_rows(queryset, chunk_size):
+        yield writer.writerow([_csv_value(field, row[field]) for field in EXPORT_FIELDS])
+
+
+def stream_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    for row in _iter_rows(queryset, chunk_size):
+        yield json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_STREAMS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
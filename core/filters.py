@@ -0,0 +1,82 @@
+import django_filters
+from django import forms
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from rest_framework import filters
+
+from .models import ArchivedReport, Report
+from .search import MAX_SEARCH_WORDS, SEARCH_CONFIG, SearchDocument, WordSimilar, normalize_text
+
+
+class IntegerFilter(django_filters.NumberFilter):
+    # NumberFilter yields Decimal, which cannot be compared against JSON values.
+    field_class = forms.IntegerField
+
+
+class ReportFilter(django_filters.FilterSet):
+    """
+    Filters for the report list and export endpoints.
+
+    The detection filters look up keys inside the JSON detection fields, which
+    django-filter cannot derive from ``Meta.fields`` on its own.
+    """
+    plant_detection__plantId = django_filters.CharFilter(field_name='plant_detection__plantId')
+    disease_detection__diseaseId = django_filters.CharFilter(field_name='disease_detection__diseaseId')
+    pest_detection__pestId = django_filters.CharFilter(field_name='pest_detection__pestId')
+    drought_detection__droughtLevel = IntegerFilter(field_name='drought_detection__droughtLevel')
+
+    class Meta:
+        model = Report
+        fields = ['status', 'state', 'city']
+
+
+class ArchivedReportFilter(ReportFilter):
+    """The report filters applied to archived reports."""
+
+    class Meta(ReportFilter.Meta):
+        model = ArchivedReport
+
+
+class CatalogSearchFilter(filters.SearchFilter):
+    """
+    Ranked search over the ``search_text`` column of a catalog model.
+
+    Uses the same ``search`` query parameter as DRF's SearchFilter. Every
+    word of the term must match as a prefix of a word in the document, or
+    the term must be close enough to part of it by trigram word similarity
+    to tolerate typos.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        words = normalize_text(request.query_params.get(self.search_param, '')).split()[:MAX_SEARCH_WORDS]
+        if not words:
+            return queryset
+        if connections[queryset.db].vendor == 'postgresql':
+            return self.postgres_search(queryset, words)
+        return self.fallback_search(queryset, words)
+
+    def postgres_search(self, queryset, words):
+        term = ' '.join(words)
+        # Words come from \w+, so they cannot contain tsquery operators
+        query = SearchQuery(
+            ' & '.join(f'{word}:*' for word in words), config=SEARCH_CONFIG, search_type='raw'
+        )
+        return queryset.annotate(
+            document=SearchDocument('search_text')
+        ).filter(
+            Q(document=query) | Q(WordSimilar(Value(term), F('search_text')))
+        ).annotate(
+            rank=SearchRank(F('document'), query) + TrigramWordSimilarity(term, 'search_text')
+        ).order_by('-rank', 'name')
+
+    def fallback_search(self, queryset, words):
+        for word in words:
+            queryset = queryset.filter(search_text__contains=word)
+        return queryset.annotate(
+            rank=Case(
+                When(search_text__startswith=' '.join(words), then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        ).order_by('-rank', 'name')
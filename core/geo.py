@@ -0,0 +1,160 @@
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precision stored on each report (~5m x 5m cells). Queries use a prefix of
+# this hash, so any coarser precision can be matched with an index scan.
+GEOHASH_PRECISION = 9
+
+# Upper bound on the number of cells a single query is expanded into.
+MAX_COVERING_CELLS = 24
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a base32 geohash of the given precision."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_range[0] = mid
+            else:
+                value <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_range[0] = mid
+            else:
+                value <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bit = 0
+            value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return the (height, width) in degrees of a geohash cell."""
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def _steps(start, stop, step):
+    values = []
+    current = start
+    while current < stop:
+        values.append(current)
+        current += step
+    values.append(stop)
+    return values
+
+
+def covering_cells(min_lat, min_lng, max_lat, max_lng):
+    """
+    Return the geohash prefixes covering a bounding box.
+
+    Picks the finest precision that covers the box with at most
+    MAX_COVERING_CELLS cells, so the prefix filter stays selective without
+    expanding into a huge OR clause.
+    """
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    min_lng, max_lng = max(min_lng, -180.0), min(max_lng, 180.0)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.ceil((max_lat - min_lat) / height) + 1
+        cols = math.ceil((max_lng - min_lng) / width) + 1
+        if rows * cols <= MAX_COVERING_CELLS:
+            break
+    cells = set()
+    for lat in _steps(min_lat, max_lat, height):
+        for lng in _steps(min_lng, max_lng, width):
+            cells.add(encode_geohash(lat, lng, precision))
+    return sorted(cells)
+
+
+def split_bbox(min_lat, min_lng, max_lat, max_lng):
+    """
+    Return the boxes within valid coordinates that cover a bounding box.
+
+    A box crossing the antimeridian, given either with a longitude beyond
+    +/-180 or with min_lng > max_lng, is split into one box on each side.
+    """
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    if min_lng > max_lng:
+        max_lng += 360.0
+    if max_lng - min_lng >= 360.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    # Move the western edge into [-180, 180); the eastern edge follows
+    shift = ((min_lng + 180.0) % 360.0 - 180.0) - min_lng
+    min_lng, max_lng = min_lng + shift, max_lng + shift
+    if max_lng <= 180.0:
+        return [(min_lat, min_lng, max_lat, max_lng)]
+    return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng - 360.0)]
+
+
+def radius_bbox(lat, lng, radius_km):
+    """Return the (min_lat, min_lng, max_lat, max_lng) box enclosing a circle."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-6:
+        dlng = 180.0
+    else:
+        dlng = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+def distance_expression(lat, lng, lat_field='gps_lat', lng_field='gps_lng'):
+    """Haversine distance in km from (lat, lng) as a database expression."""
+    lat_value = Value(lat, output_field=FloatField())
+    lng_value = Value(lng, output_field=FloatField())
+    dlat = Radians(F(lat_field) - lat_value)
+    dlng = Radians(F(lng_field) - lng_value)
+    a = (Power(Sin(dlat / 2), 2)
+         + Cos(Radians(lat_value)) * Cos(Radians(F(lat_field))) * Power(Sin(dlng / 2), 2))
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def filter_within_bbox(queryset, min_lat, min_lng, max_lat, max_lng):
+    """Coarse geohash cell filter followed by an exact coordinate range."""
+    boxes = Q()
+    for box in split_bbox(min_lat, min_lng, max_lat, max_lng):
+        cells = Q()
+        for cell in covering_cells(*box):
+            cells |= Q(geohash__startswith=cell)
+        boxes |= cells & Q(
+            gps_lat__gte=box[0], gps_lat__lte=box[2],
+            gps_lng__gte=box[1], gps_lng__lte=box[3]
+        )
+    return queryset.filter(boxes)
+
+
+def filter_within_radius(queryset, lat, lng, radius_km):
+    """
+    Reports within radius_km of (lat, lng), nearest first.
+
+    The geohash cells covering the circle's bounding box narrow the scan to
+    an index range; the exact haversine distance is then applied to the
+    remaining candidates.
+    """
+    queryset = filter_within_bbox(queryset, *radius_bbox(lat, lng, radius_km))
+    return queryset.annotate(
+        distance_km=distance_expression(lat, lng)
+    ).filter(distance_km__lte=radius_km).order_by('distance_km')
@@ -0,0 +1,86 @@
+from django.db import transaction
+
+from .geo import encode_geohash
+from .models import PlantType, Report
+from .serializers import ReportCreateSerializer, plant_type_id
+from .signals import reports_bulk_created
+
+
+def bulk_create_reports(request, items):
+    """
+    Validate and insert a batch of reports submitted by request.user.
+
+    Plant types are resolved with one query and all new reports are written
+    with one bulk_create in a single transaction. Items carrying a clientId
+    that was already uploaded are reported as duplicates instead of being
+    inserted again, so clients can safely retry a whole batch.
+
+    Returns one result per item, in order.
+    """
+    user = request.user
+    results = [None] * len(items)
+    pending = []
+
+    for index, item in enumerate(items):
+        serializer = ReportCreateSerializer(data=item, context={'request': request})
+        if not serializer.is_valid():
+            results[index] = {'index': index, 'status': 'invalid', 'errors': serializer.errors}
+            continue
+        pending.append((index, serializer.validated_data))
+
+    client_ids = {data['client_id'] for _, data in pending if data.get('client_id')}
+    existing = dict(
+        Report.objects.filter(user=user, client_id__in=client_ids).values_list('client_id', 'id')
+    ) if client_ids else {}
+
+    plant_ids = {plant_type_id(data.get('plant_detection')) for _, data in pending} - {None}
+    plant_types = PlantType.objects.in_bulk(list(plant_ids)) if plant_ids else {}
+
+    reports = []
+    seen = {}
+    for index, data in pending:
+        client_id = data.get('client_id')
+        if client_id in existing:
+            results[index] = {'index': index, 'clientId': client_id, 'status': 'duplicate',
+                              'reportId': str(existing[client_id])}
+            continue
+        if client_id and client_id in seen:
+            results[index] = {'index': index, 'clientId': client_id, 'status': 'duplicate',
+                              'reportId': str(seen[client_id].id)}
+            continue
+
+        report = Report(
+            user=user,
+            plant_type=plant_types.get(plant_type_id(data.get('plant_detection'))),
+            geohash=encode_geohash(data['gps_lat'], data['gps_lng']),
+            **data
+        )
+        if client_id:
+            seen[client_id] = report
+        reports.append((index, report))
+
+    with transaction.atomic():
+        # ignore_conflicts covers a concurrent retry of the same batch
+        Report.objects.bulk_create([report for _, report in reports], ignore_conflicts=True)
+        inserted = set(
+            Report.objects.filter(id__in=[report.id for _, report in reports]).values_list('id', flat=True)
+        )
+        conflicts = {
+            report.client_id for _, report in reports
+            if report.id not in inserted and report.client_id
+        }
+        if conflicts:
+            existing = dict(
+                Report.objects.filter(user=user, client_id__in=conflicts).values_list('client_id', 'id')
+            )
+        created = [report for _, report in reports if report.id in inserted]
+        reports_bulk_created(created)
+
+    for index, report in reports:
+        if report.id in inserted:
+            results[index] = {'index': index, 'clientId': report.client_id, 'status': 'created',
+                              'reportId': str(report.id)}
+        else:
+            results[index] = {'index': index, 'clientId': report.client_id, 'status': 'duplicate',
+                              'reportId': str(existing.get(report.client_id, '')) or None}
+    return results
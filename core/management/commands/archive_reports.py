@@ -0,0 +1,42 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.archive import archive_batch, archive_cutoff, candidates
+from core.seeding import Throughput
+
+class Command(BaseCommand):
+    help = 'Moves reviewed reports older than the retention window to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.REPORT_ARCHIVE_AFTER_DAYS,
+                          help='Archive reviewed reports older than this many days')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                          help='Number of reports moved per transaction')
+        parser.add_argument('--pause', type=float, default=0.0,
+                          help='Seconds to sleep between batches to limit load')
+        parser.add_argument('--max-batches', type=int,
+                          help='Stop after this many batches (default: until done)')
+        parser.add_argument('--dry-run', action='store_true',
+                          help='Only count the reports that would be archived')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+
+        if options['dry_run']:
+            count = candidates(cutoff).count()
+            self.stdout.write(self.style.SUCCESS(f'{count} reviewed reports from before {cutoff:%Y-%m-%d} would be archived'))
+            return
+
+        progress = Throughput()
+        batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            batches += 1
+            progress.add(moved)
+            self.stdout.write(f'Archived {progress}')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully archived {progress.rows} reports'))
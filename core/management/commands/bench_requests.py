@@ -0,0 +1,65 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = (
+        'Measures requests per second and latency of an endpoint on a running server. '
+        'To compare database pooling, run it once against a server started with DB_POOL=true '
+        'and once against one started without it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', type=str, help='Full URL to request, e.g. http://localhost:8000/api/alerts/')
+        parser.add_argument('--requests', type=int, default=2000, help='Number of measured requests')
+        parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent clients')
+        parser.add_argument('--warmup', type=int, default=100, help='Requests sent before measuring')
+        parser.add_argument('--token', type=str, help='Access token sent as a Bearer token')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        if options['warmup'] < 0:
+            raise CommandError('--warmup cannot be negative')
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else {}
+        local = threading.local()
+
+        def fetch(_):
+            # One keep-alive session per client thread
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+                session.headers.update(headers)
+            started = time.perf_counter()
+            try:
+                ok = session.get(options['url'], timeout=30).status_code < 400
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            warmup = list(executor.map(fetch, range(options['warmup'])))
+            if warmup and not any(ok for _, ok in warmup):
+                raise CommandError(f"Every warm-up request to {options['url']} failed")
+
+            started = time.perf_counter()
+            results = list(executor.map(fetch, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+
+        self.stdout.write(f"Requests:    {len(results)} ({errors} failed)")
+        self.stdout.write(f"Concurrency: {options['concurrency']}")
+        self.stdout.write(f"Throughput:  {len(results) / elapsed:.1f} requests/s")
+        self.stdout.write(
+            f"Latency:     mean {statistics.fmean(latencies):.1f} ms, p50 {quantiles[49]:.1f} ms, "
+            f"p95 {quantiles[94]:.1f} ms, p99 {quantiles[98]:.1f} ms"
+        )
@@ -0,0 +1,267 @@
+import math
+import uuid
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import accumulate
+from random import Random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import alert_cache
+from core.geo import encode_geohash
+from core.models import Alert, DiseaseType, PestType, PlantType, Report, User
+from core.seeding import Throughput, explicit_timestamps
+
+NAMESPACE = uuid.UUID('5b8f3c1e-4a57-4d8e-9c1a-2f6d7e8a9b0c')
+
+# (state, city, latitude, longitude, relative share of users)
+REGIONS = [
+    ('Lagos', 'Ikeja', 6.60, 3.35, 20),
+    ('Lagos', 'Epe', 6.58, 3.98, 4),
+    ('Kano', 'Kano', 12.00, 8.52, 14),
+    ('Kano', 'Wudil', 11.79, 8.84, 3),
+    ('Kaduna', 'Zaria', 11.08, 7.71, 8),
+    ('Kaduna', 'Kaduna', 10.52, 7.44, 7),
+    ('Oyo', 'Ibadan', 7.38, 3.95, 10),
+    ('Oyo', 'Ogbomoso', 8.13, 4.24, 4),
+    ('Benue', 'Makurdi', 7.73, 8.54, 6),
+    ('Plateau', 'Jos', 9.90, 8.86, 5),
+    ('Niger', 'Minna', 9.58, 6.55, 5),
+    ('Enugu', 'Enugu', 6.45, 7.51, 5),
+    ('Rivers', 'Port Harcourt', 4.82, 7.03, 5),
+    ('Borno', 'Maiduguri', 11.83, 13.15, 4),
+]
+
+INSPECTOR_SHARE = 0.05
+DISEASE_RATE = 0.45
+PEST_RATE = 0.3
+DROUGHT_RATE = 0.35
+ALERT_SEVERITIES = (['info', 'warning', 'danger'], [50, 35, 15])
+# Share of reports reviewed once they are this many days old
+REVIEWED_SHARE = 0.9
+REVIEW_RAMP_DAYS = 30
+
+
+def stable_uuid(seed, kind, index):
+    """Same id for the same seed and index, whichever worker builds the row."""
+    return uuid.uuid5(NAMESPACE, f'{seed}:{kind}:{index}')
+
+
+class Command(BaseCommand):
+    help = 'Generates a reproducible synthetic dataset of users, reports and alerts for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Number of users')
+        parser.add_argument('--reports', type=int, default=1000000, help='Number of reports')
+        parser.add_argument('--alerts', type=int, default=2000, help='Number of alerts')
+        parser.add_argument('--days', type=int, default=365,
+                          help='Spread timestamps over this many days before now')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                          help='Number of rows inserted per transaction')
+        parser.add_argument('--workers', type=int, default=4,
+                          help='Number of batches inserted in parallel')
+
+    def handle(self, *args, **options):
+        self.seed = options['seed']
+        self.days = options['days']
+        self.batch_size = options['batch_size']
+        self.now = timezone.now().replace(microsecond=0)
+        workers = options['workers']
+        if options['users'] < 1 and (options['reports'] or options['alerts']):
+            raise CommandError('Reports and alerts need at least one user')
+        if connection.vendor == 'sqlite' and workers > 1:
+            # SQLite allows a single writer; parallel batches would only contend for the lock
+            self.stdout.write(self.style.WARNING('SQLite does not support parallel writes, using one worker'))
+            workers = 1
+
+        self.plan_users(options['users'])
+        self.plant_types = list(PlantType.objects.values_list('id', 'name'))
+        self.disease_types = list(DiseaseType.objects.values_list('id', 'name'))
+        self.pest_types = list(PestType.objects.values_list('id', 'name'))
+        if not self.plant_types:
+            self.stdout.write(self.style.WARNING('No plant types found, reports will have no plant type'))
+        # Hashing once keeps user generation cheap; every user shares the password
+        self.password = make_password(f'loadtest-{self.seed}')
+
+        with explicit_timestamps(User, 'created_at', 'last_active'), \
+                explicit_timestamps(Report, 'timestamp', 'updated_at'), \
+                explicit_timestamps(Alert, 'created_at', 'updated_at'):
+            self.insert('users', options['users'], self.build_users, workers)
+            self.insert('reports', options['reports'], self.build_reports, workers)
+            self.insert('alerts', options['alerts'], self.build_alerts, workers)
+
+        # Bulk inserts skip the signals that maintain rollups, counters and alert caches
+        call_command('rebuild_report_rollups', stdout=self.stdout)
+        call_command('reconcile_report_counters', stdout=self.stdout)
+        alert_cache.invalidate(*{region[0] for region in REGIONS})
+        self.stdout.write(self.style.SUCCESS('Successfully generated load test data'))
+
+    def plan_users(self, count):
+        """
+        Assign every user a region and role up front.
+
+        Reports pick their author by index, so they can be built in any
+        order without querying the users back.
+        """
+        rng = Random(f'{self.seed}:plan')
+        weights = [region[4] for region in REGIONS]
+        self.user_regions = rng.choices(range(len(REGIONS)), weights=weights, k=count)
+        self.inspectors = [index for index in range(count) if rng.random() < INSPECTOR_SHARE]
+        if count and not self.inspectors:
+            self.inspectors = [0]
+        inspector_set = set(self.inspectors)
+        self.user_roles = ['inspector' if index in inspector_set else 'farmer' for index in range(count)]
+        self.inspectors_by_state = {}
+        for index in self.inspectors:
+            self.inspectors_by_state.setdefault(REGIONS[self.user_regions[index]][0], []).append(index)
+        # A few very active farmers submit most reports (Zipf-like activity)
+        self.activity = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(count)))
+        self.activity_order = list(range(count))
+        rng.shuffle(self.activity_order)
+
+    def insert(self, name, total, build, workers):
+        if not total:
+            return
+        batches = math.ceil(total / self.batch_size)
+        progress = Throughput()
+
+        def run(batch):
+            start = batch * self.batch_size
+            rows = build(Random(f'{self.seed}:{name}:{batch}'), start, min(start + self.batch_size, total))
+            try:
+                with transaction.atomic():
+                    # Ids are derived from the seed, so re-running is a no-op
+                    type(rows[0]).objects.bulk_create(rows, ignore_conflicts=True)
+            finally:
+                # Worker threads each hold their own connection
+                connection.close()
+            return len(rows)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for count in executor.map(run, range(batches)):
+                progress.add(count)
+                self.stdout.write(f'Inserted {name}: {progress}')
+
+    def random_time(self, rng):
+        """A time in the last `days` days, busier in the growing season and by day."""
+        while True:
+            offset = rng.random() * self.days
+            moment = self.now - timedelta(days=offset)
+            # Seasonal cycle peaking in July, when pest and disease pressure is highest
+            season = 0.6 + 0.4 * math.cos(2 * math.pi * (moment.timetuple().tm_yday - 196) / 365)
+            if rng.random() < season:
+                break
+        hour = min(max(rng.gauss(11, 3), 5), 20)
+        moment = moment.replace(hour=int(hour), minute=int(hour % 1 * 60), second=rng.randrange(60), microsecond=0)
+        return min(moment, self.now)
+
+    def position(self, rng, region):
+        _, _, lat, lng, _ = REGIONS[region]
+        return lat + rng.gauss(0, 0.15), lng + rng.gauss(0, 0.15)
+
+    def build_users(self, rng, start, stop):
+        users = []
+        for index in range(start, stop):
+            region = self.user_regions[index]
+            state, city = REGIONS[region][:2]
+            lat, lng = self.position(rng, region)
+            created_at = self.now - timedelta(days=rng.random() * self.days)
+            users.append(User(
+                id=stable_uuid(self.seed, 'user', index),
+                phone=f'+999{self.seed % 1000:03d}{index:09d}',
+                password=self.password,
+                role=self.user_roles[index],
+                full_name=f'Load Test User {index}',
+                city=city,
+                state=state,
+                gps_lat=lat,
+                gps_lng=lng,
+                created_at=created_at,
+                last_active=created_at + (self.now - created_at) * rng.random(),
+            ))
+        return users
+
+    def detection(self, rng, catalog, rate, id_key):
+        if not catalog or rng.random() >= rate:
+            return None
+        detected_id, name = rng.choice(catalog)
+        return {id_key: str(detected_id), 'name': name, 'confidence': round(rng.betavariate(8, 2), 3)}
+
+    def build_reports(self, rng, start, stop):
+        reports = []
+        total_activity = self.activity[-1]
+        for index in range(start, stop):
+            author = self.activity_order[bisect(self.activity, rng.random() * total_activity)]
+            region = self.user_regions[author]
+            state, city = REGIONS[region][:2]
+            lat, lng = self.position(rng, region)
+            timestamp = self.random_time(rng)
+
+            plant = rng.choice(self.plant_types) if self.plant_types else None
+            drought = None
+            if rng.random() < DROUGHT_RATE:
+                drought = {'droughtLevel': min(int(rng.expovariate(0.8)), 5)}
+
+            age_days = (self.now - timestamp).total_seconds() / 86400
+            reviewed = rng.random() < REVIEWED_SHARE * min(age_days / REVIEW_RAMP_DAYS, 1)
+            reviewer = None
+            reviewed_at = None
+            if reviewed:
+                reviewer = rng.choice(self.inspectors_by_state.get(state) or self.inspectors)
+                reviewed_at = min(timestamp + timedelta(days=rng.expovariate(0.5)), self.now)
+
+            reports.append(Report(
+                id=stable_uuid(self.seed, 'report', index),
+                user_id=stable_uuid(self.seed, 'user', author),
+                plant_type_id=plant[0] if plant else None,
+                image_url=f'https://example.com/load-test/{index}.jpg',
+                timestamp=timestamp,
+                updated_at=reviewed_at or timestamp,
+                gps_lat=lat,
+                gps_lng=lng,
+                geohash=encode_geohash(lat, lng),
+                city=city,
+                state=state,
+                plant_detection={
+                    'plantId': str(plant[0]), 'name': plant[1],
+                    'confidence': round(rng.betavariate(9, 1.5), 3)
+                } if plant else None,
+                disease_detection=self.detection(rng, self.disease_types, DISEASE_RATE, 'diseaseId'),
+                pest_detection=self.detection(rng, self.pest_types, PEST_RATE, 'pestId'),
+                drought_detection=drought,
+                status='reviewed' if reviewed else 'submitted',
+                reviewed_by_id=stable_uuid(self.seed, 'user', reviewer) if reviewed else None,
+                reviewed_at=reviewed_at,
+            ))
+        return reports
+
+    def build_alerts(self, rng, start, stop):
+        alerts = []
+        severities, weights = ALERT_SEVERITIES
+        region_weights = [region[4] for region in REGIONS]
+        for index in range(start, stop):
+            region = rng.choices(range(len(REGIONS)), weights=region_weights)[0]
+            state, city = REGIONS[region][:2]
+            created_at = self.random_time(rng)
+            severity = rng.choices(severities, weights=weights)[0]
+            # Most alerts target a city, the rest the whole state
+            target_city = city if rng.random() < 0.7 else None
+            alerts.append(Alert(
+                id=stable_uuid(self.seed, 'alert', index),
+                title=f'{severity.title()} alert for {target_city or state}',
+                description='Synthetic alert generated for load testing.',
+                severity=severity,
+                target_state=state,
+                target_city=target_city,
+                created_by_id=stable_uuid(self.seed, 'user', rng.choice(self.inspectors)),
+                created_at=created_at,
+                updated_at=created_at,
+                expires_at=created_at + timedelta(days=rng.uniform(1, 14)),
+            ))
+        return alerts
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import ArchivedReport, Report, ReportRollup
+from core.rollups import ROLLUP_FIELDS, aggregate_reports
+
+class Command(BaseCommand):
+    help = 'Rebuilds the report rollup table from the live and archived reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                          help='Number of rollup rows inserted per query')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                          help='Number of reports fetched per database round trip')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Reports created while the scan runs may be missed; run during a quiet period
+        totals, reviewed = aggregate_reports(Report.objects.all(), chunk_size=options['chunk_size'])
+        # Archived reports keep counting towards the statistics
+        archived_totals, archived_reviewed = aggregate_reports(
+            ArchivedReport.objects.all(), chunk_size=options['chunk_size']
+        )
+        totals.update(archived_totals)
+        reviewed.update(archived_reviewed)
+
+        rollups = [
+            ReportRollup(report_count=count, reviewed_count=reviewed[key], **dict(zip(ROLLUP_FIELDS, key)))
+            for key, count in totals.items()
+        ]
+
+        with transaction.atomic():
+            ReportRollup.objects.all().delete()
+            ReportRollup.objects.bulk_create(rollups, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully rebuilt {len(rollups)} rollup rows from {sum(totals.values())} reports'
+        ))
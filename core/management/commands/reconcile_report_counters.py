@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.counters import aggregate_counts
+from core.models import ArchivedReport, Report, UserReportStats
+
+class Command(BaseCommand):
+    help = 'Repairs per-user report counters that have drifted from the live and archived reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                          help='Only list the users whose counters are wrong')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                          help='Number of counter rows written per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Counters changed by reports saved while this runs are corrected on the next run
+        actual = aggregate_counts(Report.objects.all())
+        # Archived reports still count towards their user's totals
+        for user_id, (total, reviewed) in aggregate_counts(ArchivedReport.objects.all()).items():
+            live_total, live_reviewed = actual.get(user_id, (0, 0))
+            actual[user_id] = (live_total + total, live_reviewed + reviewed)
+        stored = {
+            stats.user_id: stats
+            for stats in UserReportStats.objects.all().iterator(chunk_size=batch_size)
+        }
+
+        to_create = []
+        to_update = []
+        for user_id, (total, reviewed) in actual.items():
+            stats = stored.pop(user_id, None)
+            if stats is None:
+                to_create.append(UserReportStats(user_id=user_id, report_count=total, reviewed_count=reviewed))
+            elif (stats.report_count, stats.reviewed_count) != (total, reviewed):
+                stats.report_count, stats.reviewed_count = total, reviewed
+                to_update.append(stats)
+        # Users left in stored have no reports at all
+        for stats in stored.values():
+            if stats.report_count or stats.reviewed_count:
+                stats.report_count = stats.reviewed_count = 0
+                to_update.append(stats)
+
+        for stats in to_create + to_update:
+            self.stdout.write(f'{stats.user_id}: {stats.report_count} reports, {stats.reviewed_count} reviewed')
+
+        if not options['dry_run']:
+            with transaction.atomic():
+                UserReportStats.objects.bulk_create(to_create, batch_size=batch_size)
+                UserReportStats.objects.bulk_update(
+                    to_update, ['report_count', 'reviewed_count'], batch_size=batch_size
+                )
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(to_create) + len(to_update)} of {len(actual)} users with reports'
+        ))
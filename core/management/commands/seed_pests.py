@@ -1,25 +1,75 @@
-import json
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from core.cache import bump_version
 from core.models import PestType
+from core.seeding import Checkpoint, Throughput, batched, iter_json_array
+from itertools import islice
+
+# Columns refreshed when a pest with the same name already exists
+UPSERT_FIELDS = ['description', 'treatment', 'severity', 'search_text', 'updated_at']
 
 class Command(BaseCommand):
     help = 'Seeds pest data from pests.json file'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--file', type=str, default='agriscan/data/pests.json',
+                          help='JSON array or JSON Lines file of pests')
+        parser.add_argument('--batch-size', type=int, default=500,
+                          help='Number of pests upserted per transaction')
+        parser.add_argument('--resume', action='store_true',
+                          help='Skip the pests committed by a previous run')
+        parser.add_argument('--checkpoint', type=str,
+                          help='Checkpoint file (default: <file>.checkpoint)')
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint.for_input(options['file'], options['checkpoint'])
+        skip = checkpoint.load() if options['resume'] else 0
+        progress = Throughput(start=skip)
+        created = updated = 0
+
         try:
-            # Read the JSON file
-            with open('agriscan/data/pests.json', 'r', encoding='utf-8') as file:
-                pests_data = json.load(file)
-
-            # Create pest types
-            for pest in pests_data:
-                PestType.objects.create(
-                    name=pest['name'],
-                    description=pest['description'],
-                    treatment=pest['treatment'],
-                    severity=pest['severity']
-                )
-
-            self.stdout.write(self.style.SUCCESS(f'Successfully seeded {len(pests_data)} pest types'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error seeding pest data: {str(e)}')) 
\ No newline at end of file
+            with open(options['file'], 'r', encoding='utf-8') as file:
+                if skip:
+                    self.stdout.write(f'Resuming after {skip} pests')
+                for pests in batched(islice(iter_json_array(file), skip, None), options['batch_size']):
+                    batch_created, batch_updated = self.upsert(pests)
+                    created += batch_created
+                    updated += batch_updated
+                    progress.add(len(pests))
+                    checkpoint.save(progress.rows)
+                    self.stdout.write(f'Processed {progress}')
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Error seeding pest data: {str(e)}')
+
+        checkpoint.clear()
+        # Bulk writes bypass the save signals that invalidate catalog caches
+        bump_version(PestType._meta.model_name)
+        self.stdout.write(self.style.SUCCESS(f'Successfully seeded pest types ({created} created, {updated} updated)'))
+
+    def upsert(self, pests):
+        """Create or update a batch of pests by name; returns (created, updated)."""
+        # Later rows win when a name repeats within the batch
+        rows = {pest['name']: pest for pest in pests}
+        now = timezone.now()
+
+        with transaction.atomic():
+            existing = {}
+            for pest_type in PestType.objects.select_for_update().filter(name__in=rows):
+                existing.setdefault(pest_type.name, pest_type)
+
+            to_update = []
+            to_create = []
+            for name, pest in rows.items():
+                pest_type = existing.get(name) or PestType(name=name)
+                pest_type.description = pest['description']
+                pest_type.treatment = pest['treatment']
+                pest_type.severity = pest['severity']
+                pest_type.updated_at = now
+                # bulk writes skip save(), which normally maintains the search column
+                pest_type.refresh_search_text()
+                (to_update if name in existing else to_create).append(pest_type)
+
+            PestType.objects.bulk_create(to_create)
+            PestType.objects.bulk_update(to_update, UPSERT_FIELDS)
+        return len(to_create), len(to_update)
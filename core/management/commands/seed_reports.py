@@ -1,9 +1,22 @@
-from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
 from core.models import Report, PlantType, DiseaseType, PestType, User
+from core.geo import encode_geohash
+from core.seeding import Checkpoint, Throughput, batched, explicit_timestamps
 import csv
+import hashlib
 import random
-from datetime import datetime, timedelta
+from datetime import timedelta
+from itertools import islice
+
+# Columns refreshed when a seeded report already exists. timestamp is left
+# alone, so re-running the seed does not move reports to other days.
+UPSERT_FIELDS = [
+    'plant_type', 'image_url', 'updated_at', 'gps_lat', 'gps_lng', 'geohash',
+    'city', 'state', 'plant_detection', 'disease_detection', 'pest_detection', 'drought_detection'
+]
 
 class Command(BaseCommand):
     help = 'Seeds reports data from a CSV file'
@@ -12,95 +25,131 @@ class Command(BaseCommand):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file')
         parser.add_argument('--supabase-url', type=str, default='https://gktbuzdsfdyukggnipqd.supabase.co/storage/v1/object/public/plants/',
                           help='Supabase storage URL')
+        parser.add_argument('--user-id', type=str, default='fee1530c-e457-453e-971d-cb637f842b7a',
+                          help='ID of the user the reports are created for')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                          help='Number of CSV rows inserted per transaction')
+        parser.add_argument('--seed', type=int, help='Random seed for generated values')
+        parser.add_argument('--resume', action='store_true',
+                          help='Skip the rows committed by a previous run')
+        parser.add_argument('--checkpoint', type=str,
+                          help='Checkpoint file (default: <csv_file>.checkpoint)')
+        parser.add_argument('--skip-rollups', action='store_true',
+                          help='Do not rebuild report rollups and user counters afterwards')
 
     def handle(self, *args, **options):
         csv_file = options['csv_file']
-        supabase_url = options['supabase_url']
+        self.supabase_url = options['supabase_url']
+        self.random = random.Random(options['seed'])
 
-        # Get the default user
-        default_user = User.objects.get(id='fee1530c-e457-453e-971d-cb637f842b7a')
+        try:
+            self.user = User.objects.get(id=options['user_id'])
+        except User.DoesNotExist:
+            raise CommandError(f"User not found: {options['user_id']}")
 
         # Get all plant types, disease types, and pest types
-        plant_types = {pt.name.lower(): pt for pt in PlantType.objects.all()}
-        disease_types = {dt.name.lower(): dt for dt in DiseaseType.objects.all()}
-        pest_types = {pt.name.lower(): pt for pt in PestType.objects.all()}
-
-        # Generate random locations in India
-        def random_location():
-            # Rough bounding box for India
-            lat = random.uniform(8.4, 37.6)
-            lng = random.uniform(68.7, 97.4)
-            return lat, lng
+        self.plant_types = {pt.name.lower(): pt for pt in PlantType.objects.all()}
+        self.disease_types = {dt.name.lower(): dt for dt in DiseaseType.objects.all()}
+        self.pest_types = list(PestType.objects.all())
 
         # Generate random cities and states
-        cities = ['Mumbai', 'Delhi', 'Bangalore', 'Hyderabad', 'Chennai', 'Kolkata', 'Pune', 'Ahmedabad', 'Jaipur', 'Lucknow']
-        states = ['Maharashtra', 'Delhi', 'Karnataka', 'Telangana', 'Tamil Nadu', 'West Bengal', 'Gujarat', 'Rajasthan', 'Uttar Pradesh']
-
-        with open(csv_file, 'r') as file:
-            reader = csv.DictReader(file)
-            reports_to_create = []
-
-            for row in reader:
-                # Get the plant type
-                plant_name = row['plant_name'].lower()
-                if plant_name not in plant_types:
-                    self.stdout.write(self.style.WARNING(f"Plant type not found: {plant_name}"))
-                    continue
-
-                # Generate random confidence values
-                plant_confidence = random.uniform(0.85, 0.99)
-                disease_confidence = random.uniform(0.85, 0.99) if row['disease'] != 'healthy' else 0.0
-                pest_confidence = random.uniform(0.85, 0.99) if row['pest_risk'] != 'low' else 0.0
-
-                # Get disease type if not healthy
-                disease_type = None
-                if row['disease'] != 'healthy':
-                    disease_name = row['disease'].lower()
-                    if disease_name in disease_types:
-                        disease_type = disease_types[disease_name]
-
-                # Get pest type based on risk level
-                pest_type = None
-                if row['pest_risk'] != 'low':
-                    # Randomly select a pest type
-                    pest_type = random.choice(list(pest_types.values()))
-
-                # Generate random timestamp within the last 30 days
-                timestamp = timezone.now() - timedelta(days=random.randint(0, 30))
-
-                # Generate random location
-                lat, lng = random_location()
-                city = random.choice(cities)
-                state = random.choice(states)
-
-                # Create the report
-                report = Report(
-                    user=default_user,
-                    plant_type=plant_types[plant_name],
-                    image_url=f"{supabase_url}{row['image_path']}",
-                    timestamp=timestamp,
-                    gps_lat=lat,
-                    gps_lng=lng,
-                    city=city,
-                    state=state,
-                    plant_detection={
-                        'confidence': plant_confidence,
-                        'plant_type_id': str(plant_types[plant_name].id)
-                    },
-                    disease_detection={
-                        'confidence': disease_confidence,
-                        'disease_type_id': str(disease_type.id) if disease_type else None
-                    } if disease_type else None,
-                    pest_detection={
-                        'confidence': pest_confidence,
-                        'pest_type_id': str(pest_type.id) if pest_type else None
-                    } if pest_type else None,
-                    drought_detection={
-                        'level': row['drought_stress_level'] if row['drought_stress_level'] else None
-                    } if row['drought_stress_level'] else None
-                )
-                reports_to_create.append(report)
-
-            # Bulk create the reports
-            Report.objects.bulk_create(reports_to_create)
-            self.stdout.write(self.style.SUCCESS(f'Successfully created {len(reports_to_create)} reports')) 
\ No newline at end of file
+        self.cities = ['Mumbai', 'Delhi', 'Bangalore', 'Hyderabad', 'Chennai', 'Kolkata', 'Pune', 'Ahmedabad', 'Jaipur', 'Lucknow']
+        self.states = ['Maharashtra', 'Delhi', 'Karnataka', 'Telangana', 'Tamil Nadu', 'West Bengal', 'Gujarat', 'Rajasthan', 'Uttar Pradesh']
+        self.missing_plants = set()
+
+        checkpoint = Checkpoint.for_input(csv_file, options['checkpoint'])
+        skip = checkpoint.load() if options['resume'] else 0
+        progress = Throughput(start=skip)
+        created = 0
+
+        with open(csv_file, 'r', newline='') as file:
+            reader = islice(csv.DictReader(file), skip, None)
+            if skip:
+                self.stdout.write(f'Resuming after {skip} rows')
+
+            for rows in batched(reader, options['batch_size']):
+                reports = [report for report in map(self.build_report, rows) if report]
+                # timestamp is auto_now_add; keep the generated history instead
+                with transaction.atomic(), explicit_timestamps(Report, 'timestamp', 'updated_at'):
+                    Report.objects.bulk_create(
+                        reports,
+                        update_conflicts=True,
+                        unique_fields=['user', 'client_id'],
+                        update_fields=UPSERT_FIELDS
+                    )
+                created += len(reports)
+                progress.add(len(rows))
+                checkpoint.save(progress.rows)
+                self.stdout.write(f'Processed {progress}')
+
+        checkpoint.clear()
+        # Bulk upserts bypass the save signals that maintain rollups and counters
+        if not options['skip_rollups']:
+            call_command('rebuild_report_rollups', stdout=self.stdout)
+            call_command('reconcile_report_counters', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Successfully seeded {created} reports'))
+
+    def build_report(self, row):
+        # Get the plant type
+        plant_name = row['plant_name'].lower()
+        if plant_name not in self.plant_types:
+            if plant_name not in self.missing_plants:
+                self.missing_plants.add(plant_name)
+                self.stdout.write(self.style.WARNING(f"Plant type not found: {plant_name}"))
+            return None
+        plant_type = self.plant_types[plant_name]
+        rng = self.random
+
+        # Generate random confidence values
+        plant_confidence = rng.uniform(0.85, 0.99)
+        disease_confidence = rng.uniform(0.85, 0.99) if row['disease'] != 'healthy' else 0.0
+        pest_confidence = rng.uniform(0.85, 0.99) if row['pest_risk'] != 'low' else 0.0
+
+        # Get disease type if not healthy
+        disease_type = None
+        if row['disease'] != 'healthy':
+            disease_type = self.disease_types.get(row['disease'].lower())
+
+        # Get pest type based on risk level
+        pest_type = None
+        if row['pest_risk'] != 'low' and self.pest_types:
+            # Randomly select a pest type
+            pest_type = rng.choice(self.pest_types)
+
+        # Generate random timestamp within the last 30 days
+        now = timezone.now()
+        timestamp = now - timedelta(days=rng.randint(0, 30))
+
+        # Generate random location in India (rough bounding box)
+        lat = rng.uniform(8.4, 37.6)
+        lng = rng.uniform(68.7, 97.4)
+
+        return Report(
+            user=self.user,
+            # Natural key, so re-running the seed updates rather than duplicates
+            client_id='seed-' + hashlib.sha1(row['image_path'].encode()).hexdigest(),
+            plant_type=plant_type,
+            image_url=f"{self.supabase_url}{row['image_path']}",
+            timestamp=timestamp,
+            updated_at=now,
+            gps_lat=lat,
+            gps_lng=lng,
+            geohash=encode_geohash(lat, lng),
+            city=rng.choice(self.cities),
+            state=rng.choice(self.states),
+            plant_detection={
+                'confidence': plant_confidence,
+                'plant_type_id': str(plant_type.id)
+            },
+            disease_detection={
+                'confidence': disease_confidence,
+                'disease_type_id': str(disease_type.id)
+            } if disease_type else None,
+            pest_detection={
+                'confidence': pest_confidence,
+                'pest_type_id': str(pest_type.id)
+            } if pest_type else None,
+            drought_detection={
+                'level': row['drought_stress_level']
+            } if row['drought_stress_level'] else None
+        )
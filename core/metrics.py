@@ -0,0 +1,16 @@
+"""
+Registry of runtime metrics exposed by MetricsView.
+
+Modules register a callable under a name; the callable returns a JSON
+serializable dict and is evaluated on each metrics request.
+"""
+
+_providers = {}
+
+
+def register(name, provider):
+    _providers[name] = provider
+
+
+def collect():
+    return {name: provider() for name, provider in _providers.items()}
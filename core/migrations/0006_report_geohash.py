@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+from core.geo import encode_geohash
+
+
+def populate_geohash(apps, schema_editor):
+    Report = apps.get_model('core', 'Report')
+    batch = []
+    for report in Report.objects.only('id', 'gps_lat', 'gps_lng').iterator(chunk_size=2000):
+        report.geohash = encode_geohash(report.gps_lat, report.gps_lng)
+        batch.append(report)
+        if len(batch) >= 2000:
+            Report.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Report.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_pesttype'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
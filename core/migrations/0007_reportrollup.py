@@ -0,0 +1,46 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:24
+
+from django.db import migrations, models
+
+from core.rollups import ROLLUP_FIELDS, aggregate_reports
+
+
+def populate_rollups(apps, schema_editor):
+    Report = apps.get_model('core', 'Report')
+    ReportRollup = apps.get_model('core', 'ReportRollup')
+    totals, reviewed = aggregate_reports(Report.objects.all())
+    ReportRollup.objects.bulk_create([
+        ReportRollup(report_count=count, reviewed_count=reviewed[key], **dict(zip(ROLLUP_FIELDS, key)))
+        for key, count in totals.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_report_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('state', models.CharField(max_length=100)),
+                ('city', models.CharField(max_length=100)),
+                ('disease_id', models.CharField(blank=True, default='', max_length=64)),
+                ('pest_id', models.CharField(blank=True, default='', max_length=64)),
+                ('report_count', models.IntegerField(default=0)),
+                ('reviewed_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'day'], name='rollup_state_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'state', 'city', 'disease_id', 'pest_id'), name='unique_report_rollup'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
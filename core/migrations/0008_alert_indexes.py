@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_reportrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['target_state', 'target_city', 'expires_at'], name='alert_region_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['created_at'], name='alert_created_idx'),
+        ),
+    ]
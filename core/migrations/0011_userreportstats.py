@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def populate_counters(apps, schema_editor):
+    Report = apps.get_model('core', 'Report')
+    UserReportStats = apps.get_model('core', 'UserReportStats')
+    rows = Report.objects.order_by().values('user_id').annotate(
+        total=Count('id'), reviewed=Count('id', filter=Q(status='reviewed'))
+    )
+    UserReportStats.objects.bulk_create([
+        UserReportStats(user_id=row['user_id'], report_count=row['total'], reviewed_count=row['reviewed'])
+        for row in rows
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserReportStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='report_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('report_count', models.IntegerField(default=0)),
+                ('reviewed_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:48
+
+from django.db import migrations, models
+
+from core.search import search_document
+
+CATALOG_MODELS = ['DiseaseType', 'PestType']
+CATALOG_TABLES = ['core_diseasetype', 'core_pesttype']
+
+
+def populate_search_text(apps, schema_editor):
+    for model_name in CATALOG_MODELS:
+        model = apps.get_model('core', model_name)
+        batch = []
+        for row in model.objects.only('id', 'name', 'description').iterator(chunk_size=2000):
+            row.search_text = search_document(row.name, row.description)
+            batch.append(row)
+        model.objects.bulk_update(batch, ['search_text'], batch_size=2000)
+
+
+def create_search_indexes(apps, schema_editor):
+    # GIN indexes and pg_trgm only exist on PostgreSQL; elsewhere the search
+    # filter falls back to scanning the normalized column
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in CATALOG_TABLES:
+        # Must match core.search.SearchDocument for the planner to use it
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_search_fts_idx ON {table} "
+            f"USING gin (to_tsvector('simple'::regconfig, search_text))"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_search_trgm_idx ON {table} "
+            f"USING gin (search_text gin_trgm_ops)"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in CATALOG_TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_fts_idx')
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_userreportstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diseasetype',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='pesttype',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
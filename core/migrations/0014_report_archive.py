@@ -0,0 +1,65 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_report_review_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReport',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('image_url', models.URLField()),
+                ('timestamp', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('gps_lat', models.FloatField()),
+                ('gps_lng', models.FloatField()),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=100)),
+                ('geohash', models.CharField(blank=True, db_index=True, max_length=12)),
+                ('plant_detection', models.JSONField(blank=True, null=True)),
+                ('disease_detection', models.JSONField(blank=True, null=True)),
+                ('pest_detection', models.JSONField(blank=True, null=True)),
+                ('drought_detection', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('client_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['status', 'timestamp'], name='report_archive_scan_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedreport',
+            name='plant_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.planttype'),
+        ),
+        migrations.AddField(
+            model_name='archivedreport',
+            name='reviewed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedreport',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reports', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreport',
+            index=models.Index(fields=['state', 'timestamp'], name='archived_report_region_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreport',
+            index=models.Index(fields=['timestamp'], name='archived_report_time_idx'),
+        ),
+    ]
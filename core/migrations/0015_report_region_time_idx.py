@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_report_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['state', 'city', 'timestamp'], name='report_region_time_idx'),
+        ),
+    ]
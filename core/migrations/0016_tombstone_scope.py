@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-19 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_report_region_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='owner_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='state',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model_name', 'owner_id', 'deleted_at'], name='tombstone_owner_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model_name', 'state', 'deleted_at'], name='tombstone_state_deleted_idx'),
+        ),
+    ]
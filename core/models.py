@@ -1,7 +1,9 @@
 import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
+from .geo import encode_geohash
+from .search import search_document
 
 class UserManager(BaseUserManager):
     def create_user(self, phone, password=None, **extra_fields):
@@ -46,11 +48,29 @@ class PlantType(models.Model):
     name = models.CharField(max_length=100)
     scientific_name = models.CharField(max_length=100)
     common_diseases = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.name} ({self.scientific_name})"
 
-class DiseaseType(models.Model):
+class SearchableCatalog(models.Model):
+    """Catalog entry with a normalized copy of its name and description for search."""
+    search_text = models.TextField(blank=True, default='', editable=False)
+
+    class Meta:
+        abstract = True
+
+    def refresh_search_text(self):
+        self.search_text = search_document(self.name, self.description)
+
+    def save(self, *args, **kwargs):
+        self.refresh_search_text()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'name', 'description'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'search_text'}
+        super().save(*args, **kwargs)
+
+class DiseaseType(SearchableCatalog):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
     description = models.TextField()
@@ -61,11 +81,12 @@ class DiseaseType(models.Model):
         ('medium', 'Medium'),
         ('high', 'High')
     ])
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
 
-class PestType(models.Model):
+class PestType(SearchableCatalog):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
     description = models.TextField()
@@ -76,6 +97,7 @@ class PestType(models.Model):
         ('medium', 'Medium'),
         ('high', 'High')
     ])
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -86,10 +108,12 @@ class Report(models.Model):
     plant_type = models.ForeignKey(PlantType, on_delete=models.CASCADE, null=True, blank=True)
     image_url = models.URLField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     gps_lat = models.FloatField()
     gps_lng = models.FloatField()
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     
     # Detection results
     plant_detection = models.JSONField(null=True, blank=True)
@@ -104,10 +128,123 @@ class Report(models.Model):
     notes = models.TextField(blank=True)
     reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reviewed_reports')
     reviewed_at = models.DateTimeField(null=True, blank=True)
+    # Idempotency key supplied by offline clients so retried uploads are not duplicated
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+    # Review queue lease (see core.review_queue)
+    claimed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_reports')
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], name='unique_report_client_id')
+        ]
+        indexes = [
+            models.Index(fields=['status', 'state', 'timestamp'], name='report_review_queue_idx'),
+            models.Index(fields=['status', 'timestamp'], name='report_archive_scan_idx'),
+            models.Index(fields=['state', 'city', 'timestamp'], name='report_region_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the spatial cell in step with the coordinates
+        self.geohash = encode_geohash(self.gps_lat, self.gps_lng)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'updated_at'}
+            if {'gps_lat', 'gps_lng'} & update_fields:
+                update_fields.add('geohash')
+            kwargs['update_fields'] = update_fields
+        # Rollups and user counters are adjusted by post_save in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Report {self.id} by {self.user.full_name}"
 
+class ArchivedReport(models.Model):
+    """
+    Reviewed report moved out of the Report table by archive_reports.
+
+    Mirrors the Report columns so the same serializers and filters apply;
+    archived reports still count in the rollups and user counters.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_reports')
+    plant_type = models.ForeignKey(PlantType, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    image_url = models.URLField()
+    timestamp = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    gps_lat = models.FloatField()
+    gps_lng = models.FloatField()
+    city = models.CharField(max_length=100)
+    state = models.CharField(max_length=100)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
+    plant_detection = models.JSONField(null=True, blank=True)
+    disease_detection = models.JSONField(null=True, blank=True)
+    pest_detection = models.JSONField(null=True, blank=True)
+    drought_detection = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=20)
+    notes = models.TextField(blank=True)
+    reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'timestamp'], name='archived_report_region_idx'),
+            models.Index(fields=['timestamp'], name='archived_report_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived report {self.id}"
+
+class ReportRollup(models.Model):
+    """
+    Pre-aggregated report counts per day, region, disease and pest.
+
+    Rows are adjusted incrementally as reports are created, reviewed or
+    deleted (see core.rollups) so dashboards never scan the Report table.
+    """
+    day = models.DateField()
+    state = models.CharField(max_length=100)
+    city = models.CharField(max_length=100)
+    disease_id = models.CharField(max_length=64, blank=True, default='')
+    pest_id = models.CharField(max_length=64, blank=True, default='')
+    report_count = models.IntegerField(default=0)
+    reviewed_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'state', 'city', 'disease_id', 'pest_id'],
+                name='unique_report_rollup'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['state', 'day'], name='rollup_state_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.state}/{self.city}: {self.report_count}"
+
+class UserReportStats(models.Model):
+    """
+    Denormalized report counts per user, so profiles need no scan of the
+    Report table. Kept in step by core.counters and repaired with the
+    reconcile_report_counters command.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='report_stats')
+    report_count = models.IntegerField(default=0)
+    reviewed_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def pending_count(self):
+        return self.report_count - self.reviewed_count
+
+    def __str__(self):
+        return f"{self.user_id}: {self.report_count} reports"
+
 class Alert(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
@@ -121,7 +258,34 @@ class Alert(models.Model):
     target_city = models.CharField(max_length=100, null=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_alerts')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     expires_at = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['target_state', 'target_city', 'expires_at'], name='alert_region_expiry_idx'),
+            models.Index(fields=['created_at'], name='alert_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+class Tombstone(models.Model):
+    """Record of a deleted row, so delta sync can tell clients to drop it."""
+    model_name = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64)
+    # Who may see the deletion of a report: its owner, and inspectors of its
+    # state. Not a foreign key, as the owner may be the row being deleted.
+    owner_id = models.CharField(max_length=64, blank=True, default='')
+    state = models.CharField(max_length=100, blank=True, default='')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model_name', 'deleted_at'], name='tombstone_model_deleted_idx'),
+            models.Index(fields=['model_name', 'owner_id', 'deleted_at'], name='tombstone_owner_deleted_idx'),
+            models.Index(fields=['model_name', 'state', 'deleted_at'], name='tombstone_state_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} {self.object_id} deleted at {self.deleted_at}"
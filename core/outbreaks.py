@@ -0,0 +1,335 @@
+"""
+Streaming outbreak detection over incoming report detections.
+
+For every (state, city, disease or pest) the detector keeps hourly report
+counts covering the detection window plus the baseline period before it,
+so observing a report is O(1) amortized. When the number of distinct
+reporters in the current window exceeds both a minimum and a multiple of
+the baseline report rate, an Alert for the region is created, or the
+existing one is extended. Disease and pest ids that are not in the
+catalog are ignored.
+
+The live detector loads a region's windows from the Report table the
+first time it sees the region, and reloads them once they are older than
+OUTBREAK_SYNC_SECONDS. Reloads run on a background thread, so the submit
+path only ever updates the in-memory windows. Reports submitted to other
+worker processes, or before a restart, are therefore counted at most
+that late.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cache import get_version
+from .models import Alert, DiseaseType, PestType, Report, User
+from .rollups import disease_id, pest_id
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 3600
+
+CATALOG_MODELS = {'disease': DiseaseType, 'pest': PestType}
+
+# kind -> (catalog version, {id: name})
+_catalog_names = {}
+_catalog_lock = threading.Lock()
+
+
+def catalog_names(kind):
+    """Names of the catalog entries of a kind by id, reloaded when the catalog changes."""
+    model = CATALOG_MODELS[kind]
+    version = get_version(model._meta.model_name)
+    cached = _catalog_names.get(kind)
+    if cached is None or cached[0] != version:
+        names = {str(pk): name for pk, name in model.objects.values_list('id', 'name')}
+        with _catalog_lock:
+            cached = _catalog_names[kind] = (version, names)
+    return cached[1]
+
+
+def resolve_type(kind, type_id):
+    """The catalog id a report's disease or pest id refers to, or None if unknown."""
+    if not type_id:
+        return None
+    try:
+        type_id = str(uuid.UUID(str(type_id)))
+    except ValueError:
+        return None
+    return type_id if type_id in catalog_names(kind) else None
+
+
+class RegionWindow:
+    """
+    Hourly counts for one region and disease or pest.
+
+    Buckets inside the detection window live in ``recent_buckets``; as the
+    window slides they move to ``baseline_buckets`` and are finally dropped
+    once they fall out of the baseline period. Every bucket moves at most
+    twice, which keeps updates O(1) amortized.
+
+    Each bucket is [hour, reports, reports per reporter]. ``reporters``
+    counts the reports of each user inside the detection window, so
+    ``recent`` is the number of distinct reporters there; ``baseline`` is
+    the number of reports in the baseline period.
+    """
+
+    def __init__(self):
+        self.recent_buckets = deque()
+        self.baseline_buckets = deque()
+        self.reporters = Counter()
+        self.baseline = 0
+        self.alert_id = None
+        self.alert_expires_at = None
+
+    @property
+    def recent(self):
+        return len(self.reporters)
+
+    def add(self, bucket, user_id, window_buckets, baseline_buckets):
+        if not self.recent_buckets or bucket > self.recent_buckets[-1][0]:
+            self.recent_buckets.append([bucket, 0, Counter()])
+        # A late or same-hour report is counted in the newest bucket
+        newest = self.recent_buckets[-1]
+        newest[1] += 1
+        newest[2][user_id] += 1
+        self.reporters[user_id] += 1
+        self.slide(window_buckets, baseline_buckets)
+
+    def slide(self, window_buckets, baseline_buckets, now_bucket=None):
+        newest = self.recent_buckets[-1][0] if now_bucket is None else now_bucket
+        while self.recent_buckets and self.recent_buckets[0][0] <= newest - window_buckets:
+            moved = self.recent_buckets.popleft()
+            for user_id, reports in moved[2].items():
+                self.reporters[user_id] -= reports
+                if not self.reporters[user_id]:
+                    del self.reporters[user_id]
+            self.baseline += moved[1]
+            self.baseline_buckets.append([moved[0], moved[1]])
+        while self.baseline_buckets and self.baseline_buckets[0][0] <= newest - window_buckets - baseline_buckets:
+            self.baseline -= self.baseline_buckets.popleft()[1]
+
+
+class OutbreakDetector:
+    """
+    Sliding-window outbreak detector.
+
+    With sync_seconds set, observe_report() counts from the database: a
+    region's windows are rebuilt from its reports whenever they are older
+    than sync_seconds, and counted in memory in between. With background
+    set the rebuild runs on a worker thread instead of the caller's.
+    Without sync_seconds the detector only counts what it is given, which
+    is how history is replayed.
+    """
+
+    def __init__(self, create_alerts=True, sync_seconds=None, background=False):
+        self.create_alerts = create_alerts
+        self.sync_seconds = sync_seconds
+        self.background = background
+        self.window_buckets = settings.OUTBREAK_WINDOW_HOURS
+        self.baseline_buckets = settings.OUTBREAK_BASELINE_DAYS * 24
+        self.min_reports = settings.OUTBREAK_MIN_REPORTS
+        self.factor = settings.OUTBREAK_THRESHOLD_FACTOR
+        self.alert_duration = timedelta(hours=settings.OUTBREAK_ALERT_HOURS)
+        self._windows = {}
+        self._synced_at = {}
+        self._loading = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def observe_report(self, report):
+        """Count a committed report; returns the outbreaks it triggered."""
+        counted = False
+        if self.sync_seconds is not None:
+            region = (report.state, report.city)
+            with self._lock:
+                synced_at = self._synced_at.get(region)
+                stale = synced_at is None or time.monotonic() - synced_at >= self.sync_seconds
+                if stale and self.background:
+                    stale = region not in self._loading
+                    self._loading.add(region)
+            if stale and self.background:
+                self._get_executor().submit(self._load_in_background, region)
+            elif stale:
+                # The report is committed, so the reload already includes it
+                self.load_region(*region)
+                counted = True
+        return self.observe(
+            report.timestamp, report.state, report.city,
+            disease_id(report.disease_detection), pest_id(report.pest_detection),
+            report.user_id, counted=counted
+        )
+
+    def observe(self, timestamp, state, city, disease, pest, user_id, counted=False):
+        """Count one report (unless already counted); returns the outbreaks it triggered."""
+        triggered = []
+        for kind, type_id in (('disease', disease), ('pest', pest)):
+            type_id = resolve_type(kind, type_id)
+            if type_id:
+                outbreak = self._observe_key((state, city, kind, type_id), timestamp, user_id, counted)
+                if outbreak:
+                    triggered.append(outbreak)
+        return triggered
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outbreak-sync')
+            return self._executor
+
+    def _load_in_background(self, region):
+        try:
+            self.load_region(*region)
+        except Exception:
+            logger.exception('Could not load outbreak windows for %s, %s', region[1], region[0])
+        finally:
+            with self._lock:
+                self._loading.discard(region)
+            # This thread's connections would otherwise stay open
+            connections.close_all()
+
+    def load_region(self, state, city):
+        """Rebuild the windows of one region from its reports in the database."""
+        now = timezone.now()
+        since = now - timedelta(hours=self.window_buckets + self.baseline_buckets)
+        rows = Report.objects.filter(
+            state=state, city=city, timestamp__gte=since, timestamp__lte=now
+        ).order_by('timestamp').values_list('timestamp', 'user_id', 'disease_detection', 'pest_detection')
+
+        windows = {}
+        for timestamp, user_id, disease_detection, pest_detection in rows.iterator(chunk_size=2000):
+            bucket = int(timestamp.timestamp()) // BUCKET_SECONDS
+            for kind, type_id in (('disease', disease_id(disease_detection)), ('pest', pest_id(pest_detection))):
+                type_id = resolve_type(kind, type_id)
+                if type_id:
+                    key = (state, city, kind, type_id)
+                    window = windows.get(key)
+                    if window is None:
+                        window = windows[key] = RegionWindow()
+                    window.add(bucket, user_id, self.window_buckets, self.baseline_buckets)
+        # Slide every window up to the present, not just to its newest report
+        now_bucket = int(now.timestamp()) // BUCKET_SECONDS
+        for window in windows.values():
+            window.slide(self.window_buckets, self.baseline_buckets, now_bucket)
+
+        with self._lock:
+            for key in [key for key in self._windows if key[:2] == (state, city)]:
+                old = self._windows.pop(key)
+                if key in windows:
+                    # Keep track of the alert this process raised or extended
+                    windows[key].alert_id = old.alert_id
+                    windows[key].alert_expires_at = old.alert_expires_at
+            self._windows.update(windows)
+            self._synced_at[(state, city)] = time.monotonic()
+
+    def threshold(self, window):
+        # Expected reports per detection window, judging by the baseline
+        # period; compared against distinct reporters, so it errs high
+        expected = window.baseline * self.window_buckets / self.baseline_buckets
+        return max(self.min_reports, self.factor * expected)
+
+    def _observe_key(self, key, timestamp, user_id, counted):
+        bucket = int(timestamp.timestamp()) // BUCKET_SECONDS
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = RegionWindow()
+            if not counted:
+                window.add(bucket, user_id, self.window_buckets, self.baseline_buckets)
+
+            threshold = self.threshold(window)
+            if window.recent < threshold:
+                return None
+
+            expires_at = timestamp + self.alert_duration
+            # Extend at most once per hour to keep the submit path cheap
+            if window.alert_expires_at and window.alert_expires_at > timestamp:
+                if expires_at - window.alert_expires_at < timedelta(hours=1):
+                    return None
+            outbreak = {
+                'state': key[0],
+                'city': key[1],
+                'kind': key[2],
+                'type_id': key[3],
+                'count': window.recent,
+                'threshold': threshold,
+                'timestamp': timestamp,
+                'expires_at': expires_at,
+                'alert_id': window.alert_id,
+                'extend': bool(window.alert_expires_at and window.alert_expires_at > timestamp),
+            }
+            window.alert_expires_at = expires_at
+
+        if self.create_alerts:
+            alert = self._save_alert(outbreak)
+            if alert is not None:
+                with self._lock:
+                    window.alert_id = alert.id
+                outbreak['alert_id'] = alert.id
+        return outbreak
+
+    def _save_alert(self, outbreak):
+        name = catalog_names(outbreak['kind']).get(outbreak['type_id'])
+        if name is None:
+            # Removed from the catalog since the report was counted
+            return None
+        title = f"Possible {outbreak['kind']} outbreak: {name}"
+
+        if outbreak['extend'] and outbreak['alert_id']:
+            alert = Alert.objects.filter(id=outbreak['alert_id']).first()
+        else:
+            # Pick up an alert raised before this process started
+            alert = Alert.objects.filter(
+                title=title,
+                target_state=outbreak['state'],
+                target_city=outbreak['city'],
+                expires_at__gt=outbreak['timestamp']
+            ).first()
+        if alert is not None:
+            alert.expires_at = max(alert.expires_at, outbreak['expires_at'])
+            alert.save(update_fields=['expires_at', 'updated_at'])
+            return alert
+
+        created_by = alert_author()
+        if created_by is None:
+            logger.warning('No user configured for outbreak alerts; set OUTBREAK_ALERT_USER_ID')
+            return None
+
+        severity = 'danger' if outbreak['count'] >= 2 * outbreak['threshold'] else 'warning'
+        # One transaction, so the alert caches and events see the final created_at
+        with transaction.atomic():
+            alert = Alert.objects.create(
+                title=title,
+                description=(
+                    f"{outbreak['count']} farmers reported {name} in {outbreak['city']}, {outbreak['state']} "
+                    f"in the last {self.window_buckets} hours."
+                ),
+                severity=severity,
+                target_state=outbreak['state'],
+                target_city=outbreak['city'],
+                created_by=created_by,
+                expires_at=outbreak['expires_at'],
+            )
+            if timezone.now() - outbreak['timestamp'] > timedelta(minutes=1):
+                # Replayed outbreak; date the alert to when it happened. Saved
+                # through the model so alert_changed updates the caches.
+                alert.created_at = outbreak['timestamp']
+                alert.save(update_fields=['created_at'])
+        return alert
+
+
+def alert_author():
+    user_id = settings.OUTBREAK_ALERT_USER_ID
+    if user_id:
+        return User.objects.filter(id=user_id).first()
+    return User.objects.filter(is_superuser=True).order_by('created_at').first()
+
+
+detector = OutbreakDetector(sync_seconds=settings.OUTBREAK_SYNC_SECONDS, background=True)
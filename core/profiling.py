@@ -0,0 +1,205 @@
+"""
+Opt-in per-request profiling.
+
+When PROFILING_ENABLED is set, ProfilingMiddleware profiles a
+PROFILING_SAMPLE_RATE share of requests: query count and SQL time (with
+the project code that issued the slowest queries), time spent building
+serializer ``.data`` and time spent rendering JSON. Results are returned
+in response headers and kept in a ring buffer read by ProfilesView.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
+
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+THIS_FILE = str(Path(__file__).resolve())
+MAX_SQL_LENGTH = 500
+
+_current = ContextVar('profile', default=None)
+_ids = itertools.count(1)
+_buffer = deque(maxlen=getattr(settings, 'PROFILING_BUFFER_SIZE', 200))
+_buffer_lock = threading.Lock()
+
+
+class Profile:
+    def __init__(self):
+        self.id = next(_ids)
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slow = []
+        self.sections = {'serialize': 0.0, 'render': 0.0}
+        self._depth = {'serialize': 0, 'render': 0}
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.sql_time += duration
+        # The query number breaks ties, so equal durations never compare the SQL
+        if len(self.slow) < settings.PROFILING_SLOW_QUERIES:
+            heapq.heappush(self.slow, (duration, self.queries, sql[:MAX_SQL_LENGTH], query_origin()))
+        elif duration > self.slow[0][0]:
+            heapq.heapreplace(self.slow, (duration, self.queries, sql[:MAX_SQL_LENGTH], query_origin()))
+
+    def summary(self):
+        return {
+            'totalMs': _ms(time.perf_counter() - self.started),
+            'queries': self.queries,
+            'sqlMs': _ms(self.sql_time),
+            'serializeMs': _ms(self.sections['serialize']),
+            'renderMs': _ms(self.sections['render']),
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def query_origin():
+    """The innermost project frame outside this module that led to a query."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(PROJECT_ROOT) and frame.filename != THIS_FILE:
+            return f'{Path(frame.filename).relative_to(PROJECT_ROOT)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - started)
+
+
+@contextmanager
+def section(name):
+    """Time a block against the current profile; nested blocks count once."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile._depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile._depth[name] -= 1
+        if not profile._depth[name]:
+            profile.sections[name] += time.perf_counter() - started
+
+
+def _timed_property(prop, name):
+    def getter(self):
+        with section(name):
+            return prop.fget(self)
+    return property(getter)
+
+
+def _timed_method(method, name):
+    def wrapper(*args, **kwargs):
+        with section(name):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def _add_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install():
+    """Hook into database connections, serializers and the JSON renderer."""
+    from django.db import connections
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.serializers import BaseSerializer
+
+    connection_created.connect(_add_query_wrapper)
+    for connection in connections.all(initialized_only=True):
+        _add_query_wrapper(None, connection)
+    BaseSerializer.data = _timed_property(BaseSerializer.data, 'serialize')
+    JSONRenderer.render = _timed_method(JSONRenderer.render, 'render')
+
+
+def recent(limit=None):
+    with _buffer_lock:
+        entries = list(_buffer)
+    entries.reverse()
+    return entries[:limit] if limit else entries
+
+
+def _start():
+    if random.random() >= settings.PROFILING_SAMPLE_RATE:
+        return None, None
+    profile = Profile()
+    return profile, _current.set(profile)
+
+
+def _finish(request, response, profile, token):
+    _current.reset(token)
+    summary = profile.summary()
+    slow = sorted(profile.slow, reverse=True)
+    with _buffer_lock:
+        _buffer.append({
+            'id': profile.id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'timestamp': timezone.now(),
+            **summary,
+            'slowQueries': [
+                {'ms': _ms(duration), 'sql': sql, 'origin': origin}
+                for duration, _, sql, origin in slow
+            ],
+        })
+
+    response['X-Profile-Id'] = str(profile.id)
+    response['X-Profile-Queries'] = str(summary['queries'])
+    response['Server-Timing'] = ', '.join([
+        f"sql;dur={summary['sqlMs']}",
+        f"serialize;dur={summary['serializeMs']}",
+        f"render;dur={summary['renderMs']}",
+        f"total;dur={summary['totalMs']}",
+    ])
+    return response
+
+
+@sync_and_async_middleware
+def ProfilingMiddleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            profile, token = _start()
+            if profile is None:
+                return await get_response(request)
+            try:
+                response = await get_response(request)
+            except BaseException:
+                _current.reset(token)
+                raise
+            return _finish(request, response, profile, token)
+    else:
+        def middleware(request):
+            profile, token = _start()
+            if profile is None:
+                return get_response(request)
+            try:
+                response = get_response(request)
+            except BaseException:
+                _current.reset(token)
+                raise
+            return _finish(request, response, profile, token)
+    return middleware
@@ -0,0 +1,95 @@
+"""
+Work queue that hands submitted reports to inspectors without overlap.
+
+An inspector claims a batch of the oldest unclaimed submitted reports in
+their region. The claim is a lease: it lasts REVIEW_LEASE_SECONDS and is
+renewed whenever the inspector asks for work again, and reports whose
+lease ran out (the inspector went offline) go back into the queue.
+
+Candidates are selected with SELECT ... FOR UPDATE SKIP LOCKED, so
+concurrent claims pass over each other's rows instead of waiting on them
+or handing out the same report twice.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Report
+
+
+def claimable(now):
+    return Q(status='submitted') & (Q(claimed_until__isnull=True) | Q(claimed_until__lte=now))
+
+
+def held_by(inspector, now):
+    return Q(status='submitted', claimed_by=inspector, claimed_until__gt=now)
+
+
+def region_filter(state=None, city=None):
+    region = Q()
+    if state:
+        region &= Q(state=state)
+    if city:
+        region &= Q(city=city)
+    return region
+
+
+def claim(inspector, limit, state=None, city=None):
+    """
+    Top the inspector's claimed reports up to limit and renew their lease.
+
+    Returns the claimed reports, oldest first, and the lease expiry.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=settings.REVIEW_LEASE_SECONDS)
+    region = region_filter(state, city)
+
+    with transaction.atomic():
+        held = list(
+            Report.objects.filter(held_by(inspector, now), region)
+            .select_for_update(skip_locked=True)
+            .order_by('timestamp')
+            .values_list('id', flat=True)[:limit]
+        )
+        wanted = limit - len(held)
+        candidates = []
+        if wanted > 0:
+            candidates = list(
+                Report.objects.filter(claimable(now), region)
+                .select_for_update(skip_locked=True)
+                .order_by('timestamp')
+                .values_list('id', flat=True)[:wanted]
+            )
+        if held:
+            Report.objects.filter(id__in=held).update(claimed_until=lease_until)
+        if candidates:
+            # Re-checking claimability keeps databases without SKIP LOCKED
+            # from handing out a report another claim has just taken
+            Report.objects.filter(claimable(now), id__in=candidates).update(
+                claimed_by=inspector, claimed_until=lease_until
+            )
+
+    reports = Report.objects.filter(
+        id__in=held + candidates, claimed_by=inspector, claimed_until=lease_until
+    ).select_related('reviewed_by').order_by('timestamp')
+    return reports, lease_until
+
+
+def release(inspector, report_ids):
+    """Hand claimed reports back to the queue; returns how many were released."""
+    return Report.objects.filter(
+        id__in=report_ids, claimed_by=inspector, status='submitted'
+    ).update(claimed_by=None, claimed_until=None)
+
+
+def claimed_by_other(report, user, now=None):
+    now = now or timezone.now()
+    return (
+        report.claimed_by_id is not None
+        and report.claimed_by_id != user.pk
+        and report.claimed_until is not None
+        and report.claimed_until > now
+    )
@@ -0,0 +1,132 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ReportRollup
+
+ROLLUP_FIELDS = ('day', 'state', 'city', 'disease_id', 'pest_id')
+
+
+def detection_id(detection, *keys):
+    """Return the first id found under any of keys in a detection payload."""
+    if not isinstance(detection, dict):
+        return ''
+    for key in keys:
+        value = detection.get(key)
+        if value:
+            return str(value)
+    return ''
+
+
+def disease_id(detection):
+    # Reports from the API use diseaseId, seeded reports use disease_type_id
+    return detection_id(detection, 'diseaseId', 'disease_type_id')
+
+
+def pest_id(detection):
+    return detection_id(detection, 'pestId', 'pest_type_id')
+
+
+def rollup_key(report):
+    """The rollup row a report contributes to, or None if it cannot be placed."""
+    if report.timestamp is None:
+        return None
+    return (
+        timezone.localtime(report.timestamp).date(),
+        report.state,
+        report.city,
+        disease_id(report.disease_detection),
+        pest_id(report.pest_detection),
+    )
+
+
+def apply_delta(key, reports=0, reviewed=0):
+    """Add the given deltas to a rollup row, creating the row if needed."""
+    if key is None or (not reports and not reviewed):
+        return
+    lookup = dict(zip(ROLLUP_FIELDS, key))
+    updates = {
+        'report_count': F('report_count') + reports,
+        'reviewed_count': F('reviewed_count') + reviewed,
+    }
+    if ReportRollup.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            ReportRollup.objects.create(report_count=reports, reviewed_count=reviewed, **lookup)
+    except IntegrityError:
+        # Another request created the row first
+        ReportRollup.objects.filter(**lookup).update(**updates)
+
+
+def snapshot(report):
+    """Capture what a report currently contributes, to diff against on save."""
+    return rollup_key(report), report.status
+
+
+def report_saved(report, previous, created):
+    current = snapshot(report)
+    if created:
+        apply_delta(current[0], 1, int(current[1] == 'reviewed'))
+        return
+    if previous is None or previous == current:
+        return
+    old_key, old_status = previous
+    new_key, new_status = current
+    if old_key == new_key:
+        apply_delta(new_key, 0, int(new_status == 'reviewed') - int(old_status == 'reviewed'))
+    else:
+        apply_delta(old_key, -1, -int(old_status == 'reviewed'))
+        apply_delta(new_key, 1, int(new_status == 'reviewed'))
+
+
+def report_deleted(report, previous):
+    if previous is None:
+        return
+    key, report_status = previous
+    apply_delta(key, -1, -int(report_status == 'reviewed'))
+
+
+def aggregate_reports(queryset, chunk_size=5000):
+    """Compute rollup counts for a queryset of reports in a single pass."""
+    totals = Counter()
+    reviewed = Counter()
+    rows = queryset.values(
+        'timestamp', 'state', 'city', 'disease_detection', 'pest_detection', 'status'
+    ).iterator(chunk_size=chunk_size)
+    for row in rows:
+        key = (
+            timezone.localtime(row['timestamp']).date(),
+            row['state'],
+            row['city'],
+            disease_id(row['disease_detection']),
+            pest_id(row['pest_detection']),
+        )
+        totals[key] += 1
+        if row['status'] == 'reviewed':
+            reviewed[key] += 1
+    return totals, reviewed
+
+
+def reports_created(reports):
+    """Count reports inserted without post_save (bulk_create), one update per key."""
+    totals = Counter()
+    reviewed = Counter()
+    for report in reports:
+        key = rollup_key(report)
+        totals[key] += 1
+        if report.status == 'reviewed':
+            reviewed[key] += 1
+    for key, count in totals.items():
+        apply_delta(key, count, reviewed[key])
+
+
+def reports_status_changed(reports, new_status):
+    """Move reports updated in bulk from report.status to new_status, one update per key."""
+    reviewed = Counter()
+    for report in reports:
+        reviewed[rollup_key(report)] += int(new_status == 'reviewed') - int(report.status == 'reviewed')
+    for key, delta in reviewed.items():
+        apply_delta(key, 0, delta)
@@ -0,0 +1,68 @@
+"""
+Search over the disease and pest catalogs.
+
+Catalog rows keep a ``search_text`` column holding their name and
+description normalized by ``normalize_text``: lower-cased, without Arabic
+diacritics or tatweel, with letter variants folded (أ/إ/آ to ا, ى to ي,
+ة to ه, ...). Search terms go through the same normalization, so spelling
+variants of a word match each other.
+
+On PostgreSQL the column is indexed for full-text search and for pg_trgm
+word similarity (migration 0012) and CatalogSearchFilter ranks by both;
+other databases fall back to substring matching on the normalized column.
+"""
+import re
+import unicodedata
+
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import BooleanField, Func
+
+# Harakat, superscript alef and Quranic annotation marks
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]')
+TATWEEL = '\u0640'
+ARABIC_LETTER_VARIANTS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    'ک': 'ك', 'ی': 'ي',
+})
+WORD = re.compile(r'\w+')
+
+# Text search configuration without stemming, which has no Arabic dictionary
+SEARCH_CONFIG = 'simple'
+
+# Upper bound on the number of words of a search term that are matched
+MAX_SEARCH_WORDS = 8
+
+
+def normalize_text(text):
+    """Fold case, diacritics and letter variants so equivalent spellings compare equal."""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = ARABIC_DIACRITICS.sub('', text.replace(TATWEEL, ''))
+    text = text.translate(ARABIC_LETTER_VARIANTS)
+    # Strip accents from Latin text (é -> e); Arabic letters have no decomposition
+    text = ''.join(
+        char for char in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(char)
+    )
+    return ' '.join(WORD.findall(text))
+
+
+def search_document(*values):
+    """The search_text stored for a row with the given field values."""
+    return normalize_text(' '.join(value for value in values if value))
+
+
+class SearchDocument(Func):
+    """to_tsvector over the normalized column, matching the expression index."""
+    function = 'to_tsvector'
+    template = f"%(function)s('{SEARCH_CONFIG}'::regconfig, %(expressions)s)"
+    output_field = SearchVectorField()
+
+
+class WordSimilar(Func):
+    """term <% column: pg_trgm word similarity above the threshold, served by the trigram index."""
+    arg_joiner = ' <%% '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
@@ -0,0 +1,154 @@
+"""
+Helpers for the seed commands: streaming input, batching, checkpoints and
+progress reporting, so large datasets load in bounded memory.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+JSON_READ_SIZE = 64 * 1024
+
+# What may follow an array item
+JSON_SEPARATORS = (' ', '\t', '\n', '\r', ',', ']')
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items from iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_json_array(file, read_size=JSON_READ_SIZE):
+    """
+    Yield the items of a JSON array one at a time.
+
+    Only the current item and one read buffer are held in memory, so the
+    array can be much larger than memory. Files that do not start with
+    ``[`` are read as JSON Lines.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while not buffer:
+        more = file.read(read_size)
+        if not more:
+            return
+        buffer = more.lstrip()
+    if not buffer.startswith('['):
+        while True:
+            line, newline, rest = buffer.partition('\n')
+            if not newline:
+                more = file.read(read_size)
+                if more:
+                    buffer += more
+                    continue
+            if line.strip():
+                yield json.loads(line)
+            if not newline:
+                return
+            buffer = rest
+
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+        # Until the item is followed by a separator, it may continue in the
+        # next read: "1e" decodes as 1 but may be the start of 1e5
+        if end is None or not eof and buffer[end:end + 1] not in JSON_SEPARATORS:
+            more = file.read(read_size)
+            eof = not more
+            buffer += more
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+class Checkpoint:
+    """
+    Number of input rows already committed, stored next to the input.
+
+    The count is written after each batch commits. Seeding upserts by
+    natural key, so a batch repeated after a crash between the commit and
+    the write is harmless.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def for_input(cls, input_path, path=None):
+        return cls(path or f'{input_path}.checkpoint')
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)['rows']
+        except FileNotFoundError:
+            return 0
+
+    def save(self, rows):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'rows': rows}, file)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Throughput:
+    """Counts processed rows and formats the running rate."""
+
+    def __init__(self, start=0):
+        self.rows = start
+        self.processed = 0
+        self.started = time.monotonic()
+
+    def add(self, rows):
+        self.rows += rows
+        self.processed += rows
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.processed / elapsed if elapsed else 0.0
+
+    def __str__(self):
+        return f'{self.rows} rows ({self.rate:.0f} rows/s)'
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """
+    Let bulk inserts keep the values set on auto_now/auto_now_add fields,
+    for loading historical rows.
+
+    The flags are switched on the model's fields, which every thread in
+    the process shares, so this is only safe in management commands. Never
+    use it while serving requests.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
@@ -1,3 +1,5 @@
+import uuid
+from django.conf import settings
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
@@ -154,6 +156,15 @@ class DroughtDetectionResponseSerializer(serializers.Serializer):
     data = serializers.JSONField()
     message = serializers.CharField(required=False)
 
+def plant_type_id(plant_detection):
+    """The PlantType id referenced by a plant detection payload, if valid."""
+    if not isinstance(plant_detection, dict) or not plant_detection.get('plantId'):
+        return None
+    try:
+        return uuid.UUID(str(plant_detection['plantId']))
+    except ValueError:
+        return None
+
 class ReportCreateSerializer(serializers.ModelSerializer):
     gpsLat = serializers.FloatField(source='gps_lat')
     gpsLng = serializers.FloatField(source='gps_lng')
@@ -162,46 +173,51 @@ class ReportCreateSerializer(serializers.ModelSerializer):
     disease = serializers.JSONField(source='disease_detection')
     pest = serializers.JSONField(source='pest_detection')
     drought = serializers.JSONField(source='drought_detection')
+    clientId = serializers.CharField(source='client_id', max_length=64, required=False)
 
     class Meta:
         model = Report
         fields = [
             'gpsLat', 'gpsLng', 'city', 'state', 'notes',
-            'imageUrl', 'plantType', 'disease', 'pest', 'drought'
+            'imageUrl', 'plantType', 'disease', 'pest', 'drought', 'clientId'
         ]
 
     def create(self, validated_data):
-        # Extract detection data
-        plant_detection = validated_data.pop('plant_detection', None)
-        disease_detection = validated_data.pop('disease_detection', None)
-        pest_detection = validated_data.pop('pest_detection', None)
-        drought_detection = validated_data.pop('drought_detection', None)
-
-        # Create report
-        report = Report.objects.create(
+        # Resolve plant_type up front so the report is written once
+        plant_type = None
+        plant_id = plant_type_id(validated_data.get('plant_detection'))
+        if plant_id:
+            plant_type = PlantType.objects.filter(id=plant_id).first()
+
+        return Report.objects.create(
             user=self.context['request'].user,
-            plant_detection=plant_detection,
-            disease_detection=disease_detection,
-            pest_detection=pest_detection,
-            drought_detection=drought_detection,
+            plant_type=plant_type,
             **validated_data
         )
 
-        # Set plant_type if plant detection was successful
-        if plant_detection and plant_detection.get('plantId'):
-            try:
-                plant_type = PlantType.objects.get(id=plant_detection['plantId'])
-                report.plant_type = plant_type
-                report.save()
-            except PlantType.DoesNotExist:
-                pass
-
-        return report
-
 class ReportStatusUpdateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=['submitted', 'reviewed'])
     reviewNotes = serializers.CharField(source='notes', required=False)
 
+class ReportBulkStatusUpdateSerializer(serializers.Serializer):
+    reportIds = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    filter = serializers.DictField(required=False, allow_empty=False)
+    status = serializers.ChoiceField(choices=['submitted', 'reviewed'])
+    reviewNotes = serializers.CharField(source='notes', required=False, allow_blank=True)
+
+    def validate_reportIds(self, value):
+        if len(value) > settings.REPORT_BULK_STATUS_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f'At most {settings.REPORT_BULK_STATUS_MAX_ITEMS} reports can be updated at once'
+            )
+        # Keep the first occurrence of repeated ids
+        return list(dict.fromkeys(value))
+
+    def validate(self, attrs):
+        if ('reportIds' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError('Provide either reportIds or filter')
+        return attrs
+
 class ReportListSerializer(serializers.ModelSerializer):
     reportId = serializers.UUIDField(source='id')
     gpsLat = serializers.FloatField(source='gps_lat')
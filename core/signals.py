@@ -0,0 +1,141 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import active_alerts, alert_cache, counters, events, outbreaks, rollups
+from .authentication import user_cache
+from .cache import bump_version, get_version
+from .models import Alert, ArchivedReport, DiseaseType, PestType, PlantType, Report, Tombstone, User
+from .serializers import AlertSerializer, ReportListSerializer
+from .sync import SYNCED_MODELS
+
+logger = logging.getLogger(__name__)
+
+CATALOG_MODELS = (PlantType, DiseaseType, PestType)
+
+
+@receiver(post_init, sender=Report)
+def remember_report_state(sender, instance, **kwargs):
+    # Skip partially loaded instances; reading deferred fields would query
+    if instance.get_deferred_fields():
+        instance._rollup_snapshot = None
+        return
+    instance._rollup_snapshot = rollups.snapshot(instance)
+
+
+@receiver(post_save, sender=Report)
+def report_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_rollup_snapshot', None)
+    rollups.report_saved(instance, previous, created)
+    counters.report_saved(instance, previous[1] if previous else None, created)
+    instance._rollup_snapshot = rollups.snapshot(instance)
+    if created:
+        transaction.on_commit(lambda: report_committed(instance))
+
+
+def reports_bulk_created(reports):
+    """Run the report post_save side effects for rows inserted by bulk_create."""
+    rollups.reports_created(reports)
+    counters.reports_created(reports)
+
+    def committed():
+        for report in reports:
+            report_committed(report)
+
+    transaction.on_commit(committed)
+
+
+def reports_bulk_status_changed(reports, new_status):
+    """
+    Run the rollup and counter updates for reports whose status was set with update().
+
+    reports still hold their previous status.
+    """
+    rollups.reports_status_changed(reports, new_status)
+    counters.reports_status_changed(reports, new_status)
+
+
+def report_committed(report):
+    # The report is already saved; a failure here must not fail the request
+    try:
+        events.publish(
+            'report', report.state, report.city,
+            lambda: ReportListSerializer(report).data
+        )
+    except Exception:
+        logger.exception('Could not publish report %s', report.pk)
+    if settings.OUTBREAK_DETECTION_ENABLED:
+        try:
+            outbreaks.detector.observe_report(report)
+        except Exception:
+            logger.exception('Outbreak detection failed for report %s', report.pk)
+
+
+@receiver(post_delete, sender=Report)
+def report_deleted(sender, instance, **kwargs):
+    rollups.report_deleted(instance, getattr(instance, '_rollup_snapshot', None))
+    counters.report_deleted(instance)
+
+
+@receiver(post_delete, sender=ArchivedReport)
+def archived_report_deleted(sender, instance, **kwargs):
+    # Archived reports are counted like live ones until they are deleted
+    rollups.report_deleted(instance, rollups.snapshot(instance))
+    counters.report_deleted(instance)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def catalog_changed(sender, **kwargs):
+    if sender in CATALOG_MODELS:
+        # Bumping before commit would let a concurrent request cache the old
+        # rows under the new version
+        scope = sender._meta.model_name
+        transaction.on_commit(lambda: bump_version(scope))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    user_cache.discard(instance.pk)
+
+
+@receiver(post_init, sender=Alert)
+def remember_alert_state(sender, instance, **kwargs):
+    instance._loaded_state = instance.__dict__.get('target_state')
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def alert_changed(sender, instance, signal, **kwargs):
+    previous_state = getattr(instance, '_loaded_state', None)
+    deleted = signal is post_delete
+    # delete() clears the primary key before the commit callbacks run
+    alert_id = instance.pk
+
+    def apply():
+        version_before = get_version(alert_cache.GLOBAL_SCOPE)
+        alert_cache.invalidate(previous_state, instance.target_state)
+        version_after = get_version(alert_cache.GLOBAL_SCOPE)
+        active_alerts.index.apply(alert_id, None if deleted else instance, version_before, version_after)
+        if kwargs.get('created'):
+            events.publish(
+                'alert', instance.target_state, instance.target_city,
+                lambda: AlertSerializer(instance).data
+            )
+
+    # Invalidate only once the write is visible to other connections
+    transaction.on_commit(apply)
+    instance._loaded_state = instance.target_state
+
+
+@receiver(post_delete)
+def record_tombstone(sender, instance, **kwargs):
+    if sender in SYNCED_MODELS:
+        scope = {}
+        if sender is Report:
+            scope = {'owner_id': str(instance.user_id), 'state': instance.state}
+        Tombstone.objects.create(model_name=sender._meta.model_name, object_id=str(instance.pk), **scope)
@@ -0,0 +1,134 @@
+"""
+ASGI application streaming region alerts and new reports as server-sent
+events.
+
+Each connection is a coroutine waiting on its own queue, so idle
+connections cost a small amount of memory and no threads. The application
+is mounted in front of Django in agriscan/asgi.py.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .events import get_broker
+from .models import User
+
+TOPICS = ('alert', 'report')
+
+
+def _load_user(user_id):
+    # Runs outside Django's request cycle, so manage the connection here
+    close_old_connections()
+    try:
+        return User.objects.filter(id=user_id, is_active=True).only('id', 'role').first()
+    finally:
+        close_old_connections()
+
+
+class EventStreamApp:
+    """
+    GET /api/events/?state=<state>[&city=<city>][&topics=alert,report][&token=<jwt>]
+
+    The access token may be sent in the Authorization header or, for
+    EventSource clients that cannot set headers, in the token parameter.
+    Report events are only delivered to inspectors.
+    """
+
+    async def __call__(self, scope, receive, send):
+        params = {key: values[0] for key, values in parse_qs(scope['query_string'].decode()).items()}
+        headers = dict(scope['headers'])
+
+        token = params.get('token')
+        authorization = headers.get(b'authorization', b'').decode()
+        if authorization.startswith('Bearer '):
+            token = authorization[len('Bearer '):]
+
+        user = None
+        if token:
+            try:
+                user_id = AccessToken(token)[settings.SIMPLE_JWT['USER_ID_CLAIM']]
+                user = await sync_to_async(_load_user)(user_id)
+            except (TokenError, KeyError):
+                user = None
+        if user is None:
+            await self._reject(send, 401, 'Authentication credentials were not provided or are invalid')
+            return
+
+        state = params.get('state')
+        if not state:
+            await self._reject(send, 400, 'State parameter is required')
+            return
+
+        topics = [topic for topic in params.get('topics', ','.join(TOPICS)).split(',') if topic in TOPICS]
+        if user.role != 'inspector' and 'report' in topics:
+            topics.remove('report')
+        if not topics:
+            await self._reject(send, 400, 'No permitted topics requested')
+            return
+
+        broker = get_broker()
+        subscription = broker.subscribe(state, params.get('city'), topics)
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+            await self._stream(subscription, receive, send)
+        finally:
+            broker.unsubscribe(subscription)
+
+    async def _stream(self, subscription, receive, send):
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        next_event = None
+        try:
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {next_event, disconnected},
+                    timeout=settings.EVENT_STREAM_HEARTBEAT,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnected in done:
+                    break
+                if next_event in done:
+                    event = next_event.result()
+                    next_event = None
+                    data = json.dumps(event['data'], ensure_ascii=False, cls=DjangoJSONEncoder)
+                    body = f"id: {event['id']}\nevent: {event['topic']}\ndata: {data}\n\n".encode('utf-8')
+                else:
+                    # Comment line keeps proxies from closing an idle connection
+                    body = b': keepalive\n\n'
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        finally:
+            disconnected.cancel()
+            if next_event is not None:
+                next_event.cancel()
+
+    async def _wait_for_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    async def _reject(self, send, status_code, message):
+        body = json.dumps({'success': False, 'message': message}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': body})
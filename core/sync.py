@@ -0,0 +1,126 @@
+"""
+Delta sync for mobile clients.
+
+Every synced model carries an indexed ``updated_at`` and deletes leave a
+Tombstone. A sync token records, per resource, the (timestamp, id) of the
+last row and tombstone the client has seen; the next sync returns only
+rows after that position, so payloads are proportional to what changed.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Alert, DiseaseType, PestType, PlantType, Report, Tombstone
+from .serializers import (
+    AlertSerializer, DiseaseTypeSerializer, PestTypeSerializer,
+    PlantTypeSerializer, ReportListSerializer
+)
+
+TOKEN_SALT = 'agriscan.sync'
+
+RESOURCES = {
+    'reports': (Report, ReportListSerializer),
+    'alerts': (Alert, AlertSerializer),
+    'plantTypes': (PlantType, PlantTypeSerializer),
+    'diseaseTypes': (DiseaseType, DiseaseTypeSerializer),
+    'pestTypes': (PestType, PestTypeSerializer),
+}
+
+SYNCED_MODELS = tuple(model for model, _ in RESOURCES.values())
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+class ExpiredSyncToken(Exception):
+    pass
+
+
+def decode_token(token):
+    if not token:
+        return {}
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        raise InvalidSyncToken()
+    issued = datetime.fromisoformat(payload['issued'])
+    if timezone.now() - issued > timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+        # Tombstones older than this may have been purged
+        raise ExpiredSyncToken()
+    return payload['cursors']
+
+
+def encode_token(cursors):
+    return signing.dumps({'issued': timezone.now().isoformat(), 'cursors': cursors}, salt=TOKEN_SALT)
+
+
+def scoped_queryset(resource, user):
+    model = RESOURCES[resource][0]
+    queryset = model.objects.all()
+    if resource == 'reports':
+        # Farmers sync their own reports, inspectors their state's
+        if user.role == 'inspector':
+            queryset = queryset.filter(state=user.state)
+        else:
+            queryset = queryset.filter(user=user)
+    return queryset
+
+
+def scoped_tombstones(resource, user):
+    model = RESOURCES[resource][0]
+    queryset = Tombstone.objects.filter(model_name=model._meta.model_name)
+    if resource == 'reports':
+        # The same scope as the rows, so deleted ids are not leaked to other users
+        if user.role == 'inspector':
+            queryset = queryset.filter(state=user.state)
+        else:
+            queryset = queryset.filter(owner_id=str(user.pk))
+    return queryset
+
+
+def _after(cursor, time_field, id_field):
+    if not cursor:
+        return Q()
+    timestamp = datetime.fromisoformat(cursor[0])
+    return Q(**{f'{time_field}__gt': timestamp}) | Q(**{time_field: timestamp, f'{id_field}__gt': cursor[1]})
+
+
+def sync_resource(resource, user, cursor, limit):
+    """Changes to one resource after cursor; returns (changes, cursor, has_more)."""
+    serializer_class = RESOURCES[resource][1]
+    cursor = cursor or {}
+    # Leave recent rows for the next sync so that a transaction committing
+    # late with an earlier timestamp is not skipped.
+    settled = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+    rows = list(
+        scoped_queryset(resource, user)
+        .filter(_after(cursor.get('rows'), 'updated_at', 'id'), updated_at__lte=settled)
+        .order_by('updated_at', 'id')[:limit + 1]
+    )
+    tombstones = list(
+        scoped_tombstones(resource, user).filter(deleted_at__lte=settled)
+        .filter(_after(cursor.get('deleted'), 'deleted_at', 'id'))
+        .order_by('deleted_at', 'id')
+        .values('id', 'object_id', 'deleted_at')[:limit + 1]
+    )
+
+    has_more = len(rows) > limit or len(tombstones) > limit
+    rows = rows[:limit]
+    tombstones = tombstones[:limit]
+
+    next_cursor = dict(cursor)
+    if rows:
+        next_cursor['rows'] = [rows[-1].updated_at.isoformat(), str(rows[-1].id)]
+    if tombstones:
+        next_cursor['deleted'] = [tombstones[-1]['deleted_at'].isoformat(), tombstones[-1]['id']]
+
+    changes = {
+        'updated': serializer_class(rows, many=True).data,
+        'deleted': [tombstone['object_id'] for tombstone in tombstones],
+    }
+    return changes, next_cursor, has_more
@@ -1,3 +1,1439 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import json
+import os
+import tempfile
+import importlib.util
+import threading
+import uuid
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.http.multipartparser import MultiPartParserError
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, modify_settings, override_settings, skipUnlessDBFeature
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    active_alerts, alert_cache, compression, counters, events, geo, outbreaks, profiling, review_queue,
+    rollups, search, uploads
+)
+from .activity import ActivityTracker
+from .archive import archive_batch, archive_cutoff
+from .authentication import CachedJWTAuthentication, user_cache
+from .cache import get_version
+from .db.pool import ConnectionPool, PoolTimeout
+from .models import (
+    Alert, ArchivedReport, DiseaseType, PestType, PlantType, Report, ReportRollup, Tombstone, User,
+    UserReportStats
+)
+from .management.commands.seed_pests import Command as SeedPestsCommand
+from .outbreaks import OutbreakDetector
+from .seeding import Checkpoint, iter_json_array
+
+
+def make_user(phone, role='farmer', state='Lagos', city='Ikeja', **extra):
+    return User.objects.create_user(
+        phone, 'password', role=role, full_name='Test User', state=state, city=city,
+        gps_lat=6.5, gps_lng=3.3, **extra
+    )
+
+
+def make_report(user, state='Lagos', city='Ikeja', gps_lat=6.5, gps_lng=3.3, **extra):
+    return Report.objects.create(
+        user=user, image_url='https://example.com/report.jpg', gps_lat=gps_lat, gps_lng=gps_lng,
+        state=state, city=city, **extra
+    )
+
+
+class CatalogVersionTests(TestCase):
+    def test_version_bumped_only_after_commit(self):
+        disease = DiseaseType.objects.create(name='Blight', description='', treatment='', severity='high')
+        version = get_version('diseasetype')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            disease.description = 'Leaf spots'
+            disease.save()
+            # Still inside the transaction: readers must keep the old version
+            self.assertEqual(get_version('diseasetype'), version)
+
+        self.assertNotEqual(get_version('diseasetype'), version)
+
+    def test_uncommitted_change_keeps_version(self):
+        version = get_version('diseasetype')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            DiseaseType.objects.create(name='Rust', description='', treatment='', severity='low')
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_version('diseasetype'), version)
+
+
+class CatalogConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('+2340000000021'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.disease = DiseaseType.objects.create(name='Blight', description='', treatment='', severity='high')
+
+    def get(self, path, etag=None, **headers):
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(path, **headers)
+
+    def test_catalog_list_revalidates_without_queries(self):
+        first = self.get('/api/disease-types/')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('/api/disease-types/', first['ETag']).status_code, 304)
+            # Compressed responses carry a weak ETag
+            self.assertEqual(self.get('/api/disease-types/', 'W/' + first['ETag']).status_code, 304)
+            self.assertEqual(self.get('/api/disease-types/').json(), first.json())
+        self.assertNotEqual(self.get('/api/disease-types/?severity=high')['ETag'], first['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DiseaseType.objects.create(name='Rust', description='', treatment='', severity='low')
+        changed = self.get('/api/disease-types/', first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['count'], first.json()['count'] + 1)
+
+    def test_bundle_is_gzipped_when_accepted(self):
+        response = self.get('/api/catalog/bundle/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))['data']
+        self.assertEqual(response['ETag'], f'"{data["version"]}"')
+        self.assertIn(str(self.disease.id), [disease['id'] for disease in data['diseaseTypes']])
+
+        for accept_encoding in ('', 'gzip;q=0, identity'):
+            plain = self.get('/api/catalog/bundle/', HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertFalse(plain.has_header('Content-Encoding'))
+            self.assertEqual(json.loads(plain.content)['data']['version'], data['version'])
+
+    def test_bundle_etag_follows_the_content(self):
+        etag = self.get('/api/catalog/bundle/')['ETag']
+        self.assertEqual(self.get('/api/catalog/bundle/', etag).status_code, 304)
+
+        # A save that changes nothing keeps the version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.disease.save()
+        self.assertEqual(self.get('/api/catalog/bundle/', etag).status_code, 304)
+
+        self.disease.treatment = 'Copper spray'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.disease.save()
+        response = self.get('/api/catalog/bundle/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@skipUnless(importlib.util.find_spec('redis'), 'redis is not installed')
+@override_settings(OUTBREAK_DETECTION_ENABLED=False, EVENT_PUBLISH_TIMEOUT=0.5)
+class RedisBrokerTests(TestCase):
+    # Nothing listens on port 1, so every publish fails to connect
+    UNREACHABLE_URL = 'redis://127.0.0.1:1/0'
+
+    def test_publish_failure_is_logged(self):
+        broker = events.RedisBroker(self.UNREACHABLE_URL)
+        with self.assertLogs('core.events', 'WARNING'):
+            broker.publish('report', 'Lagos', 'Ikeja', {})
+
+    def test_report_submission_survives_redis_outage(self):
+        client = APIClient()
+        client.force_authenticate(make_user('+2340000000001'))
+        with mock.patch.object(events, '_broker', events.RedisBroker(self.UNREACHABLE_URL)), \
+                self.assertLogs('core.events', 'WARNING'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/reports/', {
+                'gpsLat': 6.5, 'gpsLng': 3.3, 'city': 'Ikeja', 'state': 'Lagos',
+                'imageUrl': 'https://example.com/report.jpg',
+                'plantType': {}, 'disease': {}, 'pest': {}, 'drought': {}
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    async def test_listener_reconnects_with_backoff(self):
+        import redis
+
+        broker = events.RedisBroker(self.UNREACHABLE_URL)
+        subscription = broker.subscribe('Lagos')
+        broker._listener.cancel()
+        attempts = []
+
+        async def relay():
+            attempts.append(broker._retry_delay)
+            if len(attempts) == 4:
+                broker.unsubscribe(subscription)
+            raise redis.RedisError('Connection lost')
+
+        with mock.patch.object(broker, '_relay', relay), \
+                mock.patch('core.events.asyncio.sleep', mock.AsyncMock()) as sleep, \
+                self.assertLogs('core.events', 'WARNING') as logs:
+            await broker._listen()
+
+        self.assertEqual([call.args[0] for call in sleep.await_args_list], [0.5, 1.0, 2.0, 4.0])
+        self.assertEqual(len(logs.records), 4)
+
+
+
+@override_settings(
+    OUTBREAK_DETECTION_ENABLED=False, OUTBREAK_WINDOW_HOURS=24, OUTBREAK_BASELINE_DAYS=7,
+    OUTBREAK_MIN_REPORTS=5, OUTBREAK_THRESHOLD_FACTOR=3.0, OUTBREAK_ALERT_HOURS=72,
+    OUTBREAK_ALERT_USER_ID=None
+)
+class OutbreakDetectorTests(TestCase):
+    def setUp(self):
+        self.farmers = [make_user(f'+23400000001{n:02}') for n in range(10)]
+        # Committed, so the detector's catalog sees the new disease
+        with self.captureOnCommitCallbacks(execute=True):
+            self.disease = DiseaseType.objects.create(name='Blight', description='', treatment='', severity='high')
+        self.key = ('Lagos', 'Ikeja', 'disease', str(self.disease.id))
+
+    def report(self, farmer=0, disease_id=None):
+        return make_report(
+            self.farmers[farmer], disease_detection={'diseaseId': disease_id or str(self.disease.id)}
+        )
+
+    def test_first_observation_loads_reports_seen_by_other_workers(self):
+        for farmer in range(4):
+            self.report(farmer)
+        detector = OutbreakDetector(create_alerts=False, sync_seconds=60)
+
+        outbreaks = detector.observe_report(self.report(4))
+
+        self.assertEqual(len(outbreaks), 1)
+        self.assertEqual(outbreaks[0]['count'], 5)
+
+    def test_counts_in_memory_until_the_windows_are_stale(self):
+        detector = OutbreakDetector(create_alerts=False, sync_seconds=60)
+        detector.observe_report(self.report(0))
+        self.report(1)  # Handled by another worker
+        detector.observe_report(self.report(2))
+        self.assertEqual(detector._windows[self.key].recent, 2)
+
+        detector.sync_seconds = 0
+        detector.observe_report(self.report(3))
+        self.assertEqual(detector._windows[self.key].recent, 4)
+
+    def test_background_sync_keeps_counting_in_memory(self):
+        for farmer in range(3):
+            self.report(farmer)
+        detector = OutbreakDetector(create_alerts=False, sync_seconds=60, background=True)
+
+        with mock.patch.object(detector, '_get_executor') as get_executor:
+            detector.observe_report(self.report(3))
+            detector.observe_report(self.report(4))
+
+        # One load for the region, queued rather than run on this thread
+        get_executor.return_value.submit.assert_called_once_with(detector._load_in_background, ('Lagos', 'Ikeja'))
+        self.assertEqual(detector._windows[self.key].recent, 2)
+
+        detector._load_in_background(('Lagos', 'Ikeja'))
+        self.assertEqual(detector._windows[self.key].recent, 5)
+        self.assertEqual(detector._loading, set())
+
+    def test_one_farmer_does_not_trigger_an_outbreak(self):
+        detector = OutbreakDetector(create_alerts=False)
+        now = timezone.now()
+        for minute in range(20):
+            outbreaks = detector.observe(now + timedelta(minutes=minute), 'Lagos', 'Ikeja',
+                                         str(self.disease.id), '', self.farmers[0].id)
+            self.assertEqual(outbreaks, [])
+        self.assertEqual(detector._windows[self.key].recent, 1)
+
+        outbreaks = []
+        for farmer in range(1, 5):
+            outbreaks += detector.observe(now + timedelta(minutes=30), 'Lagos', 'Ikeja',
+                                          str(self.disease.id), '', self.farmers[farmer].id)
+        self.assertEqual([outbreak['count'] for outbreak in outbreaks], [5])
+
+    def test_unknown_detections_are_not_counted(self):
+        detector = OutbreakDetector(create_alerts=False)
+        for disease_id in ('not-a-uuid', str(uuid.uuid4())):
+            for farmer in range(5):
+                self.assertEqual(detector.observe(timezone.now(), 'Lagos', 'Ikeja', disease_id, '',
+                                                  self.farmers[farmer].id), [])
+        self.assertEqual(detector._windows, {})
+
+    @override_settings(OUTBREAK_DETECTION_ENABLED=True)
+    def test_detector_errors_do_not_fail_the_request(self):
+        with mock.patch.object(outbreaks.detector, 'observe_report', side_effect=RuntimeError), \
+                self.assertLogs('core.signals', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            report = self.report(0, disease_id='not-a-uuid')
+        self.assertTrue(Report.objects.filter(id=report.id).exists())
+
+    def test_replayed_alert_is_dated_through_the_model(self):
+        User.objects.create_superuser(
+            '+2340000000199', 'password', full_name='Admin', city='Ikeja', state='Lagos', gps_lat=6.5, gps_lng=3.3
+        )
+        detector = OutbreakDetector()
+        occurred = timezone.now() - timedelta(days=2)
+
+        with mock.patch.object(active_alerts.index, 'apply') as apply, \
+                self.captureOnCommitCallbacks(execute=True):
+            for farmer in range(5):
+                detector.observe(occurred + timedelta(minutes=farmer), 'Lagos', 'Ikeja',
+                                 str(self.disease.id), '', self.farmers[farmer].id)
+
+        alert = Alert.objects.get(target_state='Lagos')
+        self.assertEqual(alert.title, 'Possible disease outbreak: Blight')
+        self.assertEqual(alert.created_at, occurred + timedelta(minutes=4))
+        # Once for the insert and once for the new created_at
+        self.assertEqual(apply.call_count, 2)
+        self.assertEqual(apply.call_args[0][1].created_at, alert.created_at)
+
+
+class SubmitReportTests(TestCase):
+    def setUp(self):
+        self.farmer = make_user('+2340000000151')
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+        self.body = {
+            'gpsLat': 6.5, 'gpsLng': 3.3, 'city': 'Ikeja', 'state': 'Lagos', 'notes': '',
+            'imageUrl': 'https://example.com/leaf.jpg', 'plantType': {}, 'disease': {}, 'pest': {},
+            'drought': {}, 'clientId': 'draft-1',
+        }
+
+    def submit(self, body=None):
+        return self.client.post('/api/reports/', body or self.body, format='json')
+
+    def test_retry_returns_the_first_report(self):
+        first = self.submit()
+        second = self.submit()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['data']['reportId'], first.json()['data']['reportId'])
+        self.assertEqual(Report.objects.count(), 1)
+
+    def test_concurrent_retry_returns_the_winner(self):
+        winner = make_report(self.farmer, client_id='draft-1')
+        # The other request inserts between the lookup and the save
+        with mock.patch('core.views.Report.objects.filter', return_value=Report.objects.none()):
+            response = self.submit()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['reportId'], str(winner.id))
+        self.assertEqual(Report.objects.count(), 1)
+
+    def test_reports_without_client_id_are_not_deduplicated(self):
+        body = {key: value for key, value in self.body.items() if key != 'clientId'}
+        self.assertEqual(self.submit(body).status_code, 201)
+        self.assertEqual(self.submit(body).status_code, 201)
+        self.assertEqual(Report.objects.count(), 2)
+
+
+class SeedingTests(TestCase):
+    def test_items_split_across_reads(self):
+        text = '[1, 22, 333, 4444, 1e5, -2.5, "a b", {"c": [1, 2]}, true, null]'
+        for read_size in range(1, 12):
+            self.assertEqual(list(iter_json_array(StringIO(text), read_size)), json.loads(text))
+
+    def test_json_lines_fallback(self):
+        text = '{"name": "Aphid"}\n\n{"name": "Locust"}'
+        for read_size in (1, 5, 1000):
+            self.assertEqual(
+                list(iter_json_array(StringIO(text), read_size)), [{'name': 'Aphid'}, {'name': 'Locust'}]
+            )
+
+    def test_truncated_array_fails(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('[1, 2'), 2))
+
+    def test_resume_after_failed_batch(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'pests.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump([
+                {'name': f'Pest {n}', 'description': '', 'treatment': '', 'severity': 'low'} for n in range(5)
+            ], file)
+
+        upsert = SeedPestsCommand.upsert
+        batches = []
+
+        def fail_second_batch(command, pests):
+            batches.append([pest['name'] for pest in pests])
+            if len(batches) == 2:
+                raise ValueError('connection lost')
+            return upsert(command, pests)
+
+        with mock.patch.object(SeedPestsCommand, 'upsert', autospec=True, side_effect=fail_second_batch):
+            with self.assertRaises(CommandError):
+                call_command('seed_pests', file=path, batch_size=2, stdout=StringIO())
+        self.assertEqual(Checkpoint.for_input(path).load(), 2)
+
+        call_command('seed_pests', file=path, batch_size=2, resume=True, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(PestType.objects.values_list('name', flat=True)), [f'Pest {n}' for n in range(5)]
+        )
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0, SYNC_PAGE_SIZE=500)
+class SyncTests(TestCase):
+    def setUp(self):
+        self.farmer = make_user('+2340000000201')
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+
+    def sync(self, client=None, **params):
+        response = (client or self.client).get('/api/sync/', {'resources': 'reports', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_limit_below_one_still_advances(self):
+        for _ in range(3):
+            make_report(self.farmer)
+        for limit in (0, -5):
+            first = self.sync(limit=limit)
+            self.assertEqual(len(first['changes']['reports']['updated']), 1)
+            self.assertTrue(first['hasMore'])
+            second = self.sync(limit=limit, syncToken=first['syncToken'])
+            self.assertNotEqual(
+                second['changes']['reports']['updated'], first['changes']['reports']['updated']
+            )
+
+    def test_paging_returns_every_row_once(self):
+        report_ids = {str(make_report(self.farmer).id) for _ in range(5)}
+        seen = []
+        token = ''
+        for _ in range(10):
+            data = self.sync(limit=2, syncToken=token)
+            seen += [row['reportId'] for row in data['changes']['reports']['updated']]
+            token = data['syncToken']
+            if not data['hasMore']:
+                break
+        self.assertEqual(sorted(seen), sorted(report_ids))
+
+    def test_deleted_reports_are_scoped_like_rows(self):
+        report = make_report(self.farmer)
+        report_id = str(report.id)
+        report.delete()
+
+        other_farmer = APIClient()
+        other_farmer.force_authenticate(make_user('+2340000000202'))
+        inspector = APIClient()
+        inspector.force_authenticate(make_user('+2340000000203', role='inspector'))
+        other_inspector = APIClient()
+        other_inspector.force_authenticate(make_user('+2340000000204', role='inspector', state='Kano', city='Kano'))
+
+        self.assertEqual(self.sync()['changes']['reports']['deleted'], [report_id])
+        self.assertEqual(self.sync(inspector)['changes']['reports']['deleted'], [report_id])
+        self.assertEqual(self.sync(other_farmer)['changes']['reports']['deleted'], [])
+        self.assertEqual(self.sync(other_inspector)['changes']['reports']['deleted'], [])
+
+
+class ImageUploadTests(TestCase):
+    image = b'\xff\xd8\xff\xe0' + b'\0' * 4096
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = Path(media_root.name)
+        media = override_settings(MEDIA_ROOT=media_root.name, UPLOAD_IMAGE_MAX_BYTES=64 * 1024)
+        media.enable()
+        self.addCleanup(media.disable)
+        schedule = mock.patch.object(uploads, 'schedule_derivatives')
+        self.schedule_derivatives = schedule.start()
+        self.addCleanup(schedule.stop)
+
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('+2340000000281'))
+
+    def upload(self, data):
+        return self.client.post(
+            '/api/uploads/images/', {'image': SimpleUploadedFile('leaf.jpg', data)}, format='multipart'
+        )
+
+    def assertNoPartialFiles(self):
+        self.assertEqual(list((self.media_root / uploads.UPLOAD_DIR / 'tmp').glob('*.part')), [])
+
+    def test_same_image_is_stored_once(self):
+        first = self.upload(self.image)
+        second = self.upload(self.image)
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(first.json()['data']['imageUrl'], second.json()['data']['imageUrl'])
+        self.assertEqual(len(list(self.media_root.glob('uploads/*/*/*.jpg'))), 1)
+        self.assertNoPartialFiles()
+
+    def test_missing_derivatives_are_regenerated(self):
+        self.upload(self.image)
+        self.upload(self.image)
+        self.assertEqual(self.schedule_derivatives.call_count, 2)
+
+        stored = self.schedule_derivatives.call_args[0][0]
+        for name in uploads.DERIVATIVES:
+            (self.media_root / uploads.relative_path(stored.digest, stored.ext, name)).touch()
+        self.upload(self.image)
+        self.assertEqual(self.schedule_derivatives.call_count, 2)
+
+    def test_oversized_image_is_rejected(self):
+        with override_settings(UPLOAD_IMAGE_MAX_BYTES=1024):
+            response = self.upload(self.image)
+        self.assertEqual(response.status_code, 413)
+        self.assertNoPartialFiles()
+
+    def test_unknown_format_is_rejected(self):
+        response = self.upload(b'GIF89a' + b'\0' * 100)
+        self.assertEqual(response.status_code, 415)
+        self.assertNoPartialFiles()
+
+    def test_partial_file_removed_when_parsing_fails(self):
+        with mock.patch.object(uploads.ImageUploadHandler, 'file_complete',
+                               side_effect=MultiPartParserError('Malformed body')):
+            response = self.upload(self.image)
+        self.assertEqual(response.status_code, 400)
+        self.assertNoPartialFiles()
+
+
+class DetectionTests(TestCase):
+    def setUp(self):
+        PlantType.objects.create(name='Tomato', scientific_name='Solanum lycopersicum')
+
+    async def test_image_url_is_not_fetched(self):
+        # Nothing listens on port 1; fetching the image would fail the request
+        image_url = 'http://127.0.0.1:1/leaf.jpg'
+        response = await self.async_client.post(
+            '/api/detect/plant/', {'image_url': image_url}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['imageUrl'], image_url)
+
+
+class ReviewQueueTests(TestCase):
+    def setUp(self):
+        farmer = make_user('+2340000000301')
+        self.reports = [make_report(farmer) for _ in range(3)]
+        make_report(farmer, state='Kano', city='Kano')
+        self.inspector = make_user('+2340000000302', role='inspector')
+        self.other_inspector = make_user('+2340000000303', role='inspector')
+
+    def claim(self, inspector, limit):
+        reports, lease_until = review_queue.claim(inspector, limit, state='Lagos')
+        return [report.id for report in reports], lease_until
+
+    def test_claims_do_not_overlap(self):
+        first, _ = self.claim(self.inspector, 2)
+        second, _ = self.claim(self.other_inspector, 5)
+        self.assertEqual(first, [report.id for report in self.reports[:2]])
+        self.assertEqual(second, [self.reports[2].id])
+
+    def test_claiming_again_renews_the_lease(self):
+        first, first_lease = self.claim(self.inspector, 2)
+        second, second_lease = self.claim(self.inspector, 2)
+        self.assertEqual(first, second)
+        self.assertGreater(second_lease, first_lease)
+
+    def test_expired_lease_returns_reports_to_the_queue(self):
+        claimed, _ = self.claim(self.inspector, 3)
+        Report.objects.filter(id__in=claimed).update(claimed_until=timezone.now() - timedelta(seconds=1))
+        reclaimed, _ = self.claim(self.other_inspector, 3)
+        self.assertEqual(reclaimed, claimed)
+
+    def test_release(self):
+        claimed, _ = self.claim(self.inspector, 2)
+        self.assertEqual(review_queue.release(self.other_inspector, claimed), 0)
+        self.assertEqual(review_queue.release(self.inspector, claimed), 2)
+        self.assertEqual(self.claim(self.other_inspector, 2)[0], claimed)
+
+    def test_status_update_refused_while_claimed_by_another_inspector(self):
+        claimed, _ = self.claim(self.inspector, 1)
+        url = f'/api/reports/{claimed[0]}/status/'
+        client = APIClient()
+
+        client.force_authenticate(self.other_inspector)
+        response = client.put(url, {'status': 'reviewed'}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+        client.force_authenticate(self.inspector)
+        response = client.put(url, {'status': 'reviewed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        report = Report.objects.get(id=claimed[0])
+        self.assertEqual(report.status, 'reviewed')
+        self.assertIsNone(report.claimed_by)
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class ReviewQueueLockingTests(TransactionTestCase):
+    def test_claim_skips_rows_locked_by_another_transaction(self):
+        farmer = make_user('+2340000000311')
+        reports = [make_report(farmer) for _ in range(3)]
+        inspector = make_user('+2340000000312', role='inspector')
+        claimed = []
+
+        def claim_elsewhere():
+            try:
+                claimed.extend(report.id for report in review_queue.claim(inspector, 3, state='Lagos')[0])
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            # Stands in for a concurrent claim that has not committed yet
+            list(Report.objects.filter(id__in=[report.id for report in reports[:2]]).select_for_update())
+            thread = threading.Thread(target=claim_elsewhere)
+            thread.start()
+            thread.join(timeout=10)
+            self.assertFalse(thread.is_alive(), 'claim waited on locked rows')
+
+        self.assertEqual(claimed, [reports[2].id])
+
+
+class ReportAccountingMixin:
+    """Assertions that the rollups and per-user counters match the reports."""
+
+    def assertRollupsMatch(self, *querysets):
+        totals, reviewed = Counter(), Counter()
+        for reports in querysets:
+            queryset_totals, queryset_reviewed = rollups.aggregate_reports(reports)
+            totals.update(queryset_totals)
+            reviewed.update(queryset_reviewed)
+        expected = {key: (totals[key], reviewed[key]) for key in totals}
+        actual = {
+            (row.day, row.state, row.city, row.disease_id, row.pest_id): (row.report_count, row.reviewed_count)
+            for row in ReportRollup.objects.exclude(report_count=0)
+        }
+        self.assertEqual(actual, expected)
+
+    def assertCountersMatch(self, *querysets):
+        expected = {}
+        for reports in querysets:
+            for user_id, (total, reviewed) in counters.aggregate_counts(reports).items():
+                previous_total, previous_reviewed = expected.get(user_id, (0, 0))
+                expected[user_id] = (previous_total + total, previous_reviewed + reviewed)
+        actual = {
+            stats.user_id: (stats.report_count, stats.reviewed_count)
+            for stats in UserReportStats.objects.exclude(report_count=0)
+        }
+        self.assertEqual(actual, expected)
+
+
+class RollupTests(ReportAccountingMixin, TestCase):
+    def setUp(self):
+        self.farmer = make_user('+2340000000351')
+        self.blight = DiseaseType.objects.create(name='Blight', description='', treatment='', severity='high')
+        self.rust = DiseaseType.objects.create(name='Rust', description='', treatment='', severity='low')
+
+    def test_saves_and_deletes_move_the_counts(self):
+        report = make_report(self.farmer, disease_detection={'diseaseId': str(self.blight.id)})
+        make_report(self.farmer, state='Kano', city='Kano')
+        self.assertRollupsMatch(Report.objects.all())
+
+        report.status = 'reviewed'
+        report.save()
+        self.assertRollupsMatch(Report.objects.all())
+
+        # Every part of the key at once: old bucket down, new bucket up
+        report.disease_detection = {'diseaseId': str(self.rust.id)}
+        report.state, report.city = 'Kano', 'Kano'
+        report.timestamp -= timedelta(days=3)
+        report.save()
+        self.assertRollupsMatch(Report.objects.all())
+
+        report.delete()
+        self.assertRollupsMatch(Report.objects.all())
+
+    def test_migration_backfills_existing_reports(self):
+        migration = importlib.import_module('core.migrations.0007_reportrollup')
+        for i in range(5):
+            make_report(
+                self.farmer, status='reviewed' if i % 2 else 'submitted',
+                disease_detection={'diseaseId': str((self.blight, self.rust)[i % 2].id)}
+            )
+        ReportRollup.objects.all().delete()
+
+        migration.populate_rollups(django_apps, None)
+
+        self.assertRollupsMatch(Report.objects.all())
+
+
+@override_settings(REPORT_BULK_STATUS_CHUNK_SIZE=2)
+class BulkStatusUpdateTests(ReportAccountingMixin, TestCase):
+    def setUp(self):
+        farmers = [make_user('+2340000000401'), make_user('+2340000000402')]
+        disease = DiseaseType.objects.create(name='Blight', description='', treatment='', severity='high')
+        self.reports = [
+            make_report(farmers[i % 2], disease_detection={'diseaseId': str(disease.id)} if i % 3 else None)
+            for i in range(7)
+        ]
+        self.reports[0].status = 'reviewed'
+        self.reports[0].save()
+
+        self.inspector = make_user('+2340000000403', role='inspector')
+        self.client = APIClient()
+        self.client.force_authenticate(self.inspector)
+
+    def update(self, body):
+        response = self.client.put('/api/reports/status/', body, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_counts_follow_the_status_changes(self):
+        self.assertRollupsMatch(Report.objects.all())
+        self.assertCountersMatch(Report.objects.all())
+
+        data = self.update({'reportIds': [str(report.id) for report in self.reports], 'status': 'reviewed'})
+        self.assertEqual((data['updated'], data['unchanged']), (6, 1))
+        self.assertRollupsMatch(Report.objects.all())
+        self.assertCountersMatch(Report.objects.all())
+
+        data = self.update({'filter': {'city': 'Ikeja'}, 'status': 'submitted'})
+        self.assertEqual(data['updated'], 7)
+        self.assertRollupsMatch(Report.objects.all())
+        self.assertCountersMatch(Report.objects.all())
+        self.assertFalse(Report.objects.filter(status='reviewed').exists())
+
+    def test_claimed_and_unknown_reports_are_skipped(self):
+        other_inspector = make_user('+2340000000404', role='inspector')
+        claimed, _ = review_queue.claim(other_inspector, 1, state='Lagos')
+        claimed_id = str(claimed[0].id)
+        missing_id = '00000000-0000-0000-0000-000000000000'
+
+        data = self.update({'reportIds': [claimed_id, str(self.reports[3].id), missing_id], 'status': 'reviewed'})
+
+        self.assertEqual(
+            [result['status'] for result in data['results']], ['claimed', 'updated', 'notFound']
+        )
+        self.assertEqual(Report.objects.get(id=claimed_id).status, 'submitted')
+        self.assertCountersMatch(Report.objects.all())
+        self.assertRollupsMatch(Report.objects.all())
+
+
+class ArchiveTests(ReportAccountingMixin, TestCase):
+    def setUp(self):
+        self.farmer = make_user('+2340000000501')
+        old = timezone.now() - timedelta(days=400)
+        self.reports = [make_report(self.farmer) for _ in range(5)]
+        for report in self.reports[:4]:
+            report.status = 'reviewed'
+            report.save()
+        # Only the first three are both reviewed and old enough to archive
+        self.archivable = self.reports[:3]
+        Report.objects.filter(id__in=[report.id for report in self.reports[:3] + self.reports[4:]]).update(timestamp=old)
+        call_command('rebuild_report_rollups', stdout=StringIO())
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+
+    def archive(self):
+        moved = 0
+        cutoff = archive_cutoff(365)
+        while True:
+            batch = archive_batch(cutoff, 2)
+            if not batch:
+                return moved
+            moved += batch
+
+    def test_moves_only_old_reviewed_reports(self):
+        self.assertEqual(self.archive(), 3)
+        self.assertEqual(
+            set(ArchivedReport.objects.values_list('id', flat=True)), {report.id for report in self.archivable}
+        )
+        self.assertEqual(Report.objects.count(), 2)
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_rollups_and_counters_keep_counting_archived_reports(self):
+        self.archive()
+        self.assertRollupsMatch(Report.objects.all(), ArchivedReport.objects.all())
+        self.assertCountersMatch(Report.objects.all(), ArchivedReport.objects.all())
+
+        call_command('rebuild_report_rollups', stdout=StringIO())
+        call_command('reconcile_report_counters', stdout=StringIO())
+        self.assertRollupsMatch(Report.objects.all(), ArchivedReport.objects.all())
+        self.assertCountersMatch(Report.objects.all(), ArchivedReport.objects.all())
+
+    def test_deleting_an_archived_report_updates_the_counts(self):
+        self.archive()
+        ArchivedReport.objects.first().delete()
+        self.assertRollupsMatch(Report.objects.all(), ArchivedReport.objects.all())
+        self.assertCountersMatch(Report.objects.all(), ArchivedReport.objects.all())
+
+    def test_archived_reports_are_listed_on_request(self):
+        self.archive()
+        live = self.client.get('/api/reports/').json()['data']['reports']
+        archived = self.client.get('/api/reports/', {'archived': 'true', 'status': 'reviewed'}).json()['data']['reports']
+        self.assertEqual(len(live), 2)
+        self.assertEqual({report['reportId'] for report in archived}, {str(report.id) for report in self.archivable})
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        farmer = make_user('+2340000000701')
+        self.reports = [
+            make_report(farmer, disease_detection={'diseaseId': 'd1', 'note': 'Ọ̀gbìn, "quoted"'}),
+            make_report(farmer),
+            make_report(farmer, state='Kano', city='Kano'),
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(farmer)
+
+    def export(self, headers=None, **params):
+        response = self.client.get('/api/reports/export/', params, **(headers or {}))
+        self.assertTrue(response.streaming)
+        return response
+
+    def test_csv_rows_follow_the_filters(self):
+        response = self.export(state='Lagos')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual({row['id'] for row in rows}, {str(report.id) for report in self.reports[:2]})
+        detection = next(row['disease_detection'] for row in rows if row['id'] == str(self.reports[0].id))
+        self.assertEqual(json.loads(detection), self.reports[0].disease_detection)
+
+    def test_ndjson_has_one_object_per_line(self):
+        response = self.export(exportFormat='ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual({json.loads(line)['id'] for line in lines}, {str(report.id) for report in self.reports})
+
+    def test_gzip_stream_matches_the_plain_export(self):
+        plain = b''.join(self.export(exportFormat='ndjson').streaming_content)
+        response = self.export(exportFormat='ndjson', headers={'HTTP_ACCEPT_ENCODING': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get('/api/reports/export/', {'exportFormat': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class GeoFilterTests(TestCase):
+    def setUp(self):
+        farmer = make_user('+2340000000711')
+        self.client = APIClient()
+        self.client.force_authenticate(farmer)
+        self.ikeja = make_report(farmer, gps_lat=6.60, gps_lng=3.35)
+        self.lekki = make_report(farmer, gps_lat=6.45, gps_lng=3.50)
+        self.kano = make_report(farmer, gps_lat=12.00, gps_lng=8.52)
+        self.fiji_east = make_report(farmer, gps_lat=-17.0, gps_lng=179.9)
+        self.fiji_west = make_report(farmer, gps_lat=-17.0, gps_lng=-179.9)
+        self.pole = make_report(farmer, gps_lat=89.95, gps_lng=120.0)
+
+    def report_ids(self, **params):
+        response = self.client.get('/api/reports/', params)
+        self.assertEqual(response.status_code, 200)
+        return [report['reportId'] for report in response.json()['data']['reports']]
+
+    def assertReports(self, ids, *reports):
+        self.assertEqual(sorted(ids), sorted(str(report.id) for report in reports))
+
+    def test_bbox(self):
+        self.assertReports(self.report_ids(bbox='6,3,7,4'), self.ikeja, self.lekki)
+
+    def test_bbox_across_the_antimeridian(self):
+        for bbox in ('-18,179,-16,-179', '-18,179,-16,181'):
+            self.assertReports(self.report_ids(bbox=bbox), self.fiji_east, self.fiji_west)
+
+    def test_radius_is_nearest_first(self):
+        ids = self.report_ids(nearLat=6.6, nearLng=3.36, radiusKm=30)
+        self.assertEqual(ids, [str(self.ikeja.id), str(self.lekki.id)])
+
+    def test_radius_across_the_antimeridian(self):
+        self.assertReports(
+            self.report_ids(nearLat=-17.0, nearLng=179.95, radiusKm=20), self.fiji_east, self.fiji_west
+        )
+
+    def test_radius_around_the_pole(self):
+        # The report is on the far side of the pole from the query point
+        self.assertReports(self.report_ids(nearLat=89.95, nearLng=-60.0, radiusKm=20), self.pole)
+
+    def test_split_bbox(self):
+        self.assertEqual(geo.split_bbox(0, 170, 10, -170), [(0, 170, 10, 180.0), (0, -180.0, 10, -170)])
+        self.assertEqual(geo.split_bbox(0, -190, 10, -170), [(0, 170, 10, 180.0), (0, -180.0, 10, -170)])
+        self.assertEqual(geo.split_bbox(-95, 0, 95, 400), [(-90.0, -180.0, 90.0, 180.0)])
+
+
+class ActiveAlertTests(TestCase):
+    def setUp(self):
+        # The index and the alert lists are keyed on version stamps that
+        # outlive each test's database
+        cache.clear()
+        self.admin = make_user('+2340000000721', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_alert(self, state='Lagos', city='Ikeja', expires_in=timedelta(days=1), **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Alert.objects.create(
+                title='Blight', description='', severity='warning', target_state=state, target_city=city,
+                created_by=self.admin, expires_at=timezone.now() + expires_in, **extra
+            )
+
+    def alert_ids(self, path='/api/alerts/', **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return {alert['id'] for alert in response.json()['data']['alerts']}
+
+    def test_only_unexpired_alerts_are_active(self):
+        current = self.create_alert()
+        self.create_alert(expires_in=timedelta(days=-1))
+        self.create_alert(state='Kano', city='Kano')
+        self.assertEqual(self.alert_ids(state='Lagos', active='true'), {str(current.id)})
+        self.assertEqual(self.alert_ids('/api/alerts/by-region/', state='Lagos', city='Ikeja', active='true'),
+                         {str(current.id)})
+        self.assertEqual(self.alert_ids(state='Lagos', city='Yaba', active='true'), set())
+
+    def test_writes_in_this_process_update_the_index_in_place(self):
+        first = self.create_alert()
+        self.alert_ids(state='Lagos', active='true')
+
+        with mock.patch.object(active_alerts.index, '_rebuild') as rebuild:
+            second = self.create_alert()
+            self.assertEqual(self.alert_ids(state='Lagos', active='true'), {str(first.id), str(second.id)})
+            with self.captureOnCommitCallbacks(execute=True):
+                first.delete()
+            self.assertEqual(self.alert_ids(state='Lagos', active='true'), {str(second.id)})
+        rebuild.assert_not_called()
+
+    def test_writes_by_other_processes_trigger_a_rebuild(self):
+        self.alert_ids(state='Lagos', active='true')
+        # As another process would: saved without this process's signals
+        alert = Alert(
+            title='Blight', description='', severity='warning', target_state='Lagos', target_city='Ikeja',
+            created_by=self.admin, expires_at=timezone.now() + timedelta(days=1)
+        )
+        Alert.objects.bulk_create([alert])
+        alert_cache.invalidate('Lagos')
+        self.assertEqual(self.alert_ids(state='Lagos', active='true'), {str(alert.id)})
+
+    def test_alert_lists_are_invalidated_by_alert_writes(self):
+        self.assertEqual(self.alert_ids(state='Lagos'), set())
+        self.assertEqual(self.alert_ids(), set())
+
+        alert = self.create_alert()
+        self.assertEqual(self.alert_ids(state='Lagos'), {str(alert.id)})
+        self.assertEqual(self.alert_ids(), {str(alert.id)})
+
+        # Moving an alert invalidates the lists of the state it left
+        alert.target_state = 'Kano'
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.save()
+        self.assertEqual(self.alert_ids(state='Lagos'), set())
+        self.assertEqual(self.alert_ids(state='Kano'), {str(alert.id)})
+
+
+class LoadDataTests(ReportAccountingMixin, TransactionTestCase):
+    def generate(self, **options):
+        options = {'users': 30, 'reports': 250, 'alerts': 10, 'batch_size': 40, 'workers': 1, **options}
+        call_command('generate_load_data', stdout=StringIO(), **options)
+
+    def test_generates_the_requested_rows(self):
+        PlantType.objects.create(name='Tomato', scientific_name='Solanum lycopersicum')
+        self.generate()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Report.objects.count(), 250)
+        self.assertEqual(Alert.objects.count(), 10)
+        self.assertFalse(Report.objects.filter(plant_type=None).exists())
+        # Reviewers are inspectors
+        self.assertEqual(
+            set(Report.objects.exclude(reviewed_by=None).values_list('reviewed_by__role', flat=True)), {'inspector'}
+        )
+        self.assertRollupsMatch(Report.objects.all())
+        self.assertCountersMatch(Report.objects.all())
+
+    def test_same_seed_gives_the_same_rows(self):
+        def rows():
+            return list(Report.objects.order_by('id').values_list('id', 'user_id', 'timestamp', 'state', 'status'))
+
+        now = timezone.now()
+        with mock.patch('core.management.commands.generate_load_data.timezone.now', return_value=now):
+            self.generate(seed=7)
+            first = rows()
+            User.objects.all().delete()
+            self.generate(seed=7)
+        self.assertEqual(rows(), first)
+
+    def test_rerun_inserts_nothing(self):
+        self.generate()
+        self.generate()
+        self.assertEqual(
+            (User.objects.count(), Report.objects.count(), Alert.objects.count()), (30, 250, 10)
+        )
+
+    def test_reports_need_users(self):
+        with self.assertRaises(CommandError):
+            self.generate(users=0)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = make_user('+2340000000731')
+        self.authentication = CachedJWTAuthentication()
+
+    def authenticate(self, user=None):
+        token = RefreshToken.for_user(user or self.user).access_token
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.authentication.authenticate(request)[0]
+
+    def test_repeat_requests_do_not_query_users(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_callers_get_a_copy(self):
+        self.authenticate().full_name = 'Changed'
+        self.assertEqual(self.authenticate().full_name, 'Test User')
+
+    def test_saving_the_user_drops_the_entry(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_entries_expire(self):
+        self.authenticate()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    @override_settings(AUTH_USER_CACHE_SIZE=2)
+    def test_least_recently_used_entry_is_evicted(self):
+        others = [make_user(f'+23400000007{n}') for n in (32, 33)]
+        self.authenticate()
+        self.authenticate(others[0])
+        self.authenticate()
+        self.authenticate(others[1])
+        with self.assertNumQueries(0):
+            self.authenticate()
+        with self.assertNumQueries(1):
+            self.authenticate(others[0])
+
+
+@override_settings(ACTIVITY_TRACKING_ENABLED=True)
+class ActivityTrackerTests(TestCase):
+    def setUp(self):
+        self.tracker = ActivityTracker()
+        # No background flushes; the tests flush explicitly
+        patcher = mock.patch.object(self.tracker, '_ensure_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = [make_user(f'+23400000007{n}') for n in (41, 42, 43)]
+
+    def last_active(self, user):
+        return User.objects.values_list('last_active', flat=True).get(pk=user.pk)
+
+    def test_recording_does_not_touch_the_database(self):
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                for user in self.users:
+                    self.tracker.record(user.pk)
+        self.assertEqual(self.tracker.stats()['pending'], 3)
+
+    def test_flush_writes_the_latest_time_per_user(self):
+        before = [self.last_active(user) for user in self.users]
+        for user in self.users:
+            self.tracker.record(user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.tracker.flush(), 3)
+        for user, previous in zip(self.users, before):
+            self.assertGreater(self.last_active(user), previous)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.tracker.flush(), 0)
+
+    def test_flush_is_batched(self):
+        for user in self.users:
+            self.tracker.record(user.pk)
+        with mock.patch('core.activity.FLUSH_BATCH_SIZE', 2), self.assertNumQueries(2):
+            self.tracker.flush()
+
+    def test_flush_keeps_a_newer_saved_time(self):
+        self.tracker.record(self.users[0].pk)
+        later = timezone.now() + timedelta(hours=1)
+        User.objects.filter(pk=self.users[0].pk).update(last_active=later)
+        self.tracker.flush()
+        self.assertEqual(self.last_active(self.users[0]), later)
+
+    @override_settings(ACTIVITY_TRACKING_ENABLED=False)
+    def test_disabled_tracking_records_nothing(self):
+        self.tracker.record(self.users[0].pk)
+        self.assertEqual(self.tracker.flush(), 0)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_SLOW_QUERIES=2)
+@modify_settings(MIDDLEWARE={'prepend': 'core.profiling.ProfilingMiddleware'})
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('+2340000000751', is_staff=True))
+        make_report(make_user('+2340000000752'))
+
+    def get(self, path, **params):
+        # install() adds this wrapper to every connection when profiling is enabled
+        with connection.execute_wrapper(profiling.record_query), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_profiled_requests_report_their_queries(self):
+        response, query_count = self.get('/api/reports/')
+        self.assertEqual(response['X-Profile-Queries'], str(query_count))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+
+        profiles = self.get('/api/profiles/')[0].json()['data']['profiles']
+        profile = next(entry for entry in profiles if entry['id'] == int(response['X-Profile-Id']))
+        self.assertEqual((profile['path'], profile['queries']), ('/api/reports/', query_count))
+        self.assertLessEqual(len(profile['slowQueries']), 2)
+        self.assertTrue(all(query['origin'] for query in profile['slowQueries']))
+
+    def test_profiles_limit_is_at_least_one(self):
+        self.get('/api/reports/')
+        for limit in ('-1', '1'):
+            profiles = self.get('/api/profiles/', limit=limit)[0].json()['data']['profiles']
+            self.assertEqual(len(profiles), 1)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_profiled(self):
+        response, _ = self.get('/api/reports/')
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_slowest_queries_are_kept(self):
+        profile = profiling.Profile()
+        for duration in (0.3, 0.1, 0.3, 0.2, 0.3):
+            profile.add_query('SELECT 1', duration)
+        self.assertEqual(profile.queries, 5)
+        self.assertEqual(sorted(query[0] for query in profile.slow), [0.3, 0.3])
+
+    def test_nested_sections_count_once(self):
+        profile = profiling.Profile()
+        token = profiling._current.set(profile)
+        try:
+            # Outer start, inner start, outer end; the inner end is not timed
+            with mock.patch('core.profiling.time.perf_counter', side_effect=[0.0, 1.0, 2.0]):
+                with profiling.section('serialize'):
+                    with profiling.section('serialize'):
+                        pass
+        finally:
+            profiling._current.reset(token)
+        self.assertEqual(profile.sections['serialize'], 2.0)
+
+
+class UserCounterTests(ReportAccountingMixin, TestCase):
+    def setUp(self):
+        self.farmer = make_user('+2340000000761')
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+
+    def report_stats(self):
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']['reportStats']
+
+    def test_profile_counts_follow_report_writes(self):
+        self.assertEqual(self.report_stats(), {'total': 0, 'reviewed': 0, 'pending': 0})
+        reports = [make_report(self.farmer) for _ in range(3)]
+        reports[0].status = 'reviewed'
+        reports[0].save()
+        reports[1].delete()
+        self.assertEqual(self.report_stats(), {'total': 2, 'reviewed': 1, 'pending': 1})
+        self.assertCountersMatch(Report.objects.all())
+
+    def test_bulk_submission_is_counted(self):
+        item = {
+            'gpsLat': 6.5, 'gpsLng': 3.3, 'city': 'Ikeja', 'state': 'Lagos', 'imageUrl': 'https://example.com/leaf.jpg',
+            'plantType': {}, 'disease': {}, 'pest': {}, 'drought': {},
+        }
+        reports = [{**item, 'clientId': f'draft-{n}'} for n in range(3)]
+        for _ in range(2):
+            # The retry is all duplicates and must not count again
+            response = self.client.post('/api/reports/bulk/', {'reports': reports}, format='json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.report_stats()['total'], 3)
+        self.assertCountersMatch(Report.objects.all())
+
+    def test_reconcile_repairs_drift(self):
+        make_report(self.farmer, status='reviewed')
+        other = make_user('+2340000000762')
+        make_report(other)
+        UserReportStats.objects.filter(user=self.farmer).update(report_count=7, reviewed_count=0)
+        UserReportStats.objects.filter(user=other).delete()
+
+        call_command('reconcile_report_counters', dry_run=True, stdout=StringIO())
+        self.assertEqual(UserReportStats.objects.get(user=self.farmer).report_count, 7)
+
+        call_command('reconcile_report_counters', stdout=StringIO())
+        self.assertCountersMatch(Report.objects.all())
+
+    def test_deleting_a_user_with_reports(self):
+        make_report(self.farmer)
+        self.farmer.delete()
+        self.assertFalse(UserReportStats.objects.exists())
+
+
+class CatalogSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('+2340000000771'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.locust = PestType.objects.create(
+                name='الجَرَاد الصحراوي', description='آفة تهاجم المحاصيل', treatment='', severity='high'
+            )
+            self.aphid = PestType.objects.create(
+                name='Aphid', description='Sap-sucking pest on tomato leaves', treatment='', severity='low'
+            )
+            self.leaf_miner = PestType.objects.create(
+                name='Tomato leaf miner', description='Tunnels through leaves', treatment='', severity='high'
+            )
+
+    def search(self, term):
+        response = self.client.get('/api/pest-types/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [pest['name'] for pest in response.json()['results']]
+
+    def test_normalize_text(self):
+        self.assertEqual(search.normalize_text('الجَرَاد'), 'الجراد')
+        self.assertEqual(search.normalize_text('أفـــة'), search.normalize_text('آفة'))
+        self.assertEqual(search.normalize_text('إفريقيا ى'), 'افريقيا ي')
+        self.assertEqual(search.normalize_text('Mildiou Poudré!'), 'mildiou poudre')
+
+    def test_arabic_spelling_variants_match(self):
+        # Without diacritics, with a different alef and ta marbuta as ha
+        self.assertEqual(self.search('الجراد'), [self.locust.name])
+        self.assertEqual(self.search('افه'), [self.locust.name])
+
+    def test_every_word_must_match_and_prefix_matches_rank_first(self):
+        self.assertEqual(self.search('tomato tunnels'), [self.leaf_miner.name])
+        # Equal rank falls back to name order
+        self.assertEqual(self.search('tomato leaves'), [self.aphid.name, self.leaf_miner.name])
+        self.assertEqual(self.search('TOMATO'), [self.leaf_miner.name, self.aphid.name])
+
+    def test_search_text_follows_partial_saves(self):
+        self.aphid.name = 'Green peach aphid'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aphid.save(update_fields=['name'])
+        self.assertEqual(self.search('peach'), ['Green peach aphid'])
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        farmer = make_user('+2340000000781')
+        for _ in range(10):
+            make_report(farmer, notes='Leaves yellowing from the edges inwards. ' * 5)
+        self.client = APIClient()
+        self.client.force_authenticate(farmer)
+
+    def test_negotiation(self):
+        with mock.patch.object(compression, 'brotli', mock.Mock()):
+            self.assertEqual(compression.negotiate('gzip, deflate, br'), 'br')
+            self.assertEqual(compression.negotiate('br;q=0.5, gzip;q=0.8'), 'gzip')
+            self.assertEqual(compression.negotiate('*'), 'br')
+            self.assertEqual(compression.negotiate('*;q=0, gzip'), 'gzip')
+            self.assertEqual(compression.negotiate('br;q=abc, gzip'), 'gzip')
+        with mock.patch.object(compression, 'brotli', None):
+            self.assertEqual(compression.negotiate('gzip, deflate, br'), 'gzip')
+            self.assertIsNone(compression.negotiate('br'))
+        self.assertIsNone(compression.negotiate(''))
+        self.assertIsNone(compression.negotiate('gzip;q=0, identity'))
+
+    def test_json_is_gzipped_when_accepted(self):
+        plain = self.client.get('/api/reports/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        with mock.patch.object(compression, 'brotli', None):
+            response = self.client.get('/api/reports/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_json_is_brotli_compressed_when_preferred(self):
+        plain = self.client.get('/api/reports/')
+        response = self.client.get('/api/reports/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), plain.content)
+
+    @override_settings(COMPRESSION_MIN_SIZE=10 ** 6)
+    def test_small_bodies_are_sent_as_is(self):
+        response = self.client.get('/api/reports/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_strong_etag_is_weakened(self):
+        response = HttpResponse(b'{"data": "%s"}' % (b'x' * 2000), content_type='application/json')
+        response['ETag'] = '"abc"'
+        request = APIRequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        compressed = compression.compress_response(request, response)
+        self.assertEqual((compressed['Content-Encoding'], compressed['ETag']), ('gzip', 'W/"abc"'))
+
+    def test_opted_out_and_non_text_responses_are_left_alone(self):
+        request = APIRequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        body = b'x' * 5000
+        for response in (
+            HttpResponse(body, content_type='image/jpeg'),
+            HttpResponse(body, content_type='application/json', headers={'Cache-Control': 'no-transform'}),
+            compression.no_compression(lambda: HttpResponse(body, content_type='application/json'))(),
+        ):
+            self.assertFalse(compression.compress_response(request, response).has_header('Content-Encoding'))
+
+
+class FakeConnection:
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+        self.closed = 0
+        self.rollbacks = 0
+        self.queries = 0
+        self.info = mock.Mock(transaction_status=0)
+
+    def cursor(self):
+        connection = self
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value = cursor
+
+        def execute(sql):
+            connection.queries += 1
+            if not connection.healthy:
+                raise OSError('server closed the connection')
+            connection.info.transaction_status = 2
+
+        cursor.execute.side_effect = execute
+        return cursor
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('core.db.pool.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = ConnectionPool('default', size=2, timeout=0.01, check_interval=30, max_lifetime=600)
+
+    def test_returned_connections_are_reused(self):
+        first = self.pool.checkout(FakeConnection)
+        self.pool.checkin(first)
+        self.assertIs(self.pool.checkout(FakeConnection), first)
+        stats = self.pool.stats()
+        self.assertEqual((stats['created'], stats['checkouts'], stats['inUse'], stats['idle']), (1, 2, 1, 0))
+
+    def test_checkout_times_out_when_exhausted(self):
+        held = [self.pool.checkout(FakeConnection) for _ in range(2)]
+        with self.assertRaises(PoolTimeout):
+            self.pool.checkout(FakeConnection)
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+
+        self.pool.checkin(held[0])
+        self.assertIs(self.pool.checkout(FakeConnection), held[0])
+
+    def test_failed_connect_releases_its_slot(self):
+        def connect():
+            raise OSError('could not connect')
+
+        for _ in range(3):
+            with self.assertRaises(OSError):
+                self.pool.checkout(connect)
+        self.assertEqual(self.pool.stats()['inUse'], 0)
+        self.pool.checkout(FakeConnection)
+
+    def test_open_transaction_is_rolled_back_on_checkin(self):
+        connection = self.pool.checkout(FakeConnection)
+        connection.info.transaction_status = 2
+        self.pool.checkin(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertIs(self.pool.checkout(FakeConnection), connection)
+
+    def test_closed_connection_is_discarded_on_checkin(self):
+        connection = self.pool.checkout(FakeConnection)
+        connection.closed = 1
+        self.pool.checkin(connection)
+        self.assertIsNot(self.pool.checkout(FakeConnection), connection)
+        self.assertEqual(self.pool.stats()['discarded'], 1)
+
+    def test_idle_connection_is_checked_before_reuse(self):
+        connection = self.pool.checkout(FakeConnection)
+        self.pool.checkin(connection)
+        self.now += 10
+        self.assertIs(self.pool.checkout(FakeConnection), connection)
+        self.assertEqual(connection.queries, 0)
+        self.pool.checkin(connection)
+
+        self.now += 31
+        self.assertIs(self.pool.checkout(FakeConnection), connection)
+        self.assertEqual(connection.queries, 1)
+        # The health check's implicit transaction is not left open
+        self.assertEqual(connection.info.transaction_status, 0)
+        self.pool.checkin(connection)
+
+        connection.healthy = False
+        self.now += 31
+        replacement = self.pool.checkout(FakeConnection)
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+
+    def test_connections_are_replaced_after_max_lifetime(self):
+        connection = self.pool.checkout(FakeConnection)
+        self.now += 601
+        self.pool.checkin(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(self.pool.stats()['idle'], 0)
+
+        connection = self.pool.checkout(FakeConnection)
+        self.pool.checkin(connection)
+        self.now += 601
+        self.assertIsNot(self.pool.checkout(FakeConnection), connection)
+        self.assertEqual(self.pool.stats()['discarded'], 2)
+
+    def test_close_idle(self):
+        connections = [self.pool.checkout(FakeConnection) for _ in range(2)]
+        for connection in connections:
+            self.pool.checkin(connection)
+        self.pool.close_idle()
+        self.assertTrue(all(connection.closed for connection in connections))
+        self.assertEqual(self.pool.stats()['idle'], 0)
+
+
+@skipUnless(importlib.util.find_spec('psycopg2'), 'psycopg2 is not installed')
+class PooledBackendTests(SimpleTestCase):
+    def setUp(self):
+        from django.db.backends.postgresql.base import DatabaseWrapper as PostgresWrapper
+
+        from .db import pool
+        from .db.backends.pooled_postgresql.base import DatabaseWrapper
+
+        self.pool = ConnectionPool('pooled-test', size=1, timeout=0.01, check_interval=30, max_lifetime=600)
+        patcher = mock.patch.dict(pool._pools, {'pooled-test': self.pool})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            PostgresWrapper, 'get_new_connection', side_effect=lambda params: FakeConnection()
+        )
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.wrapper = DatabaseWrapper({
+            'NAME': 'agriscan', 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '', 'OPTIONS': {},
+            'TIME_ZONE': None, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'AUTOCOMMIT': True,
+        }, alias='pooled-test')
+
+    def test_close_returns_the_connection_to_the_pool(self):
+        first = self.wrapper.get_new_connection({})
+        self.wrapper.connection = first
+        self.wrapper._close()
+        self.assertIs(self.wrapper.get_new_connection({}), first)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_pool_timeout_is_an_operational_error(self):
+        self.wrapper.get_new_connection({})
+        with self.assertRaises(self.wrapper.Database.OperationalError):
+            self.wrapper.get_new_connection({})
@@ -0,0 +1,213 @@
+"""
+Report images uploaded straight to this server.
+
+ImageUploadHandler streams a multipart image to a temporary file under
+MEDIA_ROOT in chunks while hashing it, so the body is never held in
+memory. The finished file is stored under its SHA-256 digest
+(``uploads/ab/cd/<digest>.jpg``), which makes repeated uploads of the
+same image free. A thumbnail and a model-sized copy are then generated
+in a small thread pool without holding up the response.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = 'uploads'
+UPLOAD_FIELD = 'image'
+DERIVATIVES = ('thumb', 'model')
+# Input size of the detection models
+MODEL_IMAGE_SIZE = (224, 224)
+
+# Leading bytes of each accepted format -> (content type, extension)
+SIGNATURES = [
+    (re.compile(rb'^\xff\xd8\xff'), 'image/jpeg', 'jpg'),
+    (re.compile(rb'^\x89PNG\r\n\x1a\n'), 'image/png', 'png'),
+    (re.compile(rb'^RIFF....WEBP', re.DOTALL), 'image/webp', 'webp'),
+]
+SIGNATURE_LENGTH = 12
+
+class UploadError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def upload_root():
+    return Path(settings.MEDIA_ROOT) / UPLOAD_DIR
+
+
+def relative_path(digest, ext, derivative=None):
+    name = f'{digest}_{derivative}.jpg' if derivative else f'{digest}.{ext}'
+    # Two levels of fan-out keep directories small
+    return Path(UPLOAD_DIR, digest[:2], digest[2:4], name)
+
+
+def media_url(request, path):
+    return request.build_absolute_uri(settings.MEDIA_URL + path.as_posix())
+
+
+def sniff(header):
+    for signature, content_type, ext in SIGNATURES:
+        if signature.match(header):
+            return content_type, ext
+    return None
+
+
+class StoredImage(UploadedFile):
+    """An uploaded image moved to its content-addressed location."""
+
+    def __init__(self, digest, ext, content_type, size, created):
+        super().__init__(
+            file=None, name=f'{digest}.{ext}', content_type=content_type, size=size
+        )
+        self.digest = digest
+        self.ext = ext
+        self.created = created
+
+    @property
+    def path(self):
+        return relative_path(self.digest, self.ext)
+
+    def derivatives_missing(self):
+        root = Path(settings.MEDIA_ROOT)
+        return any(
+            not (root / relative_path(self.digest, self.ext, name)).exists() for name in DERIVATIVES
+        )
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Upload handler that streams the ``image`` field to content-addressed storage.
+
+    Only this handler is installed for the upload view, so other file
+    fields are skipped rather than buffered. Errors are kept in
+    ``self.error`` for the view to report once parsing has finished. The
+    view calls cleanup() however parsing ends, since Django only tells the
+    handler about some failures.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.stored = None
+        self._file = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != UPLOAD_FIELD or self.stored is not None or self.error:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+        tmp_dir = upload_root() / 'tmp'
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+        self._file = os.fdopen(fd, 'wb')
+        self._hash = hashlib.sha256()
+        self._header = b''
+        self._type = None
+        self._size = 0
+
+    def _abort(self, message, status_code):
+        self.error = UploadError(message, status_code)
+        self.upload_interrupted()
+        raise StopUpload()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._size += len(raw_data)
+        if self._size > settings.UPLOAD_IMAGE_MAX_BYTES:
+            self._abort('Image is too large', 413)
+        if self._type is None:
+            self._header += raw_data[:SIGNATURE_LENGTH - len(self._header)]
+            if len(self._header) >= SIGNATURE_LENGTH:
+                self._type = sniff(self._header)
+                if self._type is None:
+                    self._abort('Only JPEG, PNG and WebP images are accepted', 415)
+        self._hash.update(raw_data)
+        self._file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        if self._type is None:
+            # Shorter than any image header
+            os.unlink(self._tmp_path)
+            self.error = UploadError('Only JPEG, PNG and WebP images are accepted', 415)
+            return None
+
+        content_type, ext = self._type
+        digest = self._hash.hexdigest()
+        target = Path(settings.MEDIA_ROOT) / relative_path(digest, ext)
+        created = not target.exists()
+        if created:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.chmod(self._tmp_path, 0o644)
+            # Atomic, so a concurrent upload of the same image never sees half a file
+            os.replace(self._tmp_path, target)
+        else:
+            os.unlink(self._tmp_path)
+        self.stored = StoredImage(digest, ext, content_type, file_size, created)
+        return self.stored
+
+    def upload_interrupted(self):
+        self.cleanup()
+
+    def cleanup(self):
+        """Remove the partial file of an upload that did not complete."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.unlink(self._tmp_path)
+            except FileNotFoundError:
+                pass
+
+
+def generate_derivatives(stored):
+    """Write the thumbnail and model-input copies of an uploaded image."""
+    from PIL import Image, ImageOps
+
+    root = Path(settings.MEDIA_ROOT)
+    source = root / stored.path
+    try:
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+        derivatives = {
+            'thumb': ImageOps.contain(image, (settings.UPLOAD_THUMBNAIL_SIZE, settings.UPLOAD_THUMBNAIL_SIZE)),
+            'model': image.resize(MODEL_IMAGE_SIZE),
+        }
+        for name, derivative in derivatives.items():
+            target = root / relative_path(stored.digest, stored.ext, name)
+            tmp = target.with_suffix('.part')
+            derivative.save(tmp, format='JPEG', quality=85)
+            os.replace(tmp, target)
+    except Exception:
+        logger.exception('Could not generate derivatives for %s', source)
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.UPLOAD_IMAGE_WORKERS, thread_name_prefix='upload-images'
+        )
+    return _executor
+
+
+def schedule_derivatives(stored):
+    get_executor().submit(generate_derivatives, stored)
+
@@ -1,11 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .compression import no_compression
 from .views import (
     UserViewSet, PlantTypeViewSet, DiseaseTypeViewSet,
     ReportViewSet, AlertViewSet, UserRegistrationView,
     UserLoginView, UserProfileView, PlantDetectionView,
     DiseaseDetectionView, PestDetectionView, DroughtDetectionView,
-    ReportStatusUpdateView, PestTypeViewSet
+    ReportStatusUpdateView, PestTypeViewSet, ReportStatsView,
+    MetricsView, SyncView, ReportSubmitView, ProfilesView, CatalogBundleView,
+    ImageUploadView, ReviewQueueView, ReviewQueueReleaseView,
+    ReportBulkStatusUpdateView
 )
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -26,7 +30,19 @@ urlpatterns = [
     path('detect/disease/', DiseaseDetectionView.as_view(), name='disease-detection'),
     path('detect/pest/', PestDetectionView.as_view(), name='pest-detection'),
     path('detect/drought/', DroughtDetectionView.as_view(), name='drought-detection'),
+    # The response is a short JSON document; not worth compressing
+    path('uploads/images/', no_compression(ImageUploadView.as_view()), name='image-upload'),
+    path('reports/submit/', ReportSubmitView.as_view(), name='report-submit'),
+    path('reports/status/', ReportBulkStatusUpdateView.as_view(), name='report-bulk-status-update'),
     path('reports/<uuid:report_id>/status/', ReportStatusUpdateView.as_view(), name='report-status-update'),
+    path('review-queue/', ReviewQueueView.as_view(), name='review-queue'),
+    path('review-queue/release/', ReviewQueueReleaseView.as_view(), name='review-queue-release'),
+    path('stats/reports/', ReportStatsView.as_view(), name='report-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('profiles/', ProfilesView.as_view(), name='profiles'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    # Serves its own precompressed gzip body instead of compressing per request
+    path('catalog/bundle/', no_compression(CatalogBundleView.as_view()), name='catalog-bundle'),
     
     # Alert specific routes
     path('alerts/by-region/', AlertViewSet.as_view({'get': 'by_region'}), name='alerts-by-region'),
@@ -1,12 +1,22 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import MultiPartParser
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import BasePermission, IsAuthenticated, AllowAny, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
 from django.utils import timezone
-from datetime import datetime
-from .models import User, PlantType, DiseaseType, Report, Alert, PestType
+from datetime import datetime, time, timedelta
+from .models import User, PlantType, DiseaseType, Report, Alert, PestType, ReportRollup, ArchivedReport
 from .serializers import (
     UserSerializer, PlantTypeSerializer, DiseaseTypeSerializer,
     ReportSerializer, AlertSerializer, UserRegistrationSerializer,
@@ -16,13 +26,25 @@ from .serializers import (
     PestDetectionRequestSerializer, PestDetectionResponseSerializer,
     DroughtDetectionRequestSerializer, DroughtDetectionResponseSerializer,
     ReportCreateSerializer, ReportStatusUpdateSerializer, ReportListSerializer,
+    ReportBulkStatusUpdateSerializer,
     PestTypeSerializer
 )
 import uuid
 import random
+import hashlib
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import action
 from .detection import detect_plant, detect_disease
+from . import active_alerts
+from .aio import AsyncAPIView, json_response, random_row
+from .alert_cache import get_alert_data
+from .cache import get_version
+from . import catalog, compression, counters, metrics, profiling, review_queue, sync, uploads
+from .exports import EXPORT_STREAMS, EXPORT_CONTENT_TYPES
+from .filters import ArchivedReportFilter, CatalogSearchFilter, ReportFilter
+from .geo import filter_within_bbox, filter_within_radius
+from .bulk_status import bulk_update_status
+from .ingest import bulk_create_reports
 
 
 class UserRegistrationView(APIView):
@@ -168,18 +190,85 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
-class PlantTypeViewSet(viewsets.ModelViewSet):
+def etag_matches(request, etag):
+    """Weak comparison against If-None-Match; compressed responses carry W/ ETags."""
+    values = [value.strip() for value in request.headers.get('If-None-Match', '').split(',')]
+    return etag in [value[2:] if value.startswith('W/') else value for value in values]
+
+class CatalogCacheMixin:
+    """
+    Conditional GET and response caching for catalog list endpoints.
+
+    Each catalog carries a version stamp that is replaced whenever one of its
+    rows is saved or deleted. The ETag is derived from that stamp and the
+    request, so a matching If-None-Match is answered with 304 Not Modified
+    and other requests are served from the cached serialized body, neither
+    of which touches the catalog table.
+    """
+
+    def get_catalog_etag(self, request, version):
+        key = f"{version}:{request.accepted_renderer.format}:{request.get_full_path()}"
+        return '"%s"' % hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    def list(self, request, *args, **kwargs):
+        version = get_version(self.queryset.model._meta.model_name)
+        etag = self.get_catalog_etag(request, version)
+
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cache_key = f"catalog-body:{etag}"
+            data = cache.get(cache_key)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                cache.set(cache_key, data, settings.CATALOG_CACHE_TIMEOUT)
+            response = Response(data)
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class CatalogBundleView(APIView):
+    """
+    Every plant, disease and pest type in one precompressed response.
+
+    The ETag is the bundle version, a hash of the catalog content. Clients
+    send it back in If-None-Match and receive 304 Not Modified until a
+    catalog actually changes.
+
+    Returns:
+    - success: Boolean indicating if the request was successful
+    - data: version, plantTypes, diseaseTypes and pestTypes
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        bundle = catalog.get_bundle()
+
+        if etag_matches(request, bundle.etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif compression.accepts(request.headers.get('Accept-Encoding', ''), 'gzip'):
+            response = HttpResponse(bundle.compressed, content_type='application/json; charset=utf-8')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(bundle.body, content_type='application/json; charset=utf-8')
+
+        response['ETag'] = bundle.etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+class PlantTypeViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = PlantType.objects.all()
     serializer_class = PlantTypeSerializer
 
-class DiseaseTypeViewSet(viewsets.ModelViewSet):
+class DiseaseTypeViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = DiseaseType.objects.all()
     serializer_class = DiseaseTypeSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, CatalogSearchFilter]
     filterset_fields = ['severity']
-    search_fields = ['name', 'description']
 
-class PestTypeViewSet(viewsets.ModelViewSet):
+class PestTypeViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing pest types.
     
@@ -192,9 +281,45 @@ class PestTypeViewSet(viewsets.ModelViewSet):
     """
     queryset = PestType.objects.all()
     serializer_class = PestTypeSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, CatalogSearchFilter]
     filterset_fields = ['severity']
-    search_fields = ['name', 'description']
+
+def submit_report(request, data):
+    """
+    Create a report for request.user; shared by the REST and async views.
+
+    Returns the response body and status code.
+    """
+    serializer = ReportCreateSerializer(data=data, context={'request': request})
+    if serializer.is_valid():
+        client_id = serializer.validated_data.get('client_id')
+        existing = Report.objects.filter(user=request.user, client_id=client_id).first() if client_id else None
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    report = serializer.save()
+            except IntegrityError:
+                if not client_id:
+                    raise
+                # A concurrent retry saved the same client_id first
+                existing = Report.objects.get(user=request.user, client_id=client_id)
+        if existing is not None:
+            # Retried upload; return the report created the first time
+            return {
+                'success': True,
+                'message': 'Report already submitted',
+                'data': ReportListSerializer(existing).data
+            }, status.HTTP_200_OK
+        return {
+            'success': True,
+            'message': 'Report submitted successfully',
+            'data': ReportListSerializer(report).data
+        }, status.HTTP_201_CREATED
+    return {
+        'success': False,
+        'message': 'Failed to submit report',
+        'errors': serializer.errors
+    }, status.HTTP_400_BAD_REQUEST
 
 class ReportViewSet(viewsets.ModelViewSet):
     """
@@ -207,6 +332,14 @@ class ReportViewSet(viewsets.ModelViewSet):
     - PUT /api/reports/{id}/: Update a specific report
     - DELETE /api/reports/{id}/: Delete a specific report
     - GET /api/reports/user/{user_id}/: Get reports for a specific user
+    - GET /api/reports/export/: Stream filtered reports as CSV or NDJSON
+    - POST /api/reports/bulk/: Submit a batch of reports in one request
+
+    Add archived=true to the list and export to read archived reports instead.
+
+    Spatial filters (query parameters):
+    - bbox: minLat,minLng,maxLat,maxLng
+    - nearLat, nearLng, radiusKm: reports within radiusKm of a point, nearest first
     
     Report fields:
     - gpsLat: GPS latitude
@@ -223,14 +356,18 @@ class ReportViewSet(viewsets.ModelViewSet):
     queryset = Report.objects.all()
     serializer_class = ReportListSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = [
-        'status', 'state', 'city',
-        'plant_detection__plantId', 'disease_detection__diseaseId',
-        'pest_detection__pestId', 'drought_detection__droughtLevel'
-    ]
+
+    @property
+    def archived(self):
+        # Archived reports are only listed on request and cannot be changed
+        return self.action in ('list', 'export') and self.request.query_params.get('archived', '').lower() == 'true'
+
+    @property
+    def filterset_class(self):
+        return ArchivedReportFilter if self.archived else ReportFilter
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = ArchivedReport.objects.all() if self.archived else super().get_queryset()
         
         # Filter by date range if provided
         start_date = self.request.query_params.get('startDate')
@@ -249,23 +386,33 @@ class ReportViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(timestamp__lte=end_date)
             except ValueError:
                 pass
-                
+
+        # Filter by bounding box: bbox=minLat,minLng,maxLat,maxLng
+        bbox = self.request.query_params.get('bbox')
+        if bbox:
+            try:
+                min_lat, min_lng, max_lat, max_lng = [float(value) for value in bbox.split(',')]
+                queryset = filter_within_bbox(queryset, min_lat, min_lng, max_lat, max_lng)
+            except ValueError:
+                pass
+
+        # Filter by distance from a point, nearest first
+        near_lat = self.request.query_params.get('nearLat')
+        near_lng = self.request.query_params.get('nearLng')
+        radius_km = self.request.query_params.get('radiusKm')
+        if near_lat and near_lng and radius_km:
+            try:
+                queryset = filter_within_radius(
+                    queryset, float(near_lat), float(near_lng), float(radius_km)
+                )
+            except ValueError:
+                pass
+
         return queryset
 
     def create(self, request, *args, **kwargs):
-        serializer = ReportCreateSerializer(data=request.data, context={'request': request})
-        if serializer.is_valid():
-            report = serializer.save()
-            return Response({
-                'success': True,
-                'message': 'Report submitted successfully',
-                'data': ReportListSerializer(report).data
-            }, status=status.HTTP_201_CREATED)
-        return Response({
-            'success': False,
-            'message': 'Failed to submit report',
-            'errors': serializer.errors
-        }, status=status.HTTP_400_BAD_REQUEST)
+        data, status_code = submit_report(request, request.data)
+        return Response(data, status=status_code)
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
@@ -284,7 +431,76 @@ class ReportViewSet(viewsets.ModelViewSet):
             'success': True,
             'data': serializer.data
         })
-        
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Submit many reports at once, e.g. when an offline client syncs.
+
+        Accepts POST request with:
+        - reports: List of reports in the same format as POST /api/reports/,
+          each with an optional clientId used as an idempotency key
+
+        Returns:
+        - success: Boolean indicating if the request was processed
+        - data: Per-item results with status created, duplicate or invalid
+        """
+        items = request.data.get('reports') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({
+                'success': False,
+                'message': 'reports must be a non-empty list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(items) > settings.REPORT_BULK_MAX_ITEMS:
+            return Response({
+                'success': False,
+                'message': f'At most {settings.REPORT_BULK_MAX_ITEMS} reports can be submitted at once'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk_create_reports(request, items)
+        counts = {'created': 0, 'duplicate': 0, 'invalid': 0}
+        for result in results:
+            counts[result['status']] += 1
+
+        return Response({
+            'success': True,
+            'message': f"{counts['created']} reports submitted",
+            'data': {
+                'created': counts['created'],
+                'duplicates': counts['duplicate'],
+                'failed': counts['invalid'],
+                'results': results
+            }
+        })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream reports as CSV or NDJSON.
+
+        Accepts the same filters as the report list and additionally:
+        - exportFormat: csv (default) or ndjson
+
+        Rows are streamed straight from a database cursor, so memory use
+        does not grow with the size of the export.
+        """
+        export_format = request.query_params.get('exportFormat', 'csv')
+        if export_format not in EXPORT_STREAMS:
+            return Response({
+                'success': False,
+                'message': 'exportFormat must be one of: ' + ', '.join(EXPORT_STREAMS)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            EXPORT_STREAMS[export_format](queryset),
+            content_type=EXPORT_CONTENT_TYPES[export_format]
+        )
+        filename = f"reports-{timezone.now():%Y%m%d%H%M%S}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     @action(detail=False, methods=['get'], url_path='user/(?P<user_id>[^/.]+)')
     def user_reports(self, request, user_id=None):
         """
@@ -295,18 +511,21 @@ class ReportViewSet(viewsets.ModelViewSet):
         - Experts can view any user's reports
         """
         try:
-            # Check if the requested user exists
-            target_user = User.objects.get(id=user_id)
-            
             # Get the current user
             current_user = request.user
             
-            # Check permissions
+            # Check permissions; request.user is cached, so this needs no query
             if current_user.role == 'farmer' and str(current_user.id) != user_id:
                 return Response({
                     'success': False,
                     'message': 'You can only view your own reports'
                 }, status=status.HTTP_403_FORBIDDEN)
+
+            # Check if the requested user exists
+            if str(current_user.id) == user_id:
+                target_user = current_user
+            else:
+                target_user = User.objects.only('id', 'full_name').get(id=user_id)
                 
             # Get reports for the target user
             reports = Report.objects.filter(user=target_user)
@@ -347,18 +566,16 @@ class ReportViewSet(viewsets.ModelViewSet):
                 'message': 'User not found'
             }, status=status.HTTP_404_NOT_FOUND)
 
+class IsInspector(BasePermission):
+    message = 'Only inspectors can review reports'
+
+    def has_permission(self, request, view):
+        return request.user.role == 'inspector' or request.user.is_staff
+
 class ReportStatusUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, report_id):
-        try:
-            report = Report.objects.get(id=report_id)
-        except Report.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'Report not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-
         serializer = ReportStatusUpdateSerializer(data=request.data)
         if not serializer.is_valid():
             return Response({
@@ -367,11 +584,29 @@ class ReportStatusUpdateView(APIView):
                 'errors': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        report.status = serializer.validated_data['status']
-        report.notes = serializer.validated_data.get('notes', '')
-        report.reviewed_by = request.user
-        report.reviewed_at = timezone.now()
-        report.save()
+        with transaction.atomic():
+            # Lock the row so concurrent reviews and claims apply one at a time
+            try:
+                report = Report.objects.select_for_update().get(id=report_id)
+            except Report.DoesNotExist:
+                return Response({
+                    'success': False,
+                    'message': 'Report not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            if review_queue.claimed_by_other(report, request.user):
+                return Response({
+                    'success': False,
+                    'message': 'Report is claimed by another inspector'
+                }, status=status.HTTP_409_CONFLICT)
+
+            report.status = serializer.validated_data['status']
+            report.notes = serializer.validated_data.get('notes', '')
+            report.reviewed_by = request.user
+            report.reviewed_at = timezone.now()
+            report.claimed_by = None
+            report.claimed_until = None
+            report.save()
 
         return Response({
             'success': True,
@@ -385,6 +620,170 @@ class ReportStatusUpdateView(APIView):
             }
         })
 
+class ReportBulkStatusUpdateView(APIView):
+    """
+    Set the status of many reports at once.
+
+    Accepts PUT request with:
+    - reportIds: Report ids to update (at most REPORT_BULK_STATUS_MAX_ITEMS), or
+    - filter: Report list filters selecting the reports, e.g.
+      {"status": "submitted", "state": "Lagos", "city": "Ikeja"}
+    - status: submitted or reviewed
+    - reviewNotes: Optional notes stored on every updated report
+
+    Returns:
+    - success: Boolean indicating if the request was successful
+    - data: Counts per outcome and a results entry per report with its
+      outcome: updated, unchanged, claimed (held by another inspector in
+      the review queue) or notFound
+    """
+    permission_classes = [IsAuthenticated, IsInspector]
+
+    def put(self, request):
+        serializer = ReportBulkStatusUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid request data',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        report_ids = data.get('reportIds')
+        if report_ids is None:
+            unknown = set(data['filter']) - set(ReportFilter.base_filters)
+            if unknown:
+                return Response({
+                    'success': False,
+                    'message': 'Unknown filters: ' + ', '.join(sorted(unknown))
+                }, status=status.HTTP_400_BAD_REQUEST)
+            filterset = ReportFilter(data=data['filter'], queryset=Report.objects.all())
+            if not filterset.is_valid():
+                return Response({
+                    'success': False,
+                    'message': 'Invalid filter',
+                    'errors': filterset.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+            limit = settings.REPORT_BULK_STATUS_MAX_ITEMS
+            report_ids = list(filterset.qs.order_by('timestamp').values_list('id', flat=True)[:limit + 1])
+            if len(report_ids) > limit:
+                return Response({
+                    'success': False,
+                    'message': f'The filter matches more than {limit} reports; narrow it down'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk_update_status(request.user, report_ids, data['status'], data.get('notes'))
+        counts = {'updated': 0, 'unchanged': 0, 'claimed': 0, 'notFound': 0}
+        for result in results:
+            counts[result['status']] += 1
+        return Response({
+            'success': True,
+            'message': f"{counts['updated']} reports updated",
+            'data': {
+                'updated': counts['updated'],
+                'unchanged': counts['unchanged'],
+                'claimed': counts['claimed'],
+                'notFound': counts['notFound'],
+                'results': results
+            }
+        })
+
+class ReviewQueueView(APIView):
+    """
+    Claim submitted reports to review without colliding with other inspectors.
+
+    GET lists the reports the inspector currently holds. POST claims the
+    oldest unclaimed submitted reports in a region, topping the
+    inspector's held reports up to the limit, and renews the lease on all
+    of them. Claims expire after REVIEW_LEASE_SECONDS; reviewing a report
+    through the status endpoint releases it.
+
+    Accepts POST request with:
+    - limit: Number of reports to hold (default 10, at most REVIEW_CLAIM_MAX)
+    - state: Region to work on (default: the inspector's state)
+    - city: Optional city within the state
+
+    Returns:
+    - success: Boolean indicating if the request was successful
+    - data: Claimed reports and leaseExpiresAt
+    """
+    permission_classes = [IsAuthenticated, IsInspector]
+
+    def get(self, request):
+        now = timezone.now()
+        reports = Report.objects.filter(
+            review_queue.held_by(request.user, now)
+        ).select_related('reviewed_by').order_by('timestamp')
+        return Response({
+            'success': True,
+            'data': {
+                'reports': ReportListSerializer(reports, many=True).data
+            }
+        })
+
+    def post(self, request):
+        try:
+            limit = int(request.data.get('limit', 10))
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'message': 'limit must be a number'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.REVIEW_CLAIM_MAX))
+
+        state = request.data.get('state') or request.user.state
+        reports, lease_until = review_queue.claim(
+            request.user, limit, state=state, city=request.data.get('city')
+        )
+        data = ReportListSerializer(reports, many=True).data
+        return Response({
+            'success': True,
+            'message': f'{len(data)} reports claimed',
+            'data': {
+                'reports': data,
+                'leaseExpiresAt': lease_until
+            }
+        })
+
+class ReviewQueueReleaseView(APIView):
+    """
+    Return claimed reports to the review queue.
+
+    Accepts POST request with:
+    - reportIds: Ids of reports held by the caller
+
+    Returns:
+    - success: Boolean indicating if the request was successful
+    - data: released, the number of reports released
+    """
+    permission_classes = [IsAuthenticated, IsInspector]
+
+    def post(self, request):
+        report_ids = request.data.get('reportIds')
+        if not isinstance(report_ids, list):
+            return Response({
+                'success': False,
+                'message': 'reportIds must be a list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report_ids = [uuid.UUID(str(report_id)) for report_id in report_ids]
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'reportIds must contain report ids'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        released = review_queue.release(request.user, report_ids)
+        return Response({
+            'success': True,
+            'message': f'{released} reports released',
+            'data': {'released': released}
+        })
+
+def start_of_day(day):
+    # Compare against datetimes so the lookups can use an index, unlike __date
+    return timezone.make_aware(datetime.combine(day, time.min))
+
 class AlertViewSet(viewsets.ModelViewSet):
     queryset = Alert.objects.all()
     serializer_class = AlertSerializer
@@ -418,10 +817,8 @@ class AlertViewSet(viewsets.ModelViewSet):
             try:
                 # Parse the date string to extract year, month, day
                 start_date_obj = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                # Create a date object with only year, month, day
-                start_date_only = start_date_obj.date()
-                # Filter alerts created on or after this date
-                queryset = queryset.filter(created_at__date__gte=start_date_only)
+                # Filter alerts created on or after the start of this day
+                queryset = queryset.filter(created_at__gte=start_of_day(start_date_obj.date()))
             except ValueError:
                 pass
                 
@@ -429,16 +826,39 @@ class AlertViewSet(viewsets.ModelViewSet):
             try:
                 # Parse the date string to extract year, month, day
                 end_date_obj = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                # Create a date object with only year, month, day
-                end_date_only = end_date_obj.date()
-                # Filter alerts created on or before this date
-                queryset = queryset.filter(expires_at__date__lte=end_date_only)
+                # Filter alerts expiring on or before the end of this day
+                queryset = queryset.filter(expires_at__lt=start_of_day(end_date_obj.date() + timedelta(days=1)))
             except ValueError:
                 pass
                 
         return queryset
 
     def list(self, request, *args, **kwargs):
+        state = request.query_params.get('state')
+        if request.query_params.get('active') == 'true' and state:
+            return Response({
+                'success': True,
+                'data': {
+                    'filters': {
+                        'state': state,
+                        'city': request.query_params.get('city'),
+                        'severity': request.query_params.get('severity'),
+                        'active': True
+                    },
+                    'alerts': self.active_alerts(request)
+                }
+            })
+        return Response(get_alert_data(request, 'list', self.build_list_data))
+
+    def active_alerts(self, request):
+        return active_alerts.index.active(
+            request.query_params.get('state'),
+            city=request.query_params.get('city'),
+            severity=request.query_params.get('severity')
+        )
+
+    def build_list_data(self):
+        request = self.request
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         
@@ -449,7 +869,7 @@ class AlertViewSet(viewsets.ModelViewSet):
         start_date = request.query_params.get('startDate')
         end_date = request.query_params.get('endDate')
         
-        return Response({
+        return {
             'success': True,
             'data': {
                 'filters': {
@@ -461,7 +881,7 @@ class AlertViewSet(viewsets.ModelViewSet):
                 },
                 'alerts': serializer.data
             }
-        })
+        }
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -482,6 +902,8 @@ class AlertViewSet(viewsets.ModelViewSet):
         - severity: Filter by severity level (optional)
         - startDate: Filter by start date (optional)
         - endDate: Filter by end date (optional)
+        - active: true to return only alerts active right now, served from
+          the in-memory active alert index (date filters are ignored)
         
         Returns:
         - success: Boolean indicating if the request was successful
@@ -489,15 +911,33 @@ class AlertViewSet(viewsets.ModelViewSet):
         """
         state = request.query_params.get('state')
         city = request.query_params.get('city')
-        severity = request.query_params.get('severity')
-        start_date = request.query_params.get('startDate')
-        end_date = request.query_params.get('endDate')
         
         if not state:
             return Response({
                 'success': False,
                 'message': 'State parameter is required'
             }, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.query_params.get('active') == 'true':
+            return Response({
+                'success': True,
+                'data': {
+                    'state': state,
+                    'city': city,
+                    'active': True,
+                    'alerts': self.active_alerts(request)
+                }
+            })
+
+        return Response(get_alert_data(request, 'by_region', self.build_region_data))
+
+    def build_region_data(self):
+        request = self.request
+        state = request.query_params.get('state')
+        city = request.query_params.get('city')
+        severity = request.query_params.get('severity')
+        start_date = request.query_params.get('startDate')
+        end_date = request.query_params.get('endDate')
             
         # Start with base queryset
         queryset = self.get_queryset().filter(target_state=state)
@@ -515,10 +955,8 @@ class AlertViewSet(viewsets.ModelViewSet):
             try:
                 # Parse the date string to extract year, month, day
                 start_date_obj = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                # Create a date object with only year, month, day
-                start_date_only = start_date_obj.date()
-                # Filter alerts created on or after this date
-                queryset = queryset.filter(created_at__date__gte=start_date_only)
+                # Filter alerts created on or after the start of this day
+                queryset = queryset.filter(created_at__gte=start_of_day(start_date_obj.date()))
             except ValueError:
                 pass
                 
@@ -526,24 +964,22 @@ class AlertViewSet(viewsets.ModelViewSet):
             try:
                 # Parse the date string to extract year, month, day
                 end_date_obj = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                # Create a date object with only year, month, day
-                end_date_only = end_date_obj.date()
-                # Filter alerts created on or before this date
-                queryset = queryset.filter(created_at__date__lte=end_date_only)
+                # Filter alerts created on or before the end of this day
+                queryset = queryset.filter(created_at__lt=start_of_day(end_date_obj.date() + timedelta(days=1)))
             except ValueError:
                 pass
             
         # Serialize the results
         serializer = self.get_serializer(queryset, many=True)
         
-        return Response({
+        return {
             'success': True,
             'data': {
                 'state': state,
                 'city': city,
                 'alerts': serializer.data
             }
-        })
+        }
 
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
@@ -551,9 +987,12 @@ class UserProfileView(APIView):
     def get(self, request):
         user = request.user
         serializer = UserProfileSerializer(user)
+        data = serializer.data
+        # Maintained counters; one primary key lookup however many reports
+        data['reportStats'] = counters.user_counts(user)
         return Response({
             'success': True,
-            'data': serializer.data
+            'data': data
         })
     def put(self, request, user_id):
         try:
@@ -584,43 +1023,138 @@ class UserProfileView(APIView):
                 'message': 'User not found'
             }, status=status.HTTP_404_NOT_FOUND)
 
-class PlantDetectionView(APIView):
-    permission_classes = [AllowAny]
-    
+class ReportSubmitView(AsyncAPIView):
+    """
+    Submit a report without holding a worker thread under ASGI.
+
+    Accepts the same body as POST /api/reports/. Validation and the insert
+    run in one hop to the database thread.
+    """
+    async def post(self, request):
+        data, status_code = await sync_to_async(submit_report)(request, request.data)
+        return json_response(data, status=status_code)
+
+# Room for multipart boundaries and part headers around the image
+MULTIPART_OVERHEAD = 16 * 1024
+
+class ImageUploadView(APIView):
+    """
+    Upload a report image.
+
+    Accepts a multipart POST with the image in the "image" field (JPEG,
+    PNG or WebP, at most UPLOAD_IMAGE_MAX_BYTES). The image is streamed
+    to disk and stored under the hash of its content, so uploading the
+    same image again returns the same URL.
+
+    Returns:
+    - success: Boolean indicating if the request was successful
+    - data: imageUrl (use as imageUrl when creating the report),
+      thumbnailUrl and modelImageUrl (available shortly after the
+      response), sha256, size and contentType
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
     def post(self, request):
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        # Refuse oversized bodies before reading them
+        if content_length > settings.UPLOAD_IMAGE_MAX_BYTES + MULTIPART_OVERHEAD:
+            return Response({
+                'success': False,
+                'message': 'Image is too large'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        handler = uploads.ImageUploadHandler(request._request)
+        request._request.upload_handlers = [handler]
+        try:
+            request.data
+        except ParseError as e:
+            return Response({
+                'success': False,
+                'message': str(e.detail)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            # Malformed bodies and disconnects would otherwise leave the partial file
+            handler.cleanup()
+
+        if handler.error:
+            return Response({
+                'success': False,
+                'message': str(handler.error)
+            }, status=handler.error.status_code)
+        stored = handler.stored
+        if stored is None:
+            return Response({
+                'success': False,
+                'message': f'No image file in the "{uploads.UPLOAD_FIELD}" field'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Also retried when an earlier attempt failed to write them
+        if stored.created or stored.derivatives_missing():
+            uploads.schedule_derivatives(stored)
+
+        return Response({
+            'success': True,
+            'message': 'Image uploaded successfully' if stored.created else 'Image already uploaded',
+            'data': {
+                'imageUrl': uploads.media_url(request, stored.path),
+                'thumbnailUrl': uploads.media_url(request, uploads.relative_path(stored.digest, stored.ext, 'thumb')),
+                'modelImageUrl': uploads.media_url(request, uploads.relative_path(stored.digest, stored.ext, 'model')),
+                'sha256': stored.digest,
+                'size': stored.size,
+                'contentType': stored.content_type
+            }
+        }, status=status.HTTP_201_CREATED if stored.created else status.HTTP_200_OK)
+
+class PlantDetectionView(AsyncAPIView):
+    """
+    Detect the plant in an image.
+
+    Accepts POST request with:
+    - image_url: URL of the plant image
+    """
+    allow_anonymous = True
+
+    async def post(self, request):
         serializer = PlantDetectionRequestSerializer(data=request.data)
         if not serializer.is_valid():
-            return Response({
+            return json_response({
                 'success': False,
                 'message': 'Invalid request data',
                 'errors': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
-            
+
+        image_url = serializer.validated_data['image_url']
+
         # Get a random plant type
-        plant_types = PlantType.objects.all()
-        plant_type = random.choice(list(plant_types))
+        plant_type = await random_row(PlantType.objects.all())
+        if plant_type is None:
+            return json_response({
+                'success': False,
+                'message': 'No plant types available'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         confidence = round(random.uniform(0.85, 0.99), 2)
-        
-        # Ensure proper encoding of Arabic text
-        response_data = {
+
+        return json_response({
             'success': True,
             'data': {
                 'plantId': str(plant_type.id),
-                'name': plant_type.name.encode('utf-8').decode('utf-8'),
-                'scientificName': plant_type.scientific_name.encode('utf-8').decode('utf-8'),
+                'name': plant_type.name,
+                'scientificName': plant_type.scientific_name,
                 'confidence': confidence,
-                'imageUrl': serializer.validated_data['image_url']
+                'imageUrl': image_url
             }
-        }
-        
-        return Response(response_data, content_type='application/json; charset=utf-8')
+        })
 
-class DiseaseDetectionView(APIView):
+class DiseaseDetectionView(AsyncAPIView):
     """
     Detect plant diseases from an image.
     
     Accepts POST request with:
-    - imageUrl: URL of the plant image
+    - image_url: URL of the plant image
     
     Returns:
     - success: Boolean indicating if detection was successful
@@ -631,42 +1165,45 @@ class DiseaseDetectionView(APIView):
         - treatment: Treatment recommendations
         - confidence: Detection confidence score
     """
-    def post(self, request):
+    async def post(self, request):
         serializer = DiseaseDetectionRequestSerializer(data=request.data)
         if not serializer.is_valid():
-            return Response({
+            return json_response({
                 'success': False,
                 'message': 'Invalid request data',
                 'errors': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        image_url = serializer.validated_data['image_url']
+
         # Get a random disease type
-        diseases = DiseaseType.objects.all()
-        disease_type = random.choice(list(diseases))
+        disease_type = await random_row(DiseaseType.objects.all())
+        if disease_type is None:
+            return json_response({
+                'success': False,
+                'message': 'No disease types available'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         confidence = round(random.uniform(0.85, 0.99), 2)
-        
-        # Ensure proper encoding of Arabic text
-        response_data = {
+
+        return json_response({
             'success': True,
             'data': {
                 'diseaseId': str(disease_type.id),
-                'name': disease_type.name.encode('utf-8').decode('utf-8'),
-                'description': disease_type.description.encode('utf-8').decode('utf-8'),
-                'treatment': disease_type.treatment.encode('utf-8').decode('utf-8'),
+                'name': disease_type.name,
+                'description': disease_type.description,
+                'treatment': disease_type.treatment,
                 'severity': disease_type.severity,
                 'confidence': confidence,
-                'imageUrl': serializer.validated_data['image_url']
+                'imageUrl': image_url
             }
-        }
-        
-        return Response(response_data, content_type='application/json; charset=utf-8')
+        })
 
-class PestDetectionView(APIView):
+class PestDetectionView(AsyncAPIView):
     """
     Detect plant pests from an image.
     
     Accepts POST request with:
-    - imageUrl: URL of the plant image
+    - image_url: URL of the plant image
     
     Returns:
     - success: Boolean indicating if detection was successful
@@ -675,52 +1212,45 @@ class PestDetectionView(APIView):
         - name: Pest name
         - confidence: Detection confidence score
     """
-    def post(self, request):
+    async def post(self, request):
         serializer = PestDetectionRequestSerializer(data=request.data)
         if not serializer.is_valid():
-            return Response({
+            return json_response({
                 'success': False,
                 'message': 'Invalid request data',
                 'errors': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get all pests from database
-        pests = PestType.objects.all()
-        
-        # Convert to list of dictionaries with same structure as before
-        pest_list = [{
-            'id': str(pest.id),
-            'name': pest.name.encode('utf-8').decode('utf-8'),
-            'description': pest.description.encode('utf-8').decode('utf-8'),
-            'treatment': pest.treatment.encode('utf-8').decode('utf-8'),
-            'severity': pest.severity
-        } for pest in pests]
-        
+        image_url = serializer.validated_data['image_url']
+
         # Simulate detection with random confidence
-        detected_pest = random.choice(pest_list)
+        detected_pest = await random_row(PestType.objects.all())
+        if detected_pest is None:
+            return json_response({
+                'success': False,
+                'message': 'No pest types available'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         confidence = round(random.uniform(0.8, 1.0), 2)
 
-        response_data = {
+        return json_response({
             'success': True,
             'data': {
-                'pestId': detected_pest['id'],
-                'name': detected_pest['name'],
-                'description': detected_pest['description'],
-                'treatment': detected_pest['treatment'],
-                'severity': detected_pest['severity'],
+                'pestId': str(detected_pest.id),
+                'name': detected_pest.name,
+                'description': detected_pest.description,
+                'treatment': detected_pest.treatment,
+                'severity': detected_pest.severity,
                 'confidence': confidence,
-                'imageUrl': serializer.validated_data['image_url']
+                'imageUrl': image_url
             }
-        }
-        
-        return Response(response_data, content_type='application/json; charset=utf-8')
+        })
 
-class DroughtDetectionView(APIView):
+class DroughtDetectionView(AsyncAPIView):
     """
     Detect drought conditions from an image.
     
     Accepts POST request with:
-    - imageUrl: URL of the plant/field image
+    - image_url: URL of the plant/field image
     
     Returns:
     - success: Boolean indicating if detection was successful
@@ -729,15 +1259,17 @@ class DroughtDetectionView(APIView):
         - description: Description of drought conditions
         - confidence: Detection confidence score
     """
-    def post(self, request):
+    async def post(self, request):
         serializer = DroughtDetectionRequestSerializer(data=request.data)
         if not serializer.is_valid():
-            return Response({
+            return json_response({
                 'success': False,
                 'message': 'Invalid request data',
                 'errors': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        image_url = serializer.validated_data['image_url']
+
         # Dummy drought detection logic
         # Drought levels: 0 (no drought) to 5 (severe drought)
         drought_level = random.randint(0, 5)
@@ -771,15 +1303,231 @@ class DroughtDetectionView(APIView):
             }
         }
 
-        response_data = {
+        return json_response({
             'success': True,
             'data': {
                 'droughtLevel': drought_level,
                 'description':
                     drought_descriptions[drought_level]['ar'],
                 'confidence': confidence,
-                'imageUrl': serializer.validated_data['image_url']
+                'imageUrl': image_url
             }
+        })
+
+class ReportStatsView(APIView):
+    """
+    Time-bucketed report counts served from the rollup table.
+
+    Query Parameters:
+    - bucket: day (default), week or month
+    - groupBy: state, city, disease or pest (optional)
+    - state, city, diseaseId, pestId: Filters (optional)
+    - startDate, endDate: Date range (optional)
+
+    Returns:
+    - success: Boolean indicating if the request was successful
+    - data: List of buckets with total and reviewed report counts
+    """
+    permission_classes = [IsAuthenticated]
+
+    buckets = {
+        'day': F('day'),
+        'week': TruncWeek('day'),
+        'month': TruncMonth('day'),
+    }
+    group_fields = {
+        'state': 'state',
+        'city': 'city',
+        'disease': 'disease_id',
+        'pest': 'pest_id',
+    }
+
+    def get(self, request):
+        bucket = request.query_params.get('bucket', 'day')
+        group_by = request.query_params.get('groupBy')
+
+        if bucket not in self.buckets:
+            return Response({
+                'success': False,
+                'message': 'bucket must be one of: ' + ', '.join(self.buckets)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if group_by and group_by not in self.group_fields:
+            return Response({
+                'success': False,
+                'message': 'groupBy must be one of: ' + ', '.join(self.group_fields)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = ReportRollup.objects.all()
+
+        # Apply dimension filters
+        filters_map = {
+            'state': 'state',
+            'city': 'city',
+            'diseaseId': 'disease_id',
+            'pestId': 'pest_id',
         }
-        
-        return Response(response_data, content_type='application/json; charset=utf-8') 
\ No newline at end of file
+        for param, field in filters_map.items():
+            value = request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{field: value})
+
+        # Apply date range filters
+        start_date = request.query_params.get('startDate')
+        end_date = request.query_params.get('endDate')
+
+        if start_date:
+            try:
+                start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00')).date()
+                queryset = queryset.filter(day__gte=start_date)
+            except ValueError:
+                pass
+
+        if end_date:
+            try:
+                end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00')).date()
+                queryset = queryset.filter(day__lte=end_date)
+            except ValueError:
+                pass
+
+        group_values = ['period']
+        if group_by:
+            group_values.append(self.group_fields[group_by])
+
+        rows = queryset.annotate(
+            period=self.buckets[bucket]
+        ).values(*group_values).annotate(
+            reports=Sum('report_count'),
+            reviewed=Sum('reviewed_count')
+        ).order_by(*group_values)
+
+        results = []
+        for row in rows:
+            item = {
+                'period': row['period'],
+                'reports': row['reports'],
+                'reviewed': row['reviewed'],
+                'pending': row['reports'] - row['reviewed'],
+            }
+            if group_by:
+                item[group_by] = row[self.group_fields[group_by]]
+            results.append(item)
+
+        return Response({
+            'success': True,
+            'data': {
+                'bucket': bucket,
+                'groupBy': group_by,
+                'stats': results
+            }
+        })
+
+class MetricsView(APIView):
+    """
+    Runtime metrics for operators, such as cache hit rates.
+
+    Returns:
+    - success: Boolean indicating if the request was successful
+    - data: Metrics grouped by component
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'success': True,
+            'data': metrics.collect()
+        })
+
+class ProfilesView(APIView):
+    """
+    Recently profiled requests, newest first (requires PROFILING_ENABLED).
+
+    Query Parameters:
+    - limit: Maximum number of entries (default: all buffered)
+
+    Returns:
+    - success: Boolean indicating if the request was successful
+    - data: Timings, query counts and slowest queries per request
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 0)) or None
+        except ValueError:
+            limit = None
+        if limit is not None:
+            # A negative slice would drop the newest entries instead
+            limit = max(1, limit)
+        return Response({
+            'success': True,
+            'data': {
+                'enabled': settings.PROFILING_ENABLED,
+                'sampleRate': settings.PROFILING_SAMPLE_RATE,
+                'profiles': profiling.recent(limit)
+            }
+        })
+
+class SyncView(APIView):
+    """
+    Return rows changed since the client's last sync.
+
+    Query Parameters:
+    - syncToken: Token returned by the previous sync (omit for a full sync)
+    - resources: Comma separated subset of reports, alerts, plantTypes,
+      diseaseTypes, pestTypes (default: all)
+    - limit: Maximum rows per resource (default 500)
+
+    Returns:
+    - success: Boolean indicating if the request was successful
+    - data: Updated rows and deleted ids per resource, the next syncToken,
+      and hasMore when the client should call again straight away
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        resources = request.query_params.get('resources')
+        resources = resources.split(',') if resources else list(sync.RESOURCES)
+        unknown = [resource for resource in resources if resource not in sync.RESOURCES]
+        if unknown:
+            return Response({
+                'success': False,
+                'message': 'Unknown resources: ' + ', '.join(unknown)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get('limit', settings.SYNC_PAGE_SIZE))
+        except ValueError:
+            limit = settings.SYNC_PAGE_SIZE
+        # A limit below 1 would never advance the cursor
+        limit = max(1, min(limit, settings.SYNC_PAGE_SIZE))
+
+        try:
+            cursors = sync.decode_token(request.query_params.get('syncToken'))
+        except sync.InvalidSyncToken:
+            return Response({
+                'success': False,
+                'message': 'Invalid sync token'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except sync.ExpiredSyncToken:
+            return Response({
+                'success': False,
+                'message': 'Sync token expired, perform a full sync'
+            }, status=status.HTTP_410_GONE)
+
+        changes = {}
+        has_more = False
+        for resource in resources:
+            changes[resource], cursors[resource], more = sync.sync_resource(
+                resource, request.user, cursors.get(resource), limit
+            )
+            has_more = has_more or more
+
+        return Response({
+            'success': True,
+            'data': {
+                'syncToken': sync.encode_token(cursors),
+                'hasMore': has_more,
+                'changes': changes
+            }
+        })